@@ -2,13 +2,17 @@
 Async database configuration module.
 """
 import os
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+
+from app.db_pool import pool_options
+from app.metrics import instrument_engine
 
 # Import Base for schema reference in the startup event in main.py.
-# Base is used in app.main:startup_db_client to create database tables.
-from app.database import Base  # noqa: F401
-__all__ = ["async_engine", "AsyncSessionLocal", "get_async_db", "Base"]
+# Base is used by init_models() in the app.main lifespan to create database tables.
+from app.database import Base, LazySessionMaker  # noqa: F401
+__all__ = ["get_async_engine", "AsyncSessionLocal", "get_async_db", "init_models", "Base"]
 
 # Get database URL from environment variable
 # Convert regular PostgreSQL URL to async version by adding +asyncpg
@@ -16,19 +20,39 @@ __all__ = ["async_engine", "AsyncSessionLocal", "get_async_db", "Base"]
 # For local development without Docker, you can modify this to localhost:5434
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://grc_user:grc_pass@db:5432/grc_dashboard")
 
-# Always use PostgreSQL with asyncpg driver
-ASYNC_DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://')
-
-# Create SQLAlchemy async engine
-async_engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    echo=os.getenv("DEBUG_MODE", "False").lower() == "true",  # SQL logging when in debug mode
+# PostgreSQL goes through the asyncpg driver; SQLite (local tests, see
+# app/init_test_db.py) through aiosqlite
+ASYNC_DATABASE_URL = (
+    DATABASE_URL
+    .replace('postgresql://', 'postgresql+asyncpg://')
+    .replace('sqlite://', 'sqlite+aiosqlite://')
 )
 
+_async_engine = None
+
+
+def get_async_engine():
+    """
+    The async engine, created on first use (normally by ``init_models`` in
+    the app lifespan) so importing the app loads neither asyncpg nor aiosqlite.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            echo=os.getenv("DEBUG_MODE", "False").lower() == "true",  # SQL logging when in debug mode
+            # DB_POOL_* sizing and the asyncpg statement cache mode (see app/db_pool.py)
+            **pool_options(ASYNC_DATABASE_URL, is_async=True),
+        )
+        # statement timings for /metrics; events fire on the underlying sync engine
+        instrument_engine(_async_engine.sync_engine, "async")
+    return _async_engine
+
+
 # Create async session factory
-AsyncSessionLocal = sessionmaker(
-    async_engine, 
-    class_=AsyncSession, 
+AsyncSessionLocal = LazySessionMaker(
+    get_async_engine,
+    class_=AsyncSession,
     expire_on_commit=False
 )
 
@@ -45,3 +69,32 @@ async def get_async_db():
             yield session
         finally:
             await session.close()
+
+
+async def init_models():
+    """
+    Create any missing tables for the ORM models registered on Base.
+    """
+    # Import models so their tables are registered on Base.metadata
+    import app.threat_intel.db_models  # noqa: F401
+
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add indexes introduced since
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                await conn.execute(CreateIndex(index, if_not_exists=True))
+        if conn.dialect.name == "postgresql":
+            # trigram index serving `indicator ILIKE '%q%'` searches
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_threat_intelligence_indicator_trgm "
+                "ON threat_intelligence USING gin (indicator gin_trgm_ops)"
+            ))
+
+
+def __getattr__(name):
+    # ``app.async_database.async_engine`` still works; the engine is created on first access
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
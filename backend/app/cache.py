@@ -0,0 +1,214 @@
+"""
+Response cache module.
+
+Bounded TTL cache with LRU eviction, negative caching and
+stale-while-revalidate, used to avoid repeating identical upstream
+lookups. Storage is pluggable: the default keeps entries in-process,
+``RedisCacheBackend`` lets several workers share one cache.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheableMiss(Exception):
+    """
+    Raised by a loader when the upstream answered "not found".
+
+    The cache stores it as a negative entry and re-raises it on later hits
+    instead of calling the loader again.
+    """
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+    negative: bool = False
+
+
+class CacheBackend:
+    """Storage interface for ``ResponseCache``."""
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU storage bounded by ``max_entries``.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        on_evict: Callback invoked once per eviction (used for counters)
+    """
+
+    def __init__(self, max_entries: int, on_evict: Optional[Callable[[], None]] = None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            if self.on_evict:
+                self.on_evict()
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared storage in Redis so several workers see the same cache.
+
+    Eviction is left to Redis (configure ``maxmemory-policy allkeys-lru``);
+    keys expire on their own once the stale window has passed.
+
+    Args:
+        url: Redis URL, e.g. ``redis://cache:6379/0``
+        prefix: Key namespace
+    """
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RedisCacheBackend requires the 'redis' package") from e
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self._redis.get(self.prefix + key)
+        return CacheEntry(**json.loads(raw)) if raw else None
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        ttl = max(1, int(entry.stale_until - time.time()))
+        await self._redis.set(self.prefix + key, json.dumps(asdict(entry)), ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class ResponseCache:
+    """
+    TTL cache with negative caching and stale-while-revalidate.
+
+    Args:
+        ttl: Seconds an entry is served as fresh
+        negative_ttl: Seconds a ``CacheableMiss`` is remembered
+        stale_ttl: Extra seconds an expired entry may still be served while
+            it is refreshed in the background
+        max_entries: LRU bound for the default in-memory backend
+        backend: Optional storage backend (defaults to in-memory LRU)
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        negative_ttl: float,
+        stale_ttl: float = 0,
+        max_entries: int = 10_000,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.stats: Dict[str, int] = dict.fromkeys(
+            ["hits", "misses", "stale_hits", "negative_hits", "evictions",
+             "refreshes", "refresh_errors"], 0
+        )
+        self.backend = backend or MemoryCacheBackend(max_entries, self._count_eviction)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def _count_eviction(self) -> None:
+        self.stats["evictions"] += 1
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for ``key``, calling ``loader`` on a miss.
+
+        Raises:
+            CacheableMiss: When the (possibly cached) upstream answer is "not found"
+        """
+        now = time.time()
+        entry = await self.backend.get(key)
+
+        if entry is not None and now < entry.expires_at:
+            self.stats["negative_hits" if entry.negative else "hits"] += 1
+            return self._unwrap(entry)
+
+        if entry is not None and now < entry.stale_until and not entry.negative:
+            self.stats["stale_hits"] += 1
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, loader))
+            return entry.value
+
+        self.stats["misses"] += 1
+        return self._unwrap(await self._load(key, loader))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> CacheEntry:
+        now = time.time()
+        try:
+            value = await loader()
+        except CacheableMiss as miss:
+            entry = CacheEntry(str(miss), now + self.negative_ttl, now + self.negative_ttl, True)
+        else:
+            entry = CacheEntry(value, now + self.ttl, now + self.ttl + self.stale_ttl)
+        await self.backend.set(key, entry)
+        return entry
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._load(key, loader)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            # keep serving the stale copy; the next caller past stale_until reloads
+            self.stats["refresh_errors"] += 1
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    @staticmethod
+    def _unwrap(entry: CacheEntry) -> Any:
+        if entry.negative:
+            raise CacheableMiss(entry.value)
+        return entry.value
+
+    async def invalidate(self, key: str) -> None:
+        await self.backend.delete(key)
+
+    async def close(self) -> None:
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await self.backend.close()
@@ -1,10 +1,154 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict
-from app.models import ItemIn, ItemOut
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from app.models import BulkDeleteRequest, BulkItemReport, BulkItemResult, ItemIn, ItemOut, ItemPage
+from app.item_store import build_item_store
 
 router = APIRouter(prefix="/items", tags=["Items"])
-_fake_db: Dict[int, ItemOut] = {}
-_sequence = 1
+# Thread-safe store; handlers run concurrently on the threadpool (ITEM_STORE)
+store = build_item_store()
+
+# Largest array / NDJSON stream accepted by the bulk endpoints
+BULK_MAX_ROWS = int(os.getenv("ITEMS_BULK_MAX_ROWS", "100000"))
+
+_items_in = TypeAdapter(List[ItemIn])
+_items_out = TypeAdapter(List[ItemOut])  # bulk PUT rows carry their id
+
+_BULK_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/ItemIn"}}},
+            "application/x-ndjson": {"schema": {"type": "string", "description": "One ItemIn per line"}},
+        },
+    }
+}
+
+
+def _read_rows(body: bytes, content_type: str) -> List[Any]:
+    """Parse a JSON array or an NDJSON body into a list of raw rows."""
+    try:
+        if "ndjson" in content_type:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"invalid JSON: {str(e)}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="expected a JSON array or NDJSON lines")
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"at most {BULK_MAX_ROWS} rows per request")
+    return rows
+
+
+def _validate(adapter: TypeAdapter, rows: List[Any]) -> Tuple[Dict[int, Any], Dict[int, str]]:
+    """
+    Validate all rows in one pass. Returns valid models and error messages,
+    both keyed by row index; only batches with errors are validated twice.
+    """
+    try:
+        return dict(enumerate(adapter.validate_python(rows))), {}
+    except ValidationError as e:
+        errors: Dict[int, str] = {}
+        for err in e.errors():
+            index, *field = err["loc"]
+            errors.setdefault(index, f"{'.'.join(map(str, field)) or 'row'}: {err['msg']}")
+    good = [i for i in range(len(rows)) if i not in errors]
+    return dict(zip(good, adapter.validate_python([rows[i] for i in good]))), errors
+
+
+def _auto_concat(items: List[ItemIn]) -> List[Dict[str, Any]]:
+    """Bulk form of the tutor-spec comment rule used by POST/PUT."""
+    rows = [item.model_dump() for item in items]
+    for row in rows:
+        row["comment"] = f"auto-concat:{row['first_name']}{row['last_name']}"
+    return rows
+
+
+def _report(results: List[BulkItemResult], ok: set) -> BulkItemReport:
+    results.sort(key=lambda r: r.index)
+    succeeded = sum(r.status in ok for r in results)
+    return BulkItemReport(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+
+async def _bulk_write(request: Request, adapter: TypeAdapter, atomic: bool, write, ok_status: int):
+    # decoding and validating up to BULK_MAX_ROWS rows would block the event
+    # loop, so only the body is read here; the rest runs on the threadpool
+    body = await request.body()
+    return await run_in_threadpool(_bulk_apply, body, request.headers.get("content-type", ""),
+                                   adapter, atomic, write, ok_status)
+
+
+def _bulk_apply(body: bytes, content_type: str, adapter: TypeAdapter, atomic: bool, write,
+                ok_status: int) -> BulkItemReport:
+    """Parse, validate and write one bulk request."""
+    rows = _read_rows(body, content_type)
+    valid, errors = _validate(adapter, rows)
+    results = [BulkItemResult(index=i, status=422, error=msg) for i, msg in errors.items()]
+    if errors and atomic:
+        results += [BulkItemResult(index=i, status=424, error="not written: batch has invalid rows")
+                    for i in valid]
+        return _report(results, {ok_status})
+
+    indexes = list(valid)
+    outcome = write(_auto_concat([valid[i] for i in indexes]))
+    for index, value in zip(indexes, outcome):
+        if value is False:
+            results.append(BulkItemResult(index=index, status=404, error="not found"))
+        else:
+            results.append(BulkItemResult(index=index, status=ok_status,
+                                          id=valid[index].id if value is True else value))
+    return _report(results, {ok_status})
+
+
+@router.get(
+    "", response_model=ItemPage,
+    summary="List items",
+    description="Items in id order. Pass the returned `next_cursor` as `cursor` for the next page."
+)
+def list_items(
+    cursor: Optional[int] = Query(None, ge=0, description="Last id of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    items = store.list(after=cursor or 0, limit=limit + 1)
+    has_more = len(items) > limit
+    items = items[:limit]
+    return ItemPage(items=items, next_cursor=items[-1].id if has_more else None)
+
+@router.post(
+    "/bulk", response_model=BulkItemReport,
+    summary="Create items in bulk",
+    description="Accepts a JSON array or NDJSON stream of items, applies the auto-concat "
+                "comment rule and writes all valid rows in one batch. Returns a result per row; "
+                "with `atomic=true` nothing is written if any row is invalid.",
+    openapi_extra=_BULK_BODY,
+)
+async def create_bulk(request: Request, atomic: bool = Query(False)):
+    return await _bulk_write(request, _items_in, atomic, store.create_many, status.HTTP_201_CREATED)
+
+@router.put(
+    "/bulk", response_model=BulkItemReport,
+    summary="Replace items in bulk",
+    description="Like POST /items/bulk, but every row carries the `id` of the item it replaces.",
+    openapi_extra=_BULK_BODY,
+)
+async def update_bulk(request: Request, atomic: bool = Query(False)):
+    return await _bulk_write(request, _items_out, atomic, store.replace_many, status.HTTP_200_OK)
+
+@router.post(
+    "/bulk/delete", response_model=BulkItemReport,
+    summary="Delete items in bulk", description="Removes items by id in one batch"
+)
+def delete_bulk(request: BulkDeleteRequest):
+    deleted = store.delete_many(request.ids)
+    return _report([
+        BulkItemResult(index=i, id=item_id, status=204 if ok else 404, error=None if ok else "not found")
+        for i, (item_id, ok) in enumerate(zip(request.ids, deleted))
+    ], {204})
 
 @router.post(
     "", response_model=ItemOut,
@@ -13,24 +157,21 @@ _sequence = 1
                 "under `comment` to show tutor-mandated parsing."
 )
 def create(item: ItemIn):
-    global _sequence
     # ----- tutor-spec demo: concatenate two name fields ------------------
     concat = f"{item.first_name}{item.last_name}"
     item.comment = f"auto-concat:{concat}"
     # ---------------------------------------------------------------------
-    out = ItemOut(id=_sequence, **item.dict())
-    _fake_db[_sequence] = out
-    _sequence += 1
-    return out
+    return store.create(item.dict())
 
 @router.get(
     "/{item_id}", response_model=ItemOut,
     summary="Read item", description="Return one item by id"
 )
 def read(item_id: int):
-    if item_id not in _fake_db:
+    out = store.get(item_id)
+    if out is None:
         raise HTTPException(status_code=404, detail="not found")
-    return _fake_db[item_id]
+    return out
 
 @router.put(
     "/{item_id}", response_model=ItemOut,
@@ -38,12 +179,11 @@ def read(item_id: int):
     description="Replaces an item; shows same parse+concat trick as POST."
 )
 def update(item_id: int, item: ItemIn):
-    if item_id not in _fake_db:
-        raise HTTPException(status_code=404, detail="not found")
     concat = f"{item.first_name}{item.last_name}"
     item.comment = f"auto-concat:{concat}"
-    out = ItemOut(id=item_id, **item.dict())
-    _fake_db[item_id] = out
+    out = store.replace(item_id, item.dict())
+    if out is None:
+        raise HTTPException(status_code=404, detail="not found")
     return out
 
 @router.delete(
@@ -51,4 +191,4 @@ def update(item_id: int, item: ItemIn):
     summary="Delete item", description="Removes an item"
 )
 def delete(item_id: int):
-    _fake_db.pop(item_id, None)
+    store.delete(item_id)
@@ -2,25 +2,59 @@
 Database configuration module.
 """
 import os
+import threading
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.db_pool import pool_options
+from app.metrics import instrument_engine
+
 # Get database URL from environment variable
 # The DATABASE_URL should point to the Docker service name 'db' on port 5432 (internal container port)
 # For local development without Docker, you can modify this to localhost:5434
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://grc_user:grc_pass@db:5432/grc_dashboard")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Test connections before using from pool
-    echo=os.getenv("DEBUG_MODE", "False").lower() == "true"  # SQL logging when in debug mode
-)
+_engine = None
+_engine_lock = threading.Lock()  # first use may come from several threadpool threads at once
+
+
+def get_engine():
+    """
+    The sync engine, created on first use so importing the app never loads
+    a database driver or needs a database.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # Pool size/overflow/timeout/recycle come from DB_POOL_* (see app/db_pool.py)
+                engine = create_engine(
+                    DATABASE_URL,
+                    echo=os.getenv("DEBUG_MODE", "False").lower() == "true",  # SQL logging when in debug mode
+                    **pool_options(DATABASE_URL),
+                )
+                instrument_engine(engine, "sync")
+                _engine = engine
+    return _engine
+
+
+class LazySessionMaker(sessionmaker):
+    """``sessionmaker`` that binds itself to ``get_bind()`` when the first session is made."""
+
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionMaker(get_engine, autocommit=False, autoflush=False)
 
 # Create base class for ORM models
 Base = declarative_base()
@@ -38,3 +72,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def __getattr__(name):
+    # ``app.database.engine`` still works; the engine is created on first access
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
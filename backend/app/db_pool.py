@@ -0,0 +1,169 @@
+"""
+Connection pool configuration and instrumentation shared by the sync
+(``app.database``) and async (``app.async_database``) engines.
+
+Pool sizing comes from the environment so it can be matched to the worker
+count: every worker process owns its own pools, so the database sees up to
+``workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)`` connections per engine.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))       # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))       # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+# asyncpg prepared-statement cache per connection; 0 turns statement caching
+# off entirely (needed behind PgBouncer in transaction pooling mode)
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+
+# Recent samples kept for the percentiles in pool_stats()
+_SAMPLES = 1024
+
+
+class PoolMetrics:
+    """Checkout and connect timings for one pool; safe to update from threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self._checkout_ms = deque(maxlen=_SAMPLES)
+        self._connect_ms = deque(maxlen=_SAMPLES)
+        self._checkout_max = 0.0
+        self._connect_max = 0.0
+
+    def record_checkout(self, ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self._checkout_ms.append(ms)
+            self._checkout_max = max(self._checkout_max, ms)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self, ms: float) -> None:
+        with self._lock:
+            self.connects += 1
+            self._connect_ms.append(ms)
+            self._connect_max = max(self._connect_max, ms)
+
+    @staticmethod
+    def _summary(samples, maximum: float) -> Dict[str, float]:
+        ordered = sorted(samples)
+        if not ordered:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "p50_ms": round(ordered[len(ordered) // 2], 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+            "max_ms": round(maximum, 3),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait": self._summary(self._checkout_ms, self._checkout_max),
+                "connects": self.connects,
+                "connect_latency": self._summary(self._connect_ms, self._connect_max),
+            }
+
+
+class _TimedPool:
+    """
+    Pool mixin timing checkouts (including any connect they trigger) and new
+    connections. A session checks out once per transaction, so the checkout
+    wait is what a request waits before its first query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout((time.perf_counter() - start) * 1000)
+        return conn
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        self.metrics.record_connect((time.perf_counter() - start) * 1000)
+        return record
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
+def pool_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    ``create_engine``/``create_async_engine`` keyword arguments for ``url``.
+
+    SQLite (tests, local runs) gets a connection per checkout on the async
+    engine, since aiosqlite connections must not be shared across event
+    loops; everything else gets a sized, recycled queue pool.
+    """
+    if url.startswith("sqlite"):
+        return {"poolclass": TimedNullPool if is_async else TimedQueuePool,
+                "pool_pre_ping": DB_POOL_PRE_PING}
+
+    options: Dict[str, Any] = {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if is_async and "+asyncpg" in url:
+        options["connect_args"] = {
+            # SQLAlchemy's per-connection cache of asyncpg prepared statements
+            "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+            # asyncpg's own statement cache
+            **({"statement_cache_size": 0} if DB_PREPARED_STATEMENT_CACHE_SIZE == 0 else {}),
+        }
+    return options
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """Current occupancy and timings of an engine's pool."""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # negative while the pool has not opened pool_size connections yet
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
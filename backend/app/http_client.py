@@ -0,0 +1,95 @@
+"""
+Shared HTTP client module.
+
+A single pooled ``httpx.AsyncClient`` is created at application startup and
+closed at shutdown, so upstream lookups reuse keep-alive connections instead
+of paying a fresh TCP+TLS handshake on every request.
+"""
+import importlib.util
+import logging
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:  # imported when the first client is built
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Connection-pool limits
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Split timeouts (seconds): connecting is cheap and should fail fast,
+# reading an upstream report may legitimately take longer
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+
+# HTTP/2 needs the optional ``h2`` package (installed by httpx[http2])
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "True").lower() == "true"
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def build_client(**overrides) -> "httpx.AsyncClient":
+    """
+    Build an AsyncClient configured from the HTTP_* environment settings.
+
+    Args:
+        overrides: Keyword arguments passed through to ``httpx.AsyncClient``
+
+    Returns:
+        A new, unopened AsyncClient
+    """
+    import httpx
+
+    http2 = HTTP_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but 'h2' is not installed; using HTTP/1.1")
+        http2 = False
+
+    options = {
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+        "http2": http2,
+        "follow_redirects": True,
+    }
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Return the app-wide client, creating it lazily if startup has not run
+    (e.g. when the app is driven by a TestClient without a lifespan).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+
+async def startup_http_client() -> None:
+    """Create the shared client when the application starts."""
+    get_http_client()
+    logger.info("Shared HTTP client started")
+
+
+async def shutdown_http_client() -> None:
+    """Close the shared client and release pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Shared HTTP client closed")
@@ -24,7 +24,8 @@ CREATE_TABLES = [
         risk_score INTEGER DEFAULT 0,
         analysis_count INTEGER DEFAULT 1,
         indicator_metadata JSON,
-        malware_data JSON
+        malware_data JSON,
+        UNIQUE (indicator, indicator_type)
     )
     """,
     """
@@ -85,6 +86,17 @@ CREATE_TABLES = [
     )
     """,
     """
+    CREATE TABLE IF NOT EXISTS threat_daily_rollups (
+        day DATE NOT NULL,
+        indicator_type TEXT NOT NULL,
+        country_code TEXT NOT NULL DEFAULT '',
+        indicator_count INTEGER NOT NULL DEFAULT 0,
+        risk_score_sum INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (day, indicator_type, country_code)
+    )
+    """,
+    """
     CREATE TABLE IF NOT EXISTS analytics_reports (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         report_type TEXT,
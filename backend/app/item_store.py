@@ -0,0 +1,344 @@
+"""
+Storage engines for the /items CRUD router.
+
+The item handlers are sync ``def`` routes, so FastAPI runs them on its
+threadpool and every store method may be called from many threads at once.
+
+* ``ShardedMemoryItemStore`` – per-process dict split into lock-striped
+  shards, each with a sorted id index; ids come from one short critical
+  section so they never repeat.
+* ``SQLItemStore`` – ``items`` table on the sync engine from
+  ``app.database`` (PostgreSQL in deployments), shared by all workers.
+
+``ITEM_STORE=memory|database`` picks the engine used by the router.
+"""
+import heapq
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Column, Integer, String, bindparam, delete, func, insert, select, update
+
+from app.database import Base, get_engine
+from app.models import ItemOut
+
+logger = logging.getLogger(__name__)
+
+ITEM_STORE = os.getenv("ITEM_STORE", "memory").lower()
+ITEM_STORE_SHARDS = int(os.getenv("ITEM_STORE_SHARDS", "16"))
+
+# Ids per IN (...) list; keeps bind parameters under driver limits
+BULK_CHUNK = 1000
+
+
+def _chunks(values: List[int]):
+    for start in range(0, len(values), BULK_CHUNK):
+        yield values[start:start + BULK_CHUNK]
+
+
+def _deleted_flags(ids: List[int], removed: set) -> List[bool]:
+    """Per-id result of a bulk delete; a repeated id counts only once."""
+    seen = set()
+    flags = []
+    for item_id in ids:
+        flags.append(item_id in removed and item_id not in seen)
+        seen.add(item_id)
+    return flags
+
+
+class ItemRecord(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    first_name = Column(String(60), nullable=False)
+    last_name = Column(String(60), nullable=False)
+    lucky_number = Column(Integer, nullable=False)
+    comment = Column(String(140))
+
+
+class ItemStore:
+    """Interface shared by the item storage engines; all methods are thread-safe."""
+
+    def create(self, data: Dict[str, Any]) -> ItemOut:
+        raise NotImplementedError
+
+    def get(self, item_id: int) -> Optional[ItemOut]:
+        raise NotImplementedError
+
+    def replace(self, item_id: int, data: Dict[str, Any]) -> Optional[ItemOut]:
+        """Overwrite an existing item; None if it does not exist."""
+        raise NotImplementedError
+
+    def delete(self, item_id: int) -> bool:
+        """Remove an item; False if it did not exist."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def list(self, after: int = 0, limit: int = 100) -> List[ItemOut]:
+        """Up to ``limit`` items with id greater than ``after``, in id order."""
+        raise NotImplementedError
+
+    # Bulk operations take rows that were already validated as ``ItemIn``
+    def create_many(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Insert all rows as one batch; returns their ids in row order."""
+        raise NotImplementedError
+
+    def replace_many(self, rows: List[Dict[str, Any]]) -> List[bool]:
+        """Overwrite the items named by each row's ``id``; False where missing."""
+        raise NotImplementedError
+
+    def delete_many(self, ids: List[int]) -> List[bool]:
+        """Remove items; False where an id did not exist."""
+        raise NotImplementedError
+
+
+class ShardedMemoryItemStore(ItemStore):
+    """
+    In-memory store split into ``shards`` dicts, each behind its own lock.
+
+    Item ``id`` lives in shard ``id % shards``, so writers to different
+    items rarely contend. Id allocation is the only global critical section
+    and holds its lock for a single increment. Each shard also keeps its ids
+    sorted, so ``list`` merges the shards' next ids instead of probing every
+    id ever allocated.
+
+    Args:
+        shards: Number of lock stripes
+    """
+
+    def __init__(self, shards: int = ITEM_STORE_SHARDS):
+        self._shards: List[Dict[int, ItemOut]] = [{} for _ in range(shards)]
+        # ids allocate in increasing order, so inserts are (nearly) appends
+        self._keys: List[List[int]] = [[] for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._sequence = 1
+        self._sequence_lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        return self._next_ids(1).start
+
+    def _next_ids(self, n: int) -> range:
+        with self._sequence_lock:
+            start = self._sequence
+            self._sequence += n
+        return range(start, start + n)
+
+    def _stripe(self, item_id: int):
+        index = item_id % len(self._shards)
+        return self._shards[index], self._locks[index]
+
+    def _unindex(self, index: int, item_id: int) -> None:
+        # caller holds the shard's lock and has just removed the item
+        keys = self._keys[index]
+        del keys[bisect_left(keys, item_id)]
+
+    def create(self, data: Dict[str, Any]) -> ItemOut:
+        out = ItemOut(id=self._next_id(), **data)
+        index = out.id % len(self._shards)
+        with self._locks[index]:
+            self._shards[index][out.id] = out
+            insort(self._keys[index], out.id)
+        return out
+
+    def get(self, item_id: int) -> Optional[ItemOut]:
+        shard, _ = self._stripe(item_id)
+        return shard.get(item_id)  # single dict read, atomic under the GIL
+
+    def replace(self, item_id: int, data: Dict[str, Any]) -> Optional[ItemOut]:
+        out = ItemOut(id=item_id, **data)  # validate outside the lock
+        shard, lock = self._stripe(item_id)
+        with lock:
+            if item_id not in shard:
+                return None
+            shard[item_id] = out
+        return out
+
+    def delete(self, item_id: int) -> bool:
+        index = item_id % len(self._shards)
+        with self._locks[index]:
+            if self._shards[index].pop(item_id, None) is None:
+                return False
+            self._unindex(index, item_id)
+            return True
+
+    def count(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def list(self, after: int = 0, limit: int = 100) -> List[ItemOut]:
+        # the page is among each shard's first ``limit`` ids past the cursor;
+        # merge those short sorted runs, so deleted ids cost nothing
+        runs = []
+        for shard, keys, lock in zip(self._shards, self._keys, self._locks):
+            with lock:
+                start = bisect_right(keys, after)
+                runs.append([(item_id, shard[item_id]) for item_id in keys[start:start + limit]])
+        return [out for _, out in islice(heapq.merge(*runs, key=itemgetter(0)), limit)]
+
+    def _by_shard(self, pairs):
+        grouped = defaultdict(list)
+        for item_id, value in pairs:
+            grouped[item_id % len(self._shards)].append((item_id, value))
+        return grouped
+
+    def create_many(self, rows: List[Dict[str, Any]]) -> List[int]:
+        ids = self._next_ids(len(rows))
+        # rows are pre-validated; build models without validating again
+        items = [(i, ItemOut.model_construct(id=i, **row)) for i, row in zip(ids, rows)]
+        for index, group in self._by_shard(items).items():
+            with self._locks[index]:
+                self._shards[index].update(group)
+                keys = self._keys[index]
+                for item_id, _ in group:
+                    insort(keys, item_id)
+        return list(ids)
+
+    def replace_many(self, rows: List[Dict[str, Any]]) -> List[bool]:
+        found: Dict[int, bool] = {}
+        items = [(row["id"], ItemOut.model_construct(**row)) for row in rows]
+        for index, group in self._by_shard(items).items():
+            shard = self._shards[index]
+            with self._locks[index]:
+                for item_id, out in group:
+                    found[item_id] = item_id in shard
+                    if found[item_id]:
+                        shard[item_id] = out
+        return [found[row["id"]] for row in rows]
+
+    def delete_many(self, ids: List[int]) -> List[bool]:
+        removed = set()
+        for index, group in self._by_shard((i, None) for i in ids).items():
+            shard = self._shards[index]
+            with self._locks[index]:
+                for item_id, _ in group:
+                    if shard.pop(item_id, None) is not None:
+                        self._unindex(index, item_id)
+                        removed.add(item_id)
+        return _deleted_flags(ids, removed)
+
+
+class SQLItemStore(ItemStore):
+    """
+    Items in the ``items`` table; the database serializes concurrent writers
+    and every worker process sees the same data.
+
+    Args:
+        engine: Sync SQLAlchemy engine (defaults to ``app.database.get_engine()``,
+            resolved on first use)
+    """
+
+    _columns = [ItemRecord.id, ItemRecord.first_name, ItemRecord.last_name,
+                ItemRecord.lucky_number, ItemRecord.comment]
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _ready(self):
+        # created on first use so importing the router never needs a database
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    if self._engine is None:
+                        self._engine = get_engine()
+                    ItemRecord.__table__.create(self._engine, checkfirst=True)
+                    self._schema_ready = True
+        return self._engine
+
+    @staticmethod
+    def _to_item(row) -> ItemOut:
+        return ItemOut(**row._mapping)
+
+    def create(self, data: Dict[str, Any]) -> ItemOut:
+        with self._ready().begin() as conn:
+            row = conn.execute(insert(ItemRecord).values(**data).returning(*self._columns)).one()
+        return self._to_item(row)
+
+    def get(self, item_id: int) -> Optional[ItemOut]:
+        with self._ready().connect() as conn:
+            row = conn.execute(select(*self._columns).where(ItemRecord.id == item_id)).first()
+        return self._to_item(row) if row else None
+
+    def replace(self, item_id: int, data: Dict[str, Any]) -> Optional[ItemOut]:
+        with self._ready().begin() as conn:
+            row = conn.execute(
+                update(ItemRecord).where(ItemRecord.id == item_id).values(**data)
+                .returning(*self._columns)
+            ).first()
+        return self._to_item(row) if row else None
+
+    def delete(self, item_id: int) -> bool:
+        with self._ready().begin() as conn:
+            return conn.execute(delete(ItemRecord).where(ItemRecord.id == item_id)).rowcount > 0
+
+    def count(self) -> int:
+        with self._ready().connect() as conn:
+            return conn.execute(select(func.count()).select_from(ItemRecord)).scalar_one()
+
+    def list(self, after: int = 0, limit: int = 100) -> List[ItemOut]:
+        with self._ready().connect() as conn:
+            rows = conn.execute(
+                select(*self._columns).where(ItemRecord.id > after)
+                .order_by(ItemRecord.id).limit(limit)
+            ).all()
+        return [self._to_item(row) for row in rows]
+
+    def create_many(self, rows: List[Dict[str, Any]]) -> List[int]:
+        if not rows:
+            return []
+        with self._ready().begin() as conn:
+            # executemany + RETURNING is batched into multi-row INSERTs
+            # ("insertmanyvalues"), with ids returned in parameter order
+            result = conn.execute(
+                insert(ItemRecord).returning(ItemRecord.id, sort_by_parameter_order=True),
+                rows,
+            )
+            return list(result.scalars())
+
+    def replace_many(self, rows: List[Dict[str, Any]]) -> List[bool]:
+        if not rows:
+            return []
+        ids = [row["id"] for row in rows]
+        with self._ready().begin() as conn:
+            existing = set()
+            for chunk in _chunks(list(set(ids))):
+                existing.update(conn.execute(
+                    select(ItemRecord.id).where(ItemRecord.id.in_(chunk))
+                ).scalars())
+            params = [{**row, "b_id": row["id"]} for row in rows if row["id"] in existing]
+            if params:
+                conn.execute(
+                    update(ItemRecord).where(ItemRecord.id == bindparam("b_id")).values(
+                        first_name=bindparam("first_name"), last_name=bindparam("last_name"),
+                        lucky_number=bindparam("lucky_number"), comment=bindparam("comment"),
+                    ),
+                    params,
+                )
+        return [i in existing for i in ids]
+
+    def delete_many(self, ids: List[int]) -> List[bool]:
+        if not ids:
+            return []
+        removed = set()
+        with self._ready().begin() as conn:
+            for chunk in _chunks(list(set(ids))):
+                removed.update(conn.execute(
+                    delete(ItemRecord).where(ItemRecord.id.in_(chunk)).returning(ItemRecord.id)
+                ).scalars())
+        return _deleted_flags(ids, removed)
+
+
+def build_item_store(kind: str = ITEM_STORE) -> ItemStore:
+    """Store selected by ``ITEM_STORE`` (``memory`` or ``database``)."""
+    if kind == "database":
+        return SQLItemStore()
+    if kind != "memory":
+        logger.warning(f"Unknown ITEM_STORE {kind!r}; using the in-memory store")
+    return ShardedMemoryItemStore()
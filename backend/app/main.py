@@ -1,30 +1,88 @@
+import logging
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # ← relative import (works because main.py and crud_router.py share the same folder)
 from app.crud_router import router as crud_router
-from app.vt_router    import router as vt_router
+from app.vt_router    import router as vt_router, vt_cache
 from app.threat_intel.router import router as threat_intel_router
+from app.http_client import startup_http_client, shutdown_http_client
+from app.async_database import AsyncSessionLocal, get_async_engine, init_models
+from app.database import get_engine
+from app.db_pool import pool_stats
+from app.metrics import MetricsMiddleware, registry
+from app.profiling import ProfilingMiddleware, router as profiling_router
+from app.responses import FastJSONResponse
+from app.threat_intel.repository import IndicatorRepository
+from app.threat_intel.scheduler import FEED_SCHEDULER_ENABLED, feed_scheduler
 from dotenv       import load_dotenv
 
 load_dotenv()      # pulls VT_API_KEY from .env
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled upstream client for the whole app lifetime
+    await startup_http_client()
+    try:
+        await init_models()
+        async with AsyncSessionLocal() as session:
+            await IndicatorRepository(session).ensure_rollups()
+    except Exception as e:
+        # threat-intel endpoints fall back to mock data without a database
+        logger.warning(f"Database unavailable at startup: {str(e)}")
+    if FEED_SCHEDULER_ENABLED:
+        await feed_scheduler.start()
+    yield
+    await feed_scheduler.stop()
+    # the facet index (and its refresh task) exists only after a faceted search
+    facets = sys.modules.get("app.threat_intel.facets")
+    if facets is not None:
+        await facets.facet_index.stop()
+    await vt_cache.close()
+    await shutdown_http_client()
+
+
 app = FastAPI(
     title="OpenThreat Fusion API – student edition",
     description="Demonstrates OWASP-aligned validation and VirusTotal enrichment",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
+# a pass-through unless PROFILING_ENABLED (see app/profiling.py)
+app.add_middleware(ProfilingMiddleware)
+# outermost, so request latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
 
 # Add health check endpoint for tests
 @app.get("/")
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/health/db-pool")
+def db_pool_stats():
+    """Connection pool occupancy and checkout/connect timings per engine."""
+    return {"sync": pool_stats(get_engine()), "async": pool_stats(get_async_engine())}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # SECURITY NOTE: Authentication deliberately omitted in student/demo edition.
 # TODO: Implement JWT authentication with role-based access before any production use.
 
@@ -32,3 +90,4 @@ def health_check():
 app.include_router(crud_router)
 app.include_router(vt_router)
 app.include_router(threat_intel_router)
+app.include_router(profiling_router)
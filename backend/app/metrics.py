@@ -0,0 +1,289 @@
+"""
+Prometheus metrics.
+
+Counters, gauges and histograms kept in process and rendered in the
+Prometheus text format by ``GET /metrics``. Every worker process has its own
+values, so scrape each worker (or run the single-process server) to see them
+all.
+
+Recording is meant for the hot path: a histogram child pre-allocates its
+bucket counts, an observation is a ``bisect`` plus two additions under a
+``threading.Lock`` (the sync engine reports from threadpool threads), and no
+lock is ever held across an ``await``.
+
+Recorded here:
+
+* ``MetricsMiddleware``: per-route request latency, requests in flight and
+  responses by status code
+* ``upstream_call``: time of each call to a threat-intel provider
+* ``instrument_engine``: time of each SQL statement, by engine and verb
+"""
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+# Upper bounds in seconds; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values)
+        ]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """
+    Bucketed observations per label set.
+
+    Bucket counts are stored per bucket (not cumulatively) in a list
+    allocated when a label set is first seen; the cumulative counts
+    Prometheus expects are computed at render time.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket..., +Inf count, sum]
+        self._children: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                child = self._children[labels] = [0] * (len(self.buckets) + 2)
+            child[index] += 1
+            child[-1] += value
+
+    def count(self, *labels: str) -> int:
+        child = self._children.get(labels)
+        return int(sum(child[:-1])) if child else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            children = [(labels, list(child)) for labels, child in self._children.items()]
+        lines = super().render()
+        names = self.labelnames + ("le",)
+        for labels, child in sorted(children):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), child):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {int(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(child[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {int(cumulative)}")
+        return lines
+
+
+class Registry:
+    """The metrics rendered by ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to answer a request, by route template.",
+    ("method", "route"),
+))
+REQUESTS_TOTAL = registry.register(Counter(
+    "http_requests_total", "Requests answered, by route template and status code.",
+    ("method", "route", "status"),
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being handled.", ("method",),
+))
+UPSTREAM_SECONDS = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Time of calls to threat-intel providers.",
+    ("provider", "status"),
+))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "Time to execute a SQL statement, by engine and verb.",
+    ("engine", "statement"), buckets=DB_BUCKETS,
+))
+
+
+# ----------------------------------------------------------------------
+#  HTTP requests
+# ----------------------------------------------------------------------
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, in-flight requests and status codes.
+
+    Requests are labelled with the matched route's template (e.g.
+    ``/threat-intel/risk-score/{indicator_type}/{indicator}``), never the
+    raw path, so the number of label sets stays bounded; unmatched paths
+    are recorded as ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, method, template)
+            REQUESTS_TOTAL.inc(method, template, status)
+
+
+# ----------------------------------------------------------------------
+#  Upstream providers
+# ----------------------------------------------------------------------
+class upstream_call:
+    """
+    Time one call to a provider: ``with upstream_call("otx") as call: ...``.
+
+    Set ``call.status`` to the HTTP status once there is a response; calls
+    that raise are recorded as ``error`` and calls cancelled (a fan-out
+    deadline) as ``cancelled``.
+    """
+
+    __slots__ = ("provider", "status", "_start")
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.status: Optional[int] = None
+
+    def __enter__(self) -> "upstream_call":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            status = str(self.status)
+        elif issubclass(exc_type, asyncio.CancelledError):
+            status = "cancelled"
+        else:
+            status = "error"
+        UPSTREAM_SECONDS.observe(time.perf_counter() - self._start, self.provider, status)
+
+
+# ----------------------------------------------------------------------
+#  Database
+# ----------------------------------------------------------------------
+_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _verb(statement: str) -> str:
+    words = statement.split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in _VERBS else "OTHER"
+
+
+def instrument_engine(engine, name: str) -> None:
+    """
+    Time every statement ``engine`` executes (pass ``.sync_engine``
+    for an async engine). Statements that fail are not recorded.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, name, _verb(statement))
@@ -8,7 +8,7 @@ input validation and IDE-friendly type hints.
 from __future__ import annotations
 
 import re
-from typing import Annotated, Optional
+from typing import Annotated, List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -95,9 +95,66 @@ class ItemOut(ItemIn):
     id: Annotated[int, Field(description="Auto-increment DB id", examples=[1])]
 
 
+class ItemPage(BaseModel):
+    items: List[ItemOut]
+    next_cursor: Annotated[
+        Optional[int],
+        Field(description="Pass as `cursor` for the next page; null on the last page", examples=[100]),
+    ] = None
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: Annotated[List[int], Field(min_length=1, max_length=100_000, examples=[[1, 2, 3]])]
+
+
+class BulkItemResult(BaseModel):
+    index: Annotated[int, Field(description="Position of the row in the request")]
+    status: Annotated[int, Field(description="HTTP status this row would have had alone", examples=[201])]
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkItemReport(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
 # ────────────────────────────────────────────────
 #  VirusTotal /research_domain schema
 # ────────────────────────────────────────────────
 class DomainReport(BaseModel):
     domain: Annotated[str, Field(description="Queried FQDN", examples=["example.com"])]
     vt_response: dict
+
+
+class DomainBatchRequest(BaseModel):
+    domains: Annotated[
+        List[str],
+        Field(
+            description="FQDNs to research; duplicates are looked up once",
+            min_length=1,
+            max_length=5_000,
+            examples=[["example.com", "example.org"]],
+        ),
+    ]
+    concurrency: Annotated[
+        Optional[int],
+        Field(
+            description="Max parallel upstream lookups (capped server-side)",
+            ge=1,
+            le=100,
+            examples=[10],
+        ),
+    ] = None
+
+
+class DomainResult(BaseModel):
+    domain: Annotated[str, Field(description="Queried FQDN", examples=["example.com"])]
+    status: Annotated[int, Field(description="HTTP status of this lookup", examples=[200])]
+    vt_response: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class DomainBatchReport(BaseModel):
+    results: List[DomainResult]
@@ -0,0 +1,311 @@
+"""
+Opt-in request profiling.
+
+``ProfilingMiddleware`` profiles single requests with a wall-clock
+statistical sampler that understands asyncio. While a profiled request is
+in flight, a background thread wakes every ``PROFILING_INTERVAL_MS`` and
+records one stack for it:
+
+* when the request's task is the one running on the event loop, the loop
+  thread's Python stack;
+* otherwise the task's await chain (coroutine by coroutine down to the
+  awaited future) ending in ``[await]``, so time spent waiting on the
+  database or a provider shows up under the code that awaited it.
+
+Tasks the request spawns (e.g. fan-out provider lookups) are not followed;
+their time shows as the parent awaiting them. While the loop runs Python
+code the sampler only gets the GIL at the interpreter's switch interval
+(5 ms by default), so each sample is weighted by the wall time since the
+previous one rather than by the nominal interval.
+
+A request is profiled when the sampling roll (``PROFILING_SAMPLE_RATE``)
+picks it, or when a client in ``PROFILING_ALLOWLIST`` sends the
+``PROFILING_HEADER`` header. Profiled responses carry ``X-Profile-Id``; the
+last ``PROFILING_MAX_PROFILES`` profiles are kept in memory per worker and
+served by ``/admin/profiles`` as collapsed stacks (flamegraph.pl, speedscope)
+or speedscope JSON, to allow-listed clients only.
+
+With ``PROFILING_ENABLED`` off (the default) the middleware passes requests
+straight through; no sampler thread is started until a request is profiled.
+"""
+import asyncio
+import ipaddress
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))     # fraction of all requests
+PROFILING_HEADER = os.getenv("PROFILING_HEADER", "X-Profile")
+PROFILING_ALLOWLIST = os.getenv("PROFILING_ALLOWLIST", "127.0.0.1/32,::1/128")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "50"))
+
+# Deepest stack recorded per sample
+_MAX_DEPTH = 128
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _parse_allowlist(value: str) -> List[Any]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+_allowlist = _parse_allowlist(PROFILING_ALLOWLIST)
+
+
+def is_allowed(host: Optional[str]) -> bool:
+    """Whether a client address is in ``PROFILING_ALLOWLIST``."""
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _allowlist)
+
+
+def _frame(code) -> Frame:
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+
+
+class Profile:
+    """Samples of one request: total seconds and sample count per stack."""
+
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started = datetime.now()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        # stack (root first) -> [samples, seconds]
+        self.stacks: Dict[Tuple[Frame, ...], List[float]] = {}
+
+    @property
+    def samples(self) -> int:
+        return int(sum(n for n, _ in self.stacks.values()))
+
+    def add(self, stack: Tuple[Frame, ...], seconds: float) -> None:
+        entry = self.stacks.setdefault(stack, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        return {"id": self.id, "method": self.method, "path": self.path, "status": self.status,
+                "started": self.started, "duration_ms": round(self.duration_ms, 2),
+                "samples": self.samples}
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one ``a;b;c count`` line per stack."""
+        lines = []
+        for stack, (count, _) in sorted(self.stacks.items()):
+            names = ";".join(f"{name} ({os.path.basename(path)}:{line})".replace(";", ":")
+                             for name, path, line in stack)
+            lines.append(f"{names} {int(count)}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope file (https://www.speedscope.app) with wall-clock weights in ms."""
+        frames: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, (_, seconds) in self.stacks.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(round(seconds * 1000, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path}",
+            "exporter": "app.profiling",
+            "shared": {"frames": [{"name": name, "file": path, "line": line}
+                                  for name, path, line in frames]},
+            "profiles": [{
+                "type": "sampled", "name": f"{self.method} {self.path}", "unit": "milliseconds",
+                "startValue": 0, "endValue": round(sum(weights), 3),
+                "samples": samples, "weights": weights,
+            }],
+        }
+
+
+def _await_chain(coro) -> List[Frame]:
+    """Frames of a suspended coroutine and what it awaits, outermost first."""
+    frames: List[Frame] = []
+    awaitable = coro
+    while awaitable is not None and len(frames) < _MAX_DEPTH:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+            or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(_frame(frame.f_code))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+            or getattr(awaitable, "ag_await", None)
+    return frames
+
+
+def _running_stack(coro, frame) -> Optional[List[Frame]]:
+    """
+    The loop thread's stack from ``coro``'s frame down, or None when ``coro``
+    is not on it (the task is suspended, or another task is running).
+    """
+    outer = getattr(coro, "cr_frame", None)
+    frames: List[Frame] = []
+    while frame is not None:
+        frames.append(_frame(frame.f_code))
+        if frame is outer:
+            frames.reverse()
+            return frames[-_MAX_DEPTH:]
+        frame = frame.f_back
+    return None
+
+
+class Sampler:
+    """
+    Background thread sampling every in-flight profile; runs only while at
+    least one request is being profiled.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[str, Tuple[Profile, asyncio.Task, int]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active[profile.id] = (profile, asyncio.current_task(), threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for profile, task, thread_id in active:
+                profile.add(self._sample(task, frames.get(thread_id)), now - last)
+            last = now
+
+    @staticmethod
+    def _sample(task: asyncio.Task, frame) -> Tuple[Frame, ...]:
+        coro = task.get_coro()
+        stack = _running_stack(coro, frame)
+        if stack is not None:
+            return tuple(stack)
+        return tuple(_await_chain(coro)) + (("[await]", "", 0),)
+
+
+class ProfileStore:
+    """The most recent profiles, oldest evicted first."""
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def add(self, profile: Profile) -> None:
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        return list(reversed(self._profiles.values()))
+
+
+sampler = Sampler(PROFILING_INTERVAL_MS / 1000)
+profiles = ProfileStore(PROFILING_MAX_PROFILES)
+_ids = itertools.count(1)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled or header-triggered requests."""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = PROFILING_HEADER.lower().encode()
+
+    def _wanted(self, scope) -> bool:
+        if PROFILING_SAMPLE_RATE and random.random() < PROFILING_SAMPLE_RATE:
+            return True
+        if any(name == self.header for name, _ in scope["headers"]):
+            client = scope.get("client")
+            return is_allowed(client[0] if client else None)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILING_ENABLED or scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        profile = Profile(f"{os.getpid()}-{next(_ids)}", scope["method"],
+                          scope["path"] + (f"?{query}" if query else ""))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop(profile)
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            profiles.add(profile)
+
+
+# ----------------------------------------------------------------------
+#  Admin endpoints
+# ----------------------------------------------------------------------
+router = APIRouter(prefix="/admin/profiles", tags=["Admin"], include_in_schema=False)
+
+
+def _require_allowed(request: Request) -> None:
+    if not is_allowed(request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="profiles are only served to allow-listed clients")
+
+
+@router.get("")
+async def list_profiles(request: Request):
+    """Captured profiles in this worker, newest first."""
+    _require_allowed(request)
+    return [profile.summary() for profile in profiles.list()]
+
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    request: Request,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+):
+    """One profile as speedscope JSON or collapsed stacks."""
+    _require_allowed(request)
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="profile not found (evicted or another worker)")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.speedscope()
@@ -0,0 +1,152 @@
+"""
+Client-side rate limiting for quota-bound upstream APIs.
+
+Each API key gets an async token bucket. Callers queue for a token up to a
+wait deadline; a quota response from the upstream (HTTP 204/429) drains the
+key's bucket and pauses it, and ``KeyPool`` spreads load over several keys.
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Status codes VirusTotal uses to say "quota exceeded"
+QUOTA_STATUS_CODES = (204, 429)
+
+
+class RateLimitExceeded(Exception):
+    """No token could be obtained before the caller's wait deadline."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limit exceeded, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    Tokens are reserved synchronously (the balance may go negative), so
+    waiters are served in arrival order without holding a lock while they
+    sleep.
+
+    Args:
+        rate_per_minute: Sustained request rate
+        burst: Bucket capacity
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        start = max(self.updated, self.blocked_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(now, self.updated)
+
+    def wait_time(self) -> float:
+        """Seconds until the next token would be available."""
+        now = time.monotonic()
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        return blocked + max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take one token, returning how long the caller must sleep before
+        using it, or ``None`` (without taking it) if that exceeds ``max_wait``.
+        """
+        wait = self.wait_time()
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def release(self) -> None:
+        """Hand back a reserved token that will not be used."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    async def acquire(self, max_wait: float) -> None:
+        wait = self.reserve(max_wait)
+        if wait is None:
+            raise RateLimitExceeded(self.wait_time())
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # the caller gave up; later waiters must not pay for its token
+                self.release()
+                raise
+
+    def penalize(self, retry_after: float) -> None:
+        """Upstream said the quota is spent: drain and pause the bucket."""
+        now = time.monotonic()
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.updated = now
+
+
+class KeyPool:
+    """
+    Rotate requests across several API keys, each with its own bucket.
+
+    Args:
+        keys: API keys (``None`` entries are allowed for keyless use)
+        rate_per_minute: Per-key sustained rate
+        burst: Per-key bucket capacity
+        penalty: Seconds to pause a key after a quota response without
+            a ``Retry-After`` header
+    """
+
+    def __init__(self, keys: List[Optional[str]], rate_per_minute: float,
+                 burst: int, penalty: float = 60.0):
+        self.penalty = penalty
+        self.buckets: Dict[Optional[str], TokenBucket] = {
+            key: TokenBucket(rate_per_minute, burst) for key in (keys or [None])
+        }
+
+    async def acquire(self, max_wait: float) -> Optional[str]:
+        """Reserve a token on the key that frees up soonest and return the key."""
+        key, bucket = min(self.buckets.items(), key=lambda kv: kv[1].wait_time())
+        await bucket.acquire(max_wait)
+        return key
+
+    def observe(self, key: Optional[str], response: "httpx.Response") -> bool:
+        """
+        Adapt to the upstream's rate-limit signals.
+
+        Returns:
+            True if the response was a quota rejection and should be retried
+        """
+        bucket = self.buckets[key]
+        remaining = response.headers.get("x-ratelimit-remaining")
+        if response.status_code in QUOTA_STATUS_CODES or remaining == "0":
+            retry_after = response.headers.get("retry-after")
+            try:
+                pause = float(retry_after) if retry_after else self.penalty
+            except ValueError:
+                pause = self.penalty
+            bucket.penalize(pause)
+            logger.warning(f"Upstream quota hit, pausing key for {pause:.0f}s")
+        return response.status_code in QUOTA_STATUS_CODES
+
+    def stats(self) -> List[dict]:
+        """Per-key view (keys masked) for diagnostics."""
+        return [
+            {
+                "key": f"…{key[-4:]}" if key else None,
+                "tokens": round(bucket.tokens, 2),
+                "wait_seconds": round(bucket.wait_time(), 2),
+            }
+            for key, bucket in self.buckets.items()
+        ]
@@ -0,0 +1,90 @@
+"""
+Fast JSON responses and conditional GET.
+
+``FastJSONResponse`` is the app's default response class. It renders with
+orjson, and pydantic models are serialized straight to JSON bytes by
+pydantic-core. A handler that already holds a validated model can return
+``FastJSONResponse(model)`` to skip FastAPI's output validation and
+serialization; ``response_model`` then only documents the schema.
+
+For conditional GET a handler derives a strong ETag from the version of the
+data behind a response (``make_etag``), checks the request's validators with
+``is_not_modified`` before building the body, and answers 304 if they match.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, or by pydantic-core for a model."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for the data version described by ``parts``."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """HTTP-date of ``value``; naive datetimes are taken as local time."""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether the request's validators still match the current version.
+
+    ``If-None-Match`` wins over ``If-Modified-Since`` when both are sent
+    (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have whole seconds
+    return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+
+
+def cache_headers(cache_control: str, etag: Optional[str] = None,
+                  last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Caching headers for a 200 or 304 answer."""
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """304 answer carrying the same caching headers a 200 would."""
+    return Response(status_code=304, headers=headers)
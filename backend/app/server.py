@@ -0,0 +1,60 @@
+"""
+Production server settings, shared by ``gunicorn.conf.py`` and ``run.py``.
+
+In production the API runs as ``WEB_CONCURRENCY`` uvicorn workers (uvloop
+event loop, httptools parser) under gunicorn, which imports the app once
+before forking them and restarts any worker that dies. ``SIGTERM`` stops the
+workers accepting connections; requests in flight get
+``SERVER_GRACEFUL_TIMEOUT`` seconds to finish before the app's lifespan
+shutdown runs.
+
+Each worker is a separate process with its own connection pools, caches,
+metrics and in-memory ``/items`` store; use ``ITEM_STORE=database`` when
+more than one worker serves ``/items``.
+"""
+import importlib.util
+import os
+from typing import Any, Dict
+
+
+def default_workers() -> int:
+    """
+    One worker per CPU available to this process. Each worker's event loop
+    already overlaps waiting on I/O, so more workers than CPUs only adds
+    context switches and database connections.
+    """
+    try:
+        return max(1, len(os.sched_getaffinity(0)))  # honours container CPU sets
+    except AttributeError:  # not on Linux
+        return max(1, os.cpu_count() or 1)
+
+
+def _if_installed(module: str) -> str:
+    """``module`` when it can be imported, else ``auto`` (``uvicorn[standard]``
+    installs neither uvloop nor httptools on Windows)."""
+    return module if importlib.util.find_spec(module) is not None else "auto"
+
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8181"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+# Event loop and HTTP parser; uvicorn picks asyncio/h11 where uvloop/httptools are missing
+SERVER_LOOP = os.getenv("SERVER_LOOP") or _if_installed("uvloop")
+SERVER_HTTP = os.getenv("SERVER_HTTP") or _if_installed("httptools")
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))             # pending connections per socket
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))            # seconds an idle connection stays open
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "0"))      # recycle a worker after N requests; 0 never
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "0"))
+
+
+def uvicorn_options() -> Dict[str, Any]:
+    """Keyword arguments for ``uvicorn.Config`` in every production worker."""
+    return {
+        "loop": SERVER_LOOP,
+        "http": SERVER_HTTP,
+        "backlog": SERVER_BACKLOG,
+        "timeout_keep_alive": SERVER_KEEPALIVE,
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+        "limit_max_requests": SERVER_MAX_REQUESTS or None,
+    }
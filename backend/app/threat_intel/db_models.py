@@ -0,0 +1,153 @@
+"""
+SQLAlchemy ORM models for the threat intelligence schema.
+
+Mirrors the tables created by ``app/init_test_db.py``. JSON columns use
+JSONB on PostgreSQL and plain JSON elsewhere (SQLite in tests).
+"""
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, Text,
+    UniqueConstraint, func
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.types import JSON
+
+from app.database import Base
+
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+
+class ThreatIntel(Base):
+    __tablename__ = "threat_intelligence"
+    __table_args__ = (
+        # target of INSERT ... ON CONFLICT when indicators are re-analyzed
+        UniqueConstraint("indicator", "indicator_type", name="uq_threat_intelligence_indicator"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    indicator = Column(Text, nullable=False)
+    indicator_type = Column(String(20), nullable=False)
+    first_seen = Column(DateTime, server_default=func.now())
+    last_seen = Column(DateTime, server_default=func.now())
+    last_analysis = Column(DateTime, server_default=func.now())
+    risk_score = Column(Integer, default=0)
+    analysis_count = Column(Integer, default=1)
+    indicator_metadata = Column(JSONType)
+    malware_data = Column(JSONType)
+
+    reports = relationship(
+        "ProviderReportRecord", back_populates="indicator", lazy="raise",
+        order_by="ProviderReportRecord.report_time.desc()",
+    )
+
+
+# Search indexes:
+#   - trigram GIN for `indicator ILIKE '%q%'` (PostgreSQL only, created in
+#     app.async_database.init_models once pg_trgm is installed)
+#   - lower(indicator) text_pattern_ops for prefix matches
+#   - (indicator_type, risk_score DESC, id) and (risk_score DESC, id) serve the
+#     search filters and its keyset order without a sort
+Index(
+    "ix_threat_intelligence_indicator_prefix",
+    func.lower(ThreatIntel.indicator).label("indicator_lower"),
+    postgresql_ops={"indicator_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_threat_intelligence_type_risk",
+    ThreatIntel.indicator_type, ThreatIntel.risk_score.desc(), ThreatIntel.id,
+)
+Index("ix_threat_intelligence_risk", ThreatIntel.risk_score.desc(), ThreatIntel.id)
+# rollup refreshes and emerging-threat reads select by first_seen ranges
+Index("ix_threat_intelligence_first_seen", ThreatIntel.first_seen)
+# facet index delta syncs select rows seen or analyzed since the last sync
+Index("ix_threat_intelligence_last_seen", ThreatIntel.last_seen)
+Index("ix_threat_intelligence_last_analysis", ThreatIntel.last_analysis)
+
+
+class ProviderReportRecord(Base):
+    __tablename__ = "provider_reports"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    indicator_id = Column(Integer, ForeignKey("threat_intelligence.id", ondelete="CASCADE"),
+                          nullable=False, index=True)
+    provider = Column(String(50), nullable=False)
+    report_time = Column(DateTime, server_default=func.now())
+    detected = Column(Boolean, default=False)
+    confidence = Column(Integer, default=0)
+    raw_data = Column(JSONType)
+    categories = Column(JSONType)
+
+    indicator = relationship("ThreatIntel", back_populates="reports", lazy="raise")
+
+
+class IndicatorRelationship(Base):
+    __tablename__ = "indicator_relationships"
+
+    source_id = Column(Integer, ForeignKey("threat_intelligence.id", ondelete="CASCADE"),
+                       primary_key=True)
+    target_id = Column(Integer, ForeignKey("threat_intelligence.id", ondelete="CASCADE"),
+                       primary_key=True, index=True)
+    relationship_type = Column(String(50))
+    confidence = Column(Integer, default=50)
+    first_seen = Column(DateTime, server_default=func.now())
+    last_seen = Column(DateTime, server_default=func.now())
+
+
+class ThreatTag(Base):
+    __tablename__ = "threat_tags"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), unique=True, nullable=False)
+    description = Column(Text)
+
+
+class IndicatorTag(Base):
+    __tablename__ = "indicator_tags"
+
+    indicator_id = Column(Integer, ForeignKey("threat_intelligence.id", ondelete="CASCADE"),
+                          primary_key=True)
+    tag_id = Column(Integer, ForeignKey("threat_tags.id", ondelete="CASCADE"),
+                    primary_key=True, index=True)
+    added_at = Column(DateTime, server_default=func.now(), index=True)
+
+
+class ThreatFeed(Base):
+    __tablename__ = "threat_feeds"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(200), unique=True, nullable=False)
+    url = Column(Text)
+    feed_type = Column(String(50))
+    last_updated = Column(DateTime)
+    update_frequency = Column(Integer, default=24)  # hours
+    active = Column(Boolean, default=True)
+    description = Column(Text)
+    configuration = Column(JSONType)
+    stats = Column(JSONType)
+
+
+class AnalyticsReport(Base):
+    __tablename__ = "analytics_reports"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_type = Column(String(50))
+    report_date = Column(DateTime, server_default=func.now())
+    time_period = Column(Integer, default=30)
+    report_data = Column(JSONType)
+    visualization_config = Column(JSONType)
+
+
+class DailyRollup(Base):
+    """
+    Per-day aggregates of threat_intelligence by (indicator_type, country),
+    keyed on the day an indicator was first seen. Maintained on ingest by
+    ``IndicatorRepository.refresh_rollups``; ``/trends`` reads only these.
+    """
+    __tablename__ = "threat_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    indicator_type = Column(String(20), primary_key=True)
+    country_code = Column(String(8), primary_key=True, default="")  # "" = unknown
+    indicator_count = Column(Integer, nullable=False, default=0)
+    risk_score_sum = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,75 @@
+"""
+Streaming encoders for ``/threat-intel/export``.
+
+Each encoder turns an async iterator of indicator batches (lists of
+``ThreatIndicator``-shaped dicts) into an async iterator of text chunks,
+one chunk per batch, so the response never holds more than one batch.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, List
+
+from app.threat_intel.models import ThreatIndicator
+
+Batches = AsyncIterator[List[Dict[str, Any]]]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Flat CSV columns; nested fields are joined or JSON-encoded
+CSV_COLUMNS = [
+    "indicator", "indicator_type", "risk_score", "confidence", "first_seen", "last_seen",
+    "last_updated", "analysis_count", "country_code", "asn", "threat_types", "providers",
+    "detected_by", "malware",
+]
+
+
+async def ndjson_chunks(batches: Batches) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(ThreatIndicator(**row).model_dump_json() + "\n" for row in batch)
+
+
+def _csv_row(indicator: ThreatIndicator) -> List[Any]:
+    return [
+        indicator.indicator,
+        indicator.indicator_type.value,
+        indicator.risk_score,
+        indicator.confidence,
+        indicator.first_seen.isoformat() if indicator.first_seen else "",
+        indicator.last_seen.isoformat() if indicator.last_seen else "",
+        indicator.last_updated.isoformat() if indicator.last_updated else "",
+        indicator.analysis_count,
+        indicator.geolocation.country_code if indicator.geolocation else "",
+        indicator.asn_details.asn if indicator.asn_details else "",
+        ";".join(t.value for t in indicator.threat_types),
+        ";".join(sorted(indicator.providers)),
+        ";".join(sorted(name for name, p in indicator.providers.items() if p.detected)),
+        json.dumps(indicator.malware, sort_keys=True) if indicator.malware else "",
+    ]
+
+
+async def csv_chunks(batches: Batches) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for batch in batches:
+        writer.writerows(_csv_row(ThreatIndicator(**row)) for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only, no rows
+        yield buffer.getvalue()
+
+
+ENCODERS = {"ndjson": ndjson_chunks, "csv": csv_chunks}
+
+
+async def gzip_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Compress a text stream incrementally into one gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip header
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -5,19 +5,27 @@ from datetime import datetime, timedelta
 import random
 from typing import List, Dict, Any, Optional
 from app.threat_intel.models import IndicatorType, ThreatType
+from app.threat_intel.scoring import score_indicator
 
 class MockDataProvider:
     """Provides mock data for testing threat intelligence endpoints."""
     
     @staticmethod
     def get_mock_indicator(indicator: str, indicator_type: IndicatorType) -> Dict[str, Any]:
-        """Generate a mock indicator with risk score and other details."""
-        return {
+        """Generate a mock indicator from random provider data, scored like a real one."""
+        data = {
             "indicator": indicator,
             "indicator_type": indicator_type,
-            "risk_score": random.randint(0, 100),
-            "confidence": random.randint(50, 95),
             "last_updated": datetime.now() - timedelta(hours=random.randint(1, 48)),
+            "analysis_count": random.randint(1, 20),
+            "providers": {
+                provider: {
+                    "detected": random.choice([True, False]),
+                    "confidence": random.randint(0, 100),
+                    "report_time": datetime.now() - timedelta(hours=random.randint(1, 72))
+                }
+                for provider in ["virustotal", "abuseipdb", "otx"]
+            },
             "risk_factors": {
                 "provider_scores": {
                     "virustotal": random.randint(0, 100),
@@ -33,6 +41,8 @@ class MockDataProvider:
                 k=random.randint(1, 3)
             )
         }
+        data["risk_score"], data["confidence"] = score_indicator(data)
+        return data
     
     @staticmethod
     def get_mock_trend_data(days: int, indicator_type: Optional[IndicatorType] = None) -> Dict[str, Any]:
@@ -156,6 +166,7 @@ class MockDataProvider:
                 "indicator": indicator,
                 "indicator_type": indicator_type,
                 "risk_score": random.randint(0, 100),
+                "confidence": random.randint(50, 95),
                 "first_seen": datetime.now() - timedelta(days=random.randint(1, 30)),
                 "last_seen": datetime.now() - timedelta(hours=random.randint(0, 48)),
                 "analysis_count": random.randint(1, 20),
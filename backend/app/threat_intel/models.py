@@ -1,10 +1,12 @@
 """
 Pydantic models for threat intelligence API.
 """
+import base64
+import json
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, field_validator
 
 
 class IndicatorType(str, Enum):
@@ -107,16 +109,107 @@ class ProviderStats(BaseModel):
     detection_rate: float = Field(ge=0.0, le=1.0)
 
 
-class SearchRequest(BaseModel):
+def encode_search_cursor(risk_score: int, row_id: int) -> str:
+    """Opaque keyset cursor for the last row of a search page."""
+    raw = json.dumps([risk_score, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_search_cursor(cursor: str) -> Tuple[int, int]:
+    """Inverse of ``encode_search_cursor``; raises ValueError if malformed."""
+    try:
+        risk_score, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(risk_score), int(row_id)
+    except Exception as e:
+        raise ValueError("invalid search cursor") from e
+
+
+class SearchFilters(BaseModel):
     query: Optional[str] = None
     indicator_type: Optional[IndicatorType] = None
     min_risk_score: Optional[int] = Field(None, ge=0, le=100)
     max_risk_score: Optional[int] = Field(None, ge=0, le=100)
+    match: Literal["contains", "prefix"] = Field(
+        "contains", description="How query is matched against the indicator"
+    )
+    tags_all: List[str] = Field(default_factory=list, description="Indicators carrying every one of these tags")
+    tags_any: List[str] = Field(default_factory=list, description="Indicators carrying at least one of these tags")
+
+
+class SearchRequest(SearchFilters):
     limit: int = Field(10, ge=1, le=100)
     offset: int = Field(0, ge=0)
+    cursor: Optional[str] = Field(
+        None, description="next_cursor of the previous page; takes precedence over offset"
+    )
+    count_mode: Literal["exact", "estimated"] = Field(
+        "exact", description="estimated skips the full COUNT on large result sets"
+    )
+    facets: bool = Field(True, description="Return facet counts of the whole matching set")
+
+    @field_validator("cursor")
+    @classmethod
+    def cursor_is_valid(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None:
+            decode_search_cursor(v)
+        return v
+
+
+class SearchFacets(BaseModel):
+    tags: Dict[str, int] = Field(default_factory=dict)
+    indicator_type: Dict[str, int] = Field(default_factory=dict)
+    risk_bucket: Dict[str, int] = Field(
+        default_factory=dict, description="low 0-24, medium 25-49, high 50-74, critical 75-100"
+    )
+    is_estimate: bool = Field(False, description="Counted over the first matches of a text query only")
 
 
 class SearchResponse(BaseModel):
     indicators: List[ThreatIndicator]
     total_count: int
-    has_more: bool
\ No newline at end of file
+    has_more: bool
+    next_cursor: Optional[str] = None
+    count_is_estimate: bool = False
+    facets: Optional[SearchFacets] = None
+
+
+class ExportRequest(SearchFilters):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    max_rows: Optional[int] = Field(None, ge=1, description="Stop after this many rows; all by default")
+
+
+class FeedStatus(BaseModel):
+    id: int
+    name: str
+    active: bool
+    update_frequency: int = Field(description="Hours between refreshes")
+    last_updated: Optional[datetime] = None
+    next_due: Optional[datetime] = None
+    running: bool = False
+    last_run: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    loaded: Optional[int] = Field(None, description="Indicators written by the last full run")
+    skipped: Optional[str] = Field(None, description="not_modified or unchanged when the last check skipped the feed")
+    last_error: Optional[str] = None
+
+
+class GraphNode(BaseModel):
+    id: int
+    indicator: str
+    indicator_type: IndicatorType
+    risk_score: int
+    depth: int = Field(description="Hops from the root indicator")
+
+
+class GraphEdge(BaseModel):
+    source: int
+    target: int
+    relationship_type: Optional[str] = None
+    confidence: Optional[int] = None
+
+
+class GraphResponse(BaseModel):
+    root: int
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+    truncated: bool = Field(False, description="A node or edge limit cut the expansion short")
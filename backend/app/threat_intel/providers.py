@@ -0,0 +1,209 @@
+"""
+Threat intelligence provider adapters.
+
+Each adapter knows how to query one upstream service for the indicator
+types it supports and reduces the answer to a ``ProviderReport``. All
+adapters share the app-wide pooled HTTP client.
+"""
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+from app import vt_router
+from app.http_client import get_http_client
+from app.metrics import upstream_call
+from app.threat_intel.models import IndicatorType
+
+
+@dataclass
+class ProviderReport:
+    """Normalized result of one provider lookup."""
+    provider: str
+    score: int
+    detected: bool
+    confidence: int
+    report_time: datetime = field(default_factory=datetime.now)
+    categories: List[str] = field(default_factory=list)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def provider_data(self) -> Dict[str, Any]:
+        """Shape expected by ``ProviderData``."""
+        return {
+            "detected": self.detected,
+            "confidence": self.confidence,
+            "report_time": self.report_time,
+            "categories": self.categories or None,
+        }
+
+
+class ProviderError(Exception):
+    """A provider answered with something we cannot use."""
+
+
+class ProviderAdapter:
+    """
+    Base class for provider adapters.
+
+    Args:
+        api_key: Credential for the provider; adapters without a key are disabled
+        base_url: API root, overridable for local fakes
+    """
+
+    name = ""
+    indicator_types: Tuple[IndicatorType, ...] = ()
+
+    def __init__(self, api_key: Optional[str], base_url: str):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def supports(self, indicator_type: IndicatorType) -> bool:
+        return indicator_type in self.indicator_types
+
+    async def query(self, indicator: str, indicator_type: IndicatorType) -> ProviderReport:
+        raise NotImplementedError
+
+    async def _get_json(self, url: str, **kwargs) -> dict:
+        with upstream_call(self.name) as call:
+            r = await get_http_client().get(url, **kwargs)
+            call.status = r.status_code
+        return self._json(r)
+
+    def _json(self, r: "httpx.Response") -> dict:
+        if r.status_code == 404:
+            return {}
+        if r.status_code != 200:
+            raise ProviderError(f"{self.name} returned HTTP {r.status_code}")
+        return r.json()
+
+
+class VirusTotalAdapter(ProviderAdapter):
+    """VirusTotal v2; goes through vt_router's key pool so quota is shared."""
+
+    name = "virustotal"
+    indicator_types = (IndicatorType.IP, IndicatorType.DOMAIN, IndicatorType.URL, IndicatorType.FILE_HASH)
+    _endpoints = {
+        IndicatorType.IP: ("/ip-address/report", "ip"),
+        IndicatorType.DOMAIN: ("/domain/report", "domain"),
+        IndicatorType.URL: ("/url/report", "resource"),
+        IndicatorType.FILE_HASH: ("/file/report", "resource"),
+    }
+
+    def __init__(self):
+        super().__init__(",".join(vt_router.VT_API_KEYS), vt_router.VT_BASE_URL)
+
+    async def query(self, indicator: str, indicator_type: IndicatorType) -> ProviderReport:
+        path, param = self._endpoints[indicator_type]
+        data = self._json(await vt_router.vt_get(path, {param: indicator}))
+
+        if "positives" in data:  # url / file reports
+            total = data.get("total") or 1
+            score = round(100 * data["positives"] / total)
+            detected = data["positives"] > 0
+        else:  # ip / domain reports list URLs seen malicious on that host
+            flagged = [u for u in data.get("detected_urls", []) if u.get("positives", 0) > 0]
+            score = min(100, 10 * len(flagged))
+            detected = bool(flagged)
+
+        categories = data.get("categories") or []
+        return ProviderReport(
+            provider=self.name, score=score, detected=detected,
+            confidence=score if detected else 100 - score,
+            categories=list(categories.values()) if isinstance(categories, dict) else list(categories),
+            meta={"country_code": data.get("country")} if data.get("country") else {},
+        )
+
+
+class AbuseIPDBAdapter(ProviderAdapter):
+    name = "abuseipdb"
+    indicator_types = (IndicatorType.IP,)
+
+    async def query(self, indicator: str, indicator_type: IndicatorType) -> ProviderReport:
+        data = (await self._get_json(
+            f"{self.base_url}/check",
+            params={"ipAddress": indicator, "maxAgeInDays": 90},
+            headers={"Key": self.api_key, "Accept": "application/json"},
+        )).get("data", {})
+        score = int(data.get("abuseConfidenceScore", 0))
+        return ProviderReport(
+            provider=self.name, score=score, detected=score >= 25, confidence=score,
+            categories=[data["usageType"]] if data.get("usageType") else [],
+            meta={
+                "country_code": data.get("countryCode"),
+                "community_reports": data.get("totalReports", 0),
+            },
+        )
+
+
+class OTXAdapter(ProviderAdapter):
+    name = "otx"
+    indicator_types = (IndicatorType.IP, IndicatorType.DOMAIN, IndicatorType.URL, IndicatorType.FILE_HASH)
+    _sections = {
+        IndicatorType.IP: "IPv4",
+        IndicatorType.DOMAIN: "domain",
+        IndicatorType.URL: "url",
+        IndicatorType.FILE_HASH: "file",
+    }
+
+    async def query(self, indicator: str, indicator_type: IndicatorType) -> ProviderReport:
+        data = await self._get_json(
+            f"{self.base_url}/indicators/{self._sections[indicator_type]}/{indicator}/general",
+            headers={"X-OTX-API-KEY": self.api_key},
+        )
+        pulses = data.get("pulse_info", {})
+        count = int(pulses.get("count", 0))
+        tags = sorted({tag for p in pulses.get("pulses", []) for tag in p.get("tags", [])})
+        score = min(100, 10 * count)
+        return ProviderReport(
+            provider=self.name, score=score, detected=count > 0,
+            confidence=min(100, 50 + 5 * count) if count else 50,
+            categories=tags[:10],
+            meta={"community_reports": count},
+        )
+
+
+class URLScanAdapter(ProviderAdapter):
+    name = "urlscan"
+    indicator_types = (IndicatorType.IP, IndicatorType.DOMAIN, IndicatorType.URL)
+    _fields = {
+        IndicatorType.IP: "ip",
+        IndicatorType.DOMAIN: "domain",
+        IndicatorType.URL: "page.url",
+    }
+
+    async def query(self, indicator: str, indicator_type: IndicatorType) -> ProviderReport:
+        data = await self._get_json(
+            f"{self.base_url}/search/",
+            params={"q": f'{self._fields[indicator_type]}:"{indicator}"', "size": 100},
+            headers={"API-Key": self.api_key},
+        )
+        results = data.get("results", [])
+        malicious = sum(
+            1 for r in results if r.get("verdicts", {}).get("overall", {}).get("malicious")
+        )
+        score = round(100 * malicious / len(results)) if results else 0
+        return ProviderReport(
+            provider=self.name, score=score, detected=malicious > 0,
+            confidence=min(100, 40 + 6 * len(results)) if results else 40,
+            meta={"scans": len(results)},
+        )
+
+
+def default_adapters() -> List[ProviderAdapter]:
+    """Adapters configured from the environment (see .env.example)."""
+    return [
+        VirusTotalAdapter(),
+        AbuseIPDBAdapter(os.getenv("ABUSEIPDB_API_KEY"),
+                         os.getenv("ABUSEIPDB_BASE_URL", "https://api.abuseipdb.com/api/v2")),
+        OTXAdapter(os.getenv("OTX_API_KEY"),
+                   os.getenv("OTX_BASE_URL", "https://otx.alienvault.com/api/v1")),
+        URLScanAdapter(os.getenv("URLSCAN_API_KEY"),
+                       os.getenv("URLSCAN_BASE_URL", "https://urlscan.io/api/v1")),
+    ]
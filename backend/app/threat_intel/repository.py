@@ -0,0 +1,963 @@
+"""
+Repository layer for persisted threat intelligence.
+
+Reads and writes of the threat_intelligence schema go through
+``IndicatorRepository`` on an ``AsyncSession``. Writes are set-based
+(multi-row ``INSERT ... ON CONFLICT`` and executemany inserts) and reads
+load related rows with one extra query per relation, never one per row.
+
+Trend reports are served from ``threat_daily_rollups`` (adjusted by the
+per-row deltas of each upsert, rebuilt by day for bulk loads) and kept in
+``analytics_reports`` until the rollups they were computed from change.
+"""
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    DateTime, Integer, String, and_, bindparam, case, cast, delete, func, insert, literal, null, or_,
+    select, text, union_all, update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.threat_intel.db_models import (
+    AnalyticsReport, DailyRollup, IndicatorRelationship, IndicatorTag, ProviderReportRecord,
+    ThreatIntel, ThreatTag
+)
+from app.threat_intel.models import (
+    IndicatorType, SearchFilters, SearchRequest, TrendData, decode_search_cursor,
+    encode_search_cursor
+)
+from app.threat_intel.scoring import DEFAULT_WEIGHTS, ScoringWeights, score_batch
+
+# Rows per multi-row statement; keeps bind parameters under driver limits
+UPSERT_CHUNK = 1000
+
+# count_mode="estimated" stops counting matches past this many rows
+SEARCH_COUNT_CAP = int(os.getenv("THREAT_INTEL_COUNT_CAP", "10000"))
+
+# Rows fetched per round trip when streaming an export
+EXPORT_BATCH = int(os.getenv("THREAT_INTEL_EXPORT_BATCH", "500"))
+
+# Days recomputed per rollup refresh statement
+ROLLUP_CHUNK = 100
+
+# Stored trend reports are recomputed after this many seconds even if the
+# rollups look unchanged (bounds staleness from in-flight ingest transactions)
+TRENDS_REPORT_TTL = int(os.getenv("THREAT_INTEL_TRENDS_REPORT_TTL", "300"))
+
+# Graph expansion bounds: defaults and ceilings for a single /graph call
+GRAPH_MAX_DEPTH = int(os.getenv("THREAT_INTEL_GRAPH_MAX_DEPTH", "4"))
+GRAPH_MAX_NODES = int(os.getenv("THREAT_INTEL_GRAPH_MAX_NODES", "500"))
+GRAPH_MAX_EDGES = int(os.getenv("THREAT_INTEL_GRAPH_MAX_EDGES", "2000"))
+
+# Indicators scored and written per round trip by ``rescore``
+RESCORE_BATCH = int(os.getenv("THREAT_INTEL_RESCORE_BATCH", "5000"))
+
+IndicatorKey = Tuple[str, str]
+
+# (day, indicator_type, country_code) of a ``threat_daily_rollups`` row
+RollupKey = Tuple[date, str, str]
+
+
+def _value(indicator_type) -> str:
+    return IndicatorType(indicator_type).value
+
+
+def _like_escape(query: str) -> str:
+    """Make user input literal inside a LIKE pattern (escape char is backslash)."""
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _as_date(value) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _as_datetime(value) -> datetime:
+    """func.date() yields a string on SQLite and a date on PostgreSQL."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+
+class IndicatorRepository:
+    """
+    Data access for indicators, provider reports and relationships.
+
+    Args:
+        session: Async session; callers own commit/rollback
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _insert(self, table):
+        """Dialect-specific INSERT that supports ON CONFLICT."""
+        if self.session.bind.dialect.name == "postgresql":
+            return postgresql.insert(table)
+        return sqlite.insert(table)
+
+    # ------------------------------------------------------------------
+    #  Writes
+    # ------------------------------------------------------------------
+    async def upsert_indicators(self, rows: Iterable[Dict[str, Any]],
+                                refresh_rollups: bool = True) -> Dict[IndicatorKey, int]:
+        """
+        Insert or refresh indicators in multi-row ``INSERT ... ON CONFLICT``
+        statements keyed on (indicator, indicator_type).
+
+        Args:
+            rows: Indicator dicts (indicator, indicator_type, risk_score, ...)
+            refresh_rollups: Apply each row's change to the daily rollups;
+                bulk loaders pass False and call ``refresh_rollups`` once at the end
+
+        Returns:
+            Mapping of (indicator, indicator_type) to row id
+        """
+        now = datetime.now()
+        # one row per key: ON CONFLICT cannot touch the same row twice per statement
+        unique: Dict[IndicatorKey, Dict[str, Any]] = {}
+        for row in rows:
+            key = (row["indicator"], _value(row["indicator_type"]))
+            unique[key] = {
+                "indicator": key[0],
+                "indicator_type": key[1],
+                "risk_score": row.get("risk_score", 0),
+                "first_seen": row.get("first_seen") or now,
+                "last_seen": row.get("last_seen") or now,
+                "last_analysis": now,
+                "analysis_count": 1,
+                "indicator_metadata": row.get("indicator_metadata") or {},
+                "malware_data": row.get("malware_data") or {},
+            }
+
+        ids: Dict[IndicatorKey, int] = {}
+        deltas: Dict[RollupKey, List[int]] = {}
+        country = func.coalesce(_country_code(), "")
+        values = list(unique.values())
+        for start in range(0, len(values), UPSERT_CHUNK):
+            chunk = values[start:start + UPSERT_CHUNK]
+            if refresh_rollups:
+                # take the rows' current contribution out of the rollups; on
+                # PostgreSQL the row locks keep concurrent upserts from both
+                # subtracting the same old state
+                keys = {(row["indicator"], row["indicator_type"]) for row in chunk}
+                old = select(ThreatIntel.indicator, ThreatIntel.indicator_type, ThreatIntel.first_seen,
+                             ThreatIntel.risk_score, country) \
+                    .where(ThreatIntel.indicator.in_({indicator for indicator, _ in keys}))
+                if self.session.bind.dialect.name == "postgresql":
+                    old = old.with_for_update()
+                for indicator, indicator_type, first_seen, risk_score, code in \
+                        await self.session.execute(old):
+                    if (indicator, indicator_type) in keys and first_seen is not None:
+                        _add_delta(deltas, (_as_date(first_seen), indicator_type, code), -1, -risk_score)
+            stmt = self._insert(ThreatIntel).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ThreatIntel.indicator, ThreatIntel.indicator_type],
+                set_={
+                    "risk_score": stmt.excluded.risk_score,
+                    "last_seen": stmt.excluded.last_seen,
+                    "last_analysis": stmt.excluded.last_analysis,
+                    "analysis_count": ThreatIntel.analysis_count + 1,
+                    "indicator_metadata": stmt.excluded.indicator_metadata,
+                    "malware_data": stmt.excluded.malware_data,
+                },
+            ).returning(ThreatIntel.id, ThreatIntel.indicator, ThreatIntel.indicator_type,
+                        ThreatIntel.first_seen, ThreatIntel.risk_score, country)
+            result = await self.session.execute(stmt)
+            for row_id, indicator, indicator_type, first_seen, risk_score, code in result:
+                ids[(indicator, indicator_type)] = row_id
+                if refresh_rollups:
+                    _add_delta(deltas, (_as_date(first_seen), indicator_type, code), 1, risk_score)
+        if refresh_rollups:
+            await self.apply_rollup_deltas(deltas)
+        return ids
+
+    async def load_feed_indicators(self, rows: List[Dict[str, Any]], source: str,
+                                   now: Optional[datetime] = None) -> int:
+        """
+        Load de-duplicated feed indicators (indicator, indicator_type,
+        risk_score). New indicators are inserted unanalyzed (no
+        ``last_analysis``, so lookups still query providers); known ones only
+        get ``last_seen`` refreshed.
+
+        PostgreSQL copies the batch into a temporary staging table with COPY
+        and merges it in one ``INSERT ... SELECT ... ON CONFLICT``; other
+        databases run the upsert as one executemany. Daily rollups are left to
+        the caller.
+
+        Args:
+            rows: De-duplicated indicator dicts
+            source: Feed name recorded in the new rows' metadata
+            now: First/last seen time written (default: the current time)
+
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+        now = now or datetime.now()
+        metadata = {"sources": [source]}
+        if self.session.bind.dialect.name == "postgresql":
+            # issued through the session first so COPY runs inside its transaction
+            await self.session.execute(text(
+                "CREATE TEMP TABLE IF NOT EXISTS feed_stage "
+                "(indicator text, indicator_type varchar(20), risk_score integer) "
+                "ON COMMIT DELETE ROWS"
+            ))
+            conn = await (await self.session.connection()).get_raw_connection()
+            await conn.driver_connection.copy_records_to_table(
+                "feed_stage",
+                records=[(r["indicator"], r["indicator_type"], r["risk_score"]) for r in rows],
+                columns=["indicator", "indicator_type", "risk_score"],
+            )
+            await self.session.execute(text(
+                "INSERT INTO threat_intelligence (indicator, indicator_type, risk_score, first_seen, "
+                "last_seen, last_analysis, analysis_count, indicator_metadata, malware_data) "
+                "SELECT indicator, indicator_type, risk_score, :now, :now, NULL, 0, "
+                "CAST(:metadata AS jsonb), '{}'::jsonb FROM feed_stage "
+                "ON CONFLICT (indicator, indicator_type) DO UPDATE SET last_seen = EXCLUDED.last_seen"
+            ), {"now": now, "metadata": json.dumps(metadata)})
+            await self.session.execute(text("TRUNCATE feed_stage"))
+            return len(rows)
+
+        # one statement compiled once and run as a driver-level executemany;
+        # the Core table (not the ORM entity) so None is written as NULL
+        # instead of falling back to the column's server default
+        stmt = self._insert(ThreatIntel.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ThreatIntel.indicator, ThreatIntel.indicator_type],
+            set_={"last_seen": stmt.excluded.last_seen},
+        )
+        await self.session.execute(stmt, [
+            {**row, "first_seen": now, "last_seen": now, "last_analysis": None,
+             "analysis_count": 0, "indicator_metadata": metadata, "malware_data": {}}
+            for row in rows
+        ])
+        return len(rows)
+
+    async def rescore(self, weights: ScoringWeights = DEFAULT_WEIGHTS,
+                      batch_size: int = RESCORE_BATCH,
+                      now: Optional[datetime] = None) -> int:
+        """
+        Recompute ``risk_score`` and confidence of every analyzed indicator.
+
+        Rows are read in id order a batch at a time (indicators, latest
+        provider reports and relationship counts in three queries), scored
+        with one vectorized ``score_batch`` call and written back with one
+        executemany per batch; only rows whose scores change are updated.
+        Each batch is committed. Feed-only rows (never analyzed) keep the
+        feed's score.
+
+        Returns:
+            Number of indicators whose scores changed
+        """
+        now = now or datetime.now()
+        table = ThreatIntel.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(risk_score=bindparam("b_risk_score"), indicator_metadata=bindparam("b_metadata"))
+        )
+        after, changed = 0, 0
+        while True:
+            rows = (await self.session.execute(
+                select(ThreatIntel.id, ThreatIntel.indicator_type, ThreatIntel.first_seen,
+                       ThreatIntel.last_seen, ThreatIntel.risk_score, ThreatIntel.indicator_metadata,
+                       ThreatIntel.malware_data, func.coalesce(_country_code(), "").label("country_code"))
+                .where(ThreatIntel.id > after, ThreatIntel.last_analysis.is_not(None))
+                .order_by(ThreatIntel.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            after = ids[-1]
+            providers = await self.latest_providers(ids)
+            related = await self.related_counts(ids)
+
+            risk, confidence = score_batch([
+                {
+                    "providers": providers.get(row.id, {}),
+                    "malware": row.malware_data,
+                    "risk_factors": {**((row.indicator_metadata or {}).get("risk_factors") or {}),
+                                     "related_threats": related.get(row.id, 0)},
+                    "first_seen": row.first_seen,
+                    "last_seen": row.last_seen,
+                }
+                for row in rows
+            ], weights, now)
+            updates = []
+            deltas: Dict[RollupKey, List[int]] = {}
+            for row, new_risk, new_confidence in zip(rows, risk.tolist(), confidence.tolist()):
+                metadata = row.indicator_metadata or {}
+                if row.risk_score == new_risk and metadata.get("confidence") == new_confidence:
+                    continue
+                updates.append({"b_id": row.id, "b_risk_score": new_risk,
+                                "b_metadata": {**metadata, "confidence": new_confidence}})
+                if row.first_seen is not None:
+                    _add_delta(deltas, (_as_date(row.first_seen), row.indicator_type, row.country_code),
+                               0, new_risk - row.risk_score)
+            if updates:
+                await self.session.execute(stmt, updates)
+                await self.apply_rollup_deltas(deltas)
+            await self.session.commit()
+            changed += len(updates)
+        return changed
+
+    async def apply_rollup_deltas(self, deltas: Dict[RollupKey, List[int]]) -> None:
+        """
+        Add per-row changes ([indicator_count, risk_score_sum] per rollup
+        key) to ``threat_daily_rollups`` with one
+        ``INSERT ... ON CONFLICT DO UPDATE`` per chunk, so concurrent writers
+        add to the same rows instead of racing to rebuild them. Rows whose
+        count drops to zero are removed.
+        """
+        now = datetime.now()
+        # sorted, so concurrent writers lock shared rollup rows in the same order
+        values = [
+            {"day": day, "indicator_type": indicator_type, "country_code": code,
+             "indicator_count": count, "risk_score_sum": risk_sum, "updated_at": now}
+            for (day, indicator_type, code), (count, risk_sum) in sorted(deltas.items())
+            if count or risk_sum
+        ]
+        for start in range(0, len(values), UPSERT_CHUNK):
+            stmt = self._insert(DailyRollup).values(values[start:start + UPSERT_CHUNK])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DailyRollup.day, DailyRollup.indicator_type, DailyRollup.country_code],
+                set_={
+                    "indicator_count": DailyRollup.indicator_count + stmt.excluded.indicator_count,
+                    "risk_score_sum": DailyRollup.risk_score_sum + stmt.excluded.risk_score_sum,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            await self.session.execute(stmt)
+        if any(row["indicator_count"] < 0 for row in values):
+            await self.session.execute(delete(DailyRollup).where(
+                DailyRollup.day.in_({row["day"] for row in values}), DailyRollup.indicator_count <= 0
+            ))
+
+    async def refresh_rollups(self, days: Iterable[date]) -> None:
+        """
+        Recompute ``threat_daily_rollups`` for the given first-seen days.
+
+        Each day is rebuilt from its rows (a first_seen range scan); used to
+        backfill, after bulk loads and by the feed refresh job. Single writes
+        go through ``apply_rollup_deltas`` instead.
+        """
+        days = sorted(set(days))
+        now = datetime.now()
+        for start in range(0, len(days), ROLLUP_CHUNK):
+            chunk = days[start:start + ROLLUP_CHUNK]
+            in_chunk = or_(*[
+                and_(ThreatIntel.first_seen >= datetime.combine(d, time.min),
+                     ThreatIntel.first_seen < datetime.combine(d + timedelta(days=1), time.min))
+                for d in chunk
+            ])
+            # label the expressions in a subquery so GROUP BY repeats no bind parameters
+            rows = select(
+                func.date(ThreatIntel.first_seen).label("day"),
+                ThreatIntel.indicator_type,
+                func.coalesce(_country_code(), "").label("country_code"),
+                ThreatIntel.risk_score,
+            ).where(in_chunk).subquery()
+            source = select(
+                rows.c.day, rows.c.indicator_type, rows.c.country_code,
+                func.count(), func.coalesce(func.sum(rows.c.risk_score), 0),
+                literal(now, DateTime),
+            ).where(rows.c.day.is_not(None)).group_by(rows.c.day, rows.c.indicator_type, rows.c.country_code)
+
+            await self.session.execute(delete(DailyRollup).where(DailyRollup.day.in_(chunk)))
+            # a delta committed between the DELETE and the INSERT is overwritten, not a key violation
+            stmt = self._insert(DailyRollup).from_select(
+                ["day", "indicator_type", "country_code", "indicator_count",
+                 "risk_score_sum", "updated_at"],
+                source,
+            )
+            await self.session.execute(stmt.on_conflict_do_update(
+                index_elements=[DailyRollup.day, DailyRollup.indicator_type, DailyRollup.country_code],
+                set_={"indicator_count": stmt.excluded.indicator_count,
+                      "risk_score_sum": stmt.excluded.risk_score_sum,
+                      "updated_at": stmt.excluded.updated_at},
+            ))
+
+    async def ensure_rollups(self) -> None:
+        """Backfill the rollups from existing indicators if there are none yet."""
+        if (await self.session.execute(select(DailyRollup.day).limit(1))).first():
+            return
+        days = (await self.session.execute(
+            select(func.date(ThreatIntel.first_seen)).distinct()
+        )).scalars().all()
+        if days:
+            await self.refresh_rollups(_as_date(d) for d in days if d is not None)
+            await self.session.commit()
+
+    async def add_relationships(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Upsert relationships (source_id, target_id, relationship_type,
+        confidence) in one executemany; known pairs get their type,
+        confidence and ``last_seen`` refreshed.
+        """
+        if not rows:
+            return
+        now = datetime.now()
+        stmt = self._insert(IndicatorRelationship.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IndicatorRelationship.source_id, IndicatorRelationship.target_id],
+            set_={
+                "relationship_type": stmt.excluded.relationship_type,
+                "confidence": stmt.excluded.confidence,
+                "last_seen": stmt.excluded.last_seen,
+            },
+        )
+        await self.session.execute(stmt, [
+            {"relationship_type": None, "confidence": 50, **row, "first_seen": now, "last_seen": now}
+            for row in rows
+        ])
+
+    async def add_tags(self, assignments: Dict[int, Iterable[str]]) -> None:
+        """
+        Tag indicators: ``{indicator_id: [tag name, ...]}``. Unknown tags are
+        created; existing assignments are left as they are.
+        """
+        pairs = {(indicator_id, name) for indicator_id, names in assignments.items() for name in names}
+        if not pairs:
+            return
+        names = sorted({name for _, name in pairs})
+        await self.session.execute(
+            self._insert(ThreatTag.__table__).on_conflict_do_nothing(index_elements=[ThreatTag.name]),
+            [{"name": name} for name in names],
+        )
+        tag_ids = dict((await self.session.execute(
+            select(ThreatTag.name, ThreatTag.id).where(ThreatTag.name.in_(names))
+        )).all())
+        now = datetime.now()
+        await self.session.execute(
+            self._insert(IndicatorTag.__table__).on_conflict_do_nothing(),
+            [{"indicator_id": indicator_id, "tag_id": tag_ids[name], "added_at": now}
+             for indicator_id, name in sorted(pairs)],
+        )
+
+    async def add_provider_reports(self, reports: List[Dict[str, Any]]) -> None:
+        """Bulk-insert provider reports (one executemany round trip)."""
+        if reports:
+            await self.session.execute(insert(ProviderReportRecord), reports)
+
+    async def save_indicator(self, data: Dict[str, Any]) -> int:
+        """
+        Persist one analyzed indicator (``ThreatIndicator`` shape) and the
+        provider reports it was built from.
+        """
+        metadata = {
+            "confidence": data.get("confidence"),
+            "geolocation": data.get("geolocation"),
+            "asn_details": data.get("asn_details"),
+            "risk_factors": data.get("risk_factors"),
+            "threat_types": [getattr(t, "value", t) for t in data.get("threat_types", [])],
+        }
+        ids = await self.upsert_indicators([{
+            "indicator": data["indicator"],
+            "indicator_type": data["indicator_type"],
+            "risk_score": data["risk_score"],
+            "indicator_metadata": {k: v for k, v in metadata.items() if v is not None},
+            "malware_data": data.get("malware", {}),
+        }])
+        indicator_id = ids[(data["indicator"], _value(data["indicator_type"]))]
+        await self.add_provider_reports([
+            {
+                "indicator_id": indicator_id,
+                "provider": provider,
+                "report_time": report["report_time"],
+                "detected": report["detected"],
+                "confidence": report["confidence"],
+                "categories": report.get("categories"),
+                "raw_data": {},
+            }
+            for provider, report in data.get("providers", {}).items()
+        ])
+        await self.session.commit()
+        return indicator_id
+
+    # ------------------------------------------------------------------
+    #  Reads
+    # ------------------------------------------------------------------
+    async def related_counts(self, ids: List[int]) -> Dict[int, int]:
+        """Relationship count per indicator id, for a whole page in one query."""
+        if not ids:
+            return {}
+        edges = union_all(
+            select(IndicatorRelationship.source_id.label("id"))
+            .where(IndicatorRelationship.source_id.in_(ids)),
+            select(IndicatorRelationship.target_id.label("id"))
+            .where(IndicatorRelationship.target_id.in_(ids)),
+        ).subquery()
+        rows = await self.session.execute(
+            select(edges.c.id, func.count()).group_by(edges.c.id)
+        )
+        return dict(rows.all())
+
+    async def latest_providers(self, ids: List[int]) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """
+        Newest report of each provider per indicator id, for a whole page in
+        one query. A window function ranks the reports, so older re-analyses
+        are neither returned nor loaded into the session.
+        """
+        if not ids:
+            return {}
+        report = ProviderReportRecord
+        ranked = select(
+            report.indicator_id, report.provider, report.detected, report.confidence,
+            report.report_time, report.categories,
+            func.row_number().over(
+                partition_by=(report.indicator_id, report.provider),
+                order_by=(report.report_time.desc(), report.id.desc()),
+            ).label("rank"),
+        ).where(report.indicator_id.in_(ids)).subquery()
+        rows = await self.session.execute(
+            select(ranked.c.indicator_id, ranked.c.provider, ranked.c.detected, ranked.c.confidence,
+                   ranked.c.report_time, ranked.c.categories)
+            .where(ranked.c.rank == 1)
+        )
+        providers: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for indicator_id, provider, detected, confidence, report_time, categories in rows:
+            providers.setdefault(indicator_id, {})[provider] = {
+                "detected": bool(detected),
+                "confidence": confidence or 0,
+                "report_time": report_time,
+                "categories": categories or None,
+            }
+        return providers
+
+    async def _to_dicts(self, rows: List[ThreatIntel]) -> List[Dict[str, Any]]:
+        ids = [row.id for row in rows]
+        providers = await self.latest_providers(ids)
+        related = await self.related_counts(ids)
+        return [to_indicator_dict(row, providers.get(row.id, {}), related.get(row.id, 0)) for row in rows]
+
+    async def get_indicator(self, indicator: str,
+                            indicator_type: IndicatorType) -> Optional[Dict[str, Any]]:
+        """Stored indicator in ``ThreatIndicator`` shape, or None."""
+        row = (await self.session.execute(
+            select(ThreatIntel)
+            .where(ThreatIntel.indicator == indicator,
+                   ThreatIntel.indicator_type == _value(indicator_type))
+        )).scalar_one_or_none()
+        if row is None:
+            return None
+        return (await self._to_dicts([row]))[0]
+
+    async def indicator_version(self, indicator: str,
+                                indicator_type: IndicatorType) -> Optional[Tuple[Any, ...]]:
+        """
+        Everything ``get_indicator`` builds its answer from, except the
+        provider reports (which change only with ``last_analysis``), or None.
+
+        Cheap enough to run on every conditional request: one indexed row and
+        a relationship count, no report rows and no dict building.
+        """
+        rel = IndicatorRelationship
+        related = (
+            select(func.count()).select_from(rel)
+            .where(or_(rel.source_id == ThreatIntel.id, rel.target_id == ThreatIntel.id))
+            .scalar_subquery()
+        )
+        row = (await self.session.execute(
+            select(ThreatIntel.last_analysis, ThreatIntel.last_seen, ThreatIntel.first_seen,
+                   ThreatIntel.risk_score, ThreatIntel.analysis_count,
+                   ThreatIntel.indicator_metadata, ThreatIntel.malware_data, related)
+            .where(ThreatIntel.indicator == indicator,
+                   ThreatIntel.indicator_type == _value(indicator_type))
+        )).first()
+        return tuple(row) if row is not None else None
+
+    def _search_filters(self, request: SearchFilters) -> list:
+        filters = []
+        if request.indicator_type:
+            filters.append(ThreatIntel.indicator_type == _value(request.indicator_type))
+        if request.min_risk_score is not None:
+            filters.append(ThreatIntel.risk_score >= request.min_risk_score)
+        if request.max_risk_score is not None:
+            filters.append(ThreatIntel.risk_score <= request.max_risk_score)
+        if request.tags_all:
+            names = set(request.tags_all)
+            filters.append(ThreatIntel.id.in_(
+                _tagged(names).group_by(IndicatorTag.indicator_id).having(func.count() == len(names))
+            ))
+        if request.tags_any:
+            filters.append(ThreatIntel.id.in_(_tagged(request.tags_any)))
+        if request.query:
+            pattern = _like_escape(request.query)
+            if request.match == "prefix":
+                # served by the lower(indicator) text_pattern_ops index
+                filters.append(func.lower(ThreatIntel.indicator).like(f"{pattern.lower()}%", escape="\\"))
+            else:
+                # served by the pg_trgm GIN index on PostgreSQL
+                filters.append(ThreatIntel.indicator.ilike(f"%{pattern}%", escape="\\"))
+        return filters
+
+    async def _count(self, filters: list, count_mode: str) -> Tuple[int, bool]:
+        """
+        Number of matching rows and whether it is an estimate.
+
+        ``estimated`` uses the planner's row count for unfiltered PostgreSQL
+        queries and otherwise stops counting at ``SEARCH_COUNT_CAP``.
+        """
+        if count_mode == "estimated":
+            if not filters and self.session.bind.dialect.name == "postgresql":
+                reltuples = (await self.session.execute(text(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = 'threat_intelligence'"
+                ))).scalar()
+                if reltuples is not None and reltuples >= 0:
+                    return int(reltuples), True
+            capped = select(ThreatIntel.id).where(*filters).limit(SEARCH_COUNT_CAP + 1).subquery()
+            count = (await self.session.execute(
+                select(func.count()).select_from(capped)
+            )).scalar_one()
+            return min(count, SEARCH_COUNT_CAP), count > SEARCH_COUNT_CAP
+
+        count = (await self.session.execute(
+            select(func.count()).select_from(ThreatIntel).where(*filters)
+        )).scalar_one()
+        return count, False
+
+    async def search(self, request: SearchRequest) -> Dict[str, Any]:
+        """
+        Filter, count and page indicators in the database.
+
+        Pages are ordered by (risk_score DESC, id). With ``request.cursor``
+        the page starts right after the cursor row (keyset pagination, cost
+        independent of depth); otherwise ``offset`` is applied.
+
+        Returns:
+            Dict in ``SearchResponse`` shape
+        """
+        filters = self._search_filters(request)
+        query = select(ThreatIntel).where(*filters)
+        if request.cursor:
+            last_score, last_id = decode_search_cursor(request.cursor)
+            query = query.where(or_(
+                ThreatIntel.risk_score < last_score,
+                and_(ThreatIntel.risk_score == last_score, ThreatIntel.id > last_id),
+            ))
+        else:
+            query = query.offset(request.offset)
+
+        # one extra row tells us whether another page exists
+        rows = list((await self.session.execute(
+            query.order_by(ThreatIntel.risk_score.desc(), ThreatIntel.id)
+            .limit(request.limit + 1)
+        )).scalars().all())
+        has_more = len(rows) > request.limit
+        rows = rows[:request.limit]
+
+        total_count, estimated = await self._count(filters, request.count_mode)
+        return {
+            "indicators": await self._to_dicts(rows),
+            "total_count": total_count,
+            "has_more": has_more,
+            "next_cursor": encode_search_cursor(rows[-1].risk_score, rows[-1].id) if has_more else None,
+            "count_is_estimate": estimated,
+            "facets": await self.facets(request, filters) if request.facets else None,
+        }
+
+    async def facets(self, request: SearchFilters, filters: list) -> Dict[str, Any]:
+        """
+        Facet counts (tag, indicator type, risk bucket) of all rows matching
+        ``request``, from the per-worker ``facet_index``.
+
+        Structured filters are applied to the index directly. A text query
+        cannot be, so its matching ids are read from the database first, up
+        to ``SEARCH_COUNT_CAP`` of them. The index is synced in the
+        background, so counts may lag writes by ``THREAT_INTEL_FACET_REFRESH``.
+        """
+        # imported here so NumPy loads with the first faceted search, not with the app
+        from app.threat_intel.facets import facet_index
+
+        await facet_index.ensure()
+        ids, estimated = None, False
+        if request.query:
+            ids = list((await self.session.execute(
+                select(ThreatIntel.id).where(*filters).limit(SEARCH_COUNT_CAP + 1)
+            )).scalars())
+            estimated = len(ids) > SEARCH_COUNT_CAP
+            ids = ids[:SEARCH_COUNT_CAP]
+        return {**facet_index.counts(request, ids), "is_estimate": estimated}
+
+    async def export(self, filters: SearchFilters, max_rows: Optional[int] = None,
+                     batch_size: int = EXPORT_BATCH) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream every indicator matching ``filters`` in id order, as lists of
+        ``ThreatIndicator``-shaped dicts of up to ``batch_size`` rows.
+
+        Rows come from a server-side cursor (``yield_per``), and provider
+        reports and relationship counts are loaded once per batch, so memory
+        is bounded by the batch size rather than the result size.
+        """
+        query = select(ThreatIntel).where(*self._search_filters(filters)).order_by(ThreatIntel.id)
+        if max_rows:
+            query = query.limit(max_rows)
+        result = await self.session.stream_scalars(query.execution_options(yield_per=batch_size))
+        # the session's identity map holds rows weakly, so each batch is
+        # released once its dicts have been yielded
+        async for rows in result.partitions():
+            yield await self._to_dicts(rows)
+
+    async def expand(self, indicator: str, indicator_type: IndicatorType, depth: int = 2,
+                     relationship_types: Optional[List[str]] = None, min_confidence: int = 0,
+                     max_nodes: int = GRAPH_MAX_NODES,
+                     max_edges: int = GRAPH_MAX_EDGES) -> Optional[Dict[str, Any]]:
+        """
+        Breadth-first expansion of the relationship graph around an indicator.
+
+        Relationships are followed in both directions. The walk is one
+        recursive CTE: each step joins the previous frontier to the
+        (filtered) edges, never stepping straight back to the node it came
+        from. Rows arrive in depth order, so reading at most ``max_edges``
+        of them bounds the work the database does on dense graphs; nodes
+        beyond ``max_nodes`` are dropped with their edges.
+
+        Returns:
+            ``GraphResponse`` shape, or None if the indicator is unknown
+        """
+        root = (await self.session.execute(
+            select(ThreatIntel.id).where(ThreatIntel.indicator == indicator,
+                                         ThreatIntel.indicator_type == _value(indicator_type))
+        )).scalar_one_or_none()
+        if root is None:
+            return None
+
+        rel = IndicatorRelationship
+        walk = select(
+            ThreatIntel.id.label("node"),
+            ThreatIntel.id.label("parent"),
+            cast(0, Integer).label("depth"),
+            cast(null(), Integer).label("source_id"),
+            cast(null(), Integer).label("target_id"),
+            cast(null(), String(50)).label("relationship_type"),
+            cast(null(), Integer).label("confidence"),
+        ).where(ThreatIntel.id == root).cte("walk", recursive=True)
+        # OR join so each direction is an index lookup (primary key / target_id index)
+        far = case((rel.source_id == walk.c.node, rel.target_id), else_=rel.source_id)
+        conditions = [walk.c.depth < depth, far != walk.c.parent]
+        if relationship_types:
+            conditions.append(rel.relationship_type.in_(relationship_types))
+        if min_confidence:
+            conditions.append(rel.confidence >= min_confidence)
+        walk = walk.union_all(
+            select(far, walk.c.node, walk.c.depth + 1, rel.source_id, rel.target_id,
+                   rel.relationship_type, rel.confidence)
+            .select_from(walk.join(rel, or_(rel.source_id == walk.c.node, rel.target_id == walk.c.node)))
+            .where(*conditions)
+        )
+        # anchor row + max_edges steps + one more to detect truncation
+        steps = (await self.session.execute(select(walk).limit(max_edges + 2))).all()[1:]
+
+        truncated = len(steps) > max_edges
+        depths = {root: 0}
+        found: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for step in steps[:max_edges]:
+            if step.parent not in depths:
+                continue  # reached through a node dropped by max_nodes
+            if step.node not in depths:
+                if len(depths) >= max_nodes:
+                    truncated = True
+                    continue
+                depths[step.node] = step.depth
+            found.setdefault((step.source_id, step.target_id), {
+                "source": step.source_id, "target": step.target_id,
+                "relationship_type": step.relationship_type, "confidence": step.confidence,
+            })
+
+        details = await self.session.execute(
+            select(ThreatIntel.id, ThreatIntel.indicator, ThreatIntel.indicator_type, ThreatIntel.risk_score)
+            .where(ThreatIntel.id.in_(list(depths)))
+        )
+        nodes = sorted(
+            ({"id": row_id, "indicator": value, "indicator_type": kind, "risk_score": score or 0,
+              "depth": depths[row_id]} for row_id, value, kind, score in details),
+            key=lambda node: (node["depth"], node["id"]),
+        )
+        return {"root": root, "nodes": nodes, "edges": list(found.values()), "truncated": truncated}
+
+    async def rollup_version(self, since: date) -> Optional[datetime]:
+        """Latest rollup refresh time for days on or after ``since``."""
+        return (await self.session.execute(
+            select(func.max(DailyRollup.updated_at)).where(DailyRollup.day >= since)
+        )).scalar()
+
+    async def trends_version(self, days: int) -> datetime:
+        """
+        When the ``days``-day trend report last changed: the latest rollup
+        refresh in its window, or the start of today (when the window moved).
+        """
+        today = date.today()
+        version = await self.rollup_version(today - timedelta(days=days - 1))
+        return max(version or datetime.min, datetime.combine(today, time.min))
+
+    async def trends(self, days: int,
+                     indicator_type: Optional[IndicatorType] = None) -> Dict[str, Any]:
+        """
+        Trend report in ``TrendData`` shape for the last ``days`` days.
+
+        Reuses the newest stored report from ``analytics_reports`` while it
+        is younger than ``TRENDS_REPORT_TTL``, from today, and newer than
+        every rollup in the window; otherwise computes it from the rollups
+        and stores it.
+        """
+        now = datetime.now()
+        since = now.date() - timedelta(days=days - 1)
+        report_type = f"trends:{_value(indicator_type) if indicator_type else 'all'}"
+
+        version = await self.rollup_version(since)
+        valid_after = max(
+            version or datetime.min,
+            datetime.combine(now.date(), time.min),
+            now - timedelta(seconds=TRENDS_REPORT_TTL),
+        )
+        stored = (await self.session.execute(
+            select(AnalyticsReport.report_data)
+            .where(AnalyticsReport.report_type == report_type,
+                   AnalyticsReport.time_period == days,
+                   AnalyticsReport.report_date >= valid_after)
+            .order_by(AnalyticsReport.report_date.desc()).limit(1)
+        )).scalar()
+        if stored is not None:
+            return stored
+
+        result = await self._trends_from_rollups(since, days, indicator_type)
+        await self.session.execute(
+            delete(AnalyticsReport).where(AnalyticsReport.report_type == report_type,
+                                          AnalyticsReport.time_period == days)
+        )
+        self.session.add(AnalyticsReport(
+            report_type=report_type,
+            report_date=now,
+            time_period=days,
+            report_data=TrendData(**result).model_dump(mode="json"),
+        ))
+        await self.session.commit()
+        return result
+
+    async def _trends_from_rollups(self, since: date, days: int,
+                                   indicator_type: Optional[IndicatorType]) -> Dict[str, Any]:
+        filters = [DailyRollup.day >= since]
+        if indicator_type:
+            filters.append(DailyRollup.indicator_type == _value(indicator_type))
+
+        count = func.sum(DailyRollup.indicator_count)
+        risk_sum = func.sum(DailyRollup.risk_score_sum)
+        points = (await self.session.execute(
+            select(DailyRollup.day, count, risk_sum)
+            .where(*filters).group_by(DailyRollup.day).order_by(DailyRollup.day.desc())
+        )).all()
+
+        type_distribution: Dict[str, int] = {}
+        if not indicator_type:
+            type_distribution = {t: int(n) for t, n in (await self.session.execute(
+                select(DailyRollup.indicator_type, count)
+                .where(*filters).group_by(DailyRollup.indicator_type)
+            )).all()}
+
+        geo = (await self.session.execute(
+            select(DailyRollup.country_code, count, risk_sum)
+            .where(*filters, DailyRollup.country_code != "")
+            .group_by(DailyRollup.country_code).order_by(count.desc()).limit(10)
+        )).all()
+
+        # a bounded top-5 over the last week's rows, via the first_seen index
+        recent = [ThreatIntel.first_seen >= datetime.combine(
+            max(since, date.today() - timedelta(days=6)), time.min)]
+        if indicator_type:
+            recent.append(ThreatIntel.indicator_type == _value(indicator_type))
+        emerging = (await self.session.execute(
+            select(ThreatIntel).where(*recent)
+            .order_by(ThreatIntel.risk_score.desc()).limit(5)
+        )).scalars().all()
+
+        return {
+            "time_period_days": days,
+            "total_indicators": sum(int(n) for _, n, _ in points),
+            "threat_type_distribution": type_distribution,
+            "geographic_distribution": [
+                {"country_code": code, "count": int(n), "avg_score": round(total / n) if n else 0}
+                for code, n, total in geo
+            ],
+            "risk_score_trends": [
+                {"date": _as_datetime(d), "count": int(n),
+                 "avg_risk_score": round(total / n) if n else 0}
+                for d, n, total in points
+            ],
+            "emerging_threats": [
+                {
+                    "indicator": row.indicator,
+                    "indicator_type": row.indicator_type,
+                    "risk_score": row.risk_score or 0,
+                    "first_seen": row.first_seen,
+                    "malware_types": sorted(row.malware_data or {}),
+                }
+                for row in emerging
+            ],
+        }
+
+
+def _tagged(names: Iterable[str]):
+    """Ids of indicators carrying any of the named tags (one row per assignment)."""
+    return (
+        select(IndicatorTag.indicator_id)
+        .join(ThreatTag, ThreatTag.id == IndicatorTag.tag_id)
+        .where(ThreatTag.name.in_(list(names)))
+    )
+
+
+def _add_delta(deltas: Dict[RollupKey, List[int]], key: RollupKey, count: int, risk_sum: int) -> None:
+    entry = deltas.setdefault(key, [0, 0])
+    entry[0] += count
+    entry[1] += risk_sum
+
+
+def _country_code():
+    """Country code stored in an indicator's geolocation metadata."""
+    return ThreatIntel.indicator_metadata[("geolocation", "country_code")].as_string()
+
+
+def to_indicator_dict(row: ThreatIntel, providers: Dict[str, Dict[str, Any]],
+                      related_threats: int = 0) -> Dict[str, Any]:
+    """
+    Map a stored row to the ``ThreatIndicator`` shape, with the latest
+    report per provider as returned by ``latest_providers``.
+    """
+    meta = row.indicator_metadata or {}
+
+    confidence = meta.get("confidence")
+    if confidence is None:
+        confidences = [p["confidence"] for p in providers.values()]
+        confidence = round(sum(confidences) / len(confidences)) if confidences else 0
+
+    risk_factors = meta.get("risk_factors")
+    if risk_factors:
+        risk_factors = {**risk_factors, "related_threats": related_threats}
+
+    return {
+        "indicator": row.indicator,
+        "indicator_type": row.indicator_type,
+        "risk_score": row.risk_score or 0,
+        "confidence": confidence,
+        "first_seen": row.first_seen,
+        "last_seen": row.last_seen,
+        "last_updated": row.last_analysis,
+        "analysis_count": row.analysis_count or 0,
+        "providers": providers,
+        "geolocation": meta.get("geolocation"),
+        "asn_details": meta.get("asn_details"),
+        "malware": row.malware_data or {},
+        "threat_types": meta.get("threat_types", []),
+        "risk_factors": risk_factors,
+    }
@@ -2,23 +2,57 @@
 Threat Intelligence API Router
 """
 import logging
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.async_database import AsyncSessionLocal, get_async_db
+from app.responses import FastJSONResponse, cache_headers, is_not_modified, make_etag, not_modified
 from app.threat_intel.models import (
     IndicatorType, 
     ThreatIndicator, 
     TrendData, 
     SearchRequest, 
     SearchResponse,
+    ExportRequest,
+    FeedStatus,
+    GraphResponse,
     ProviderStats
 )
 from app.threat_intel.mock_data import MockDataProvider
+from app.threat_intel.export import ENCODERS, MEDIA_TYPES, gzip_chunks
+from app.threat_intel.fanout import FanOutEngine, build_indicator
+from app.threat_intel.providers import default_adapters
+from app.threat_intel.db_models import ThreatFeed
+from app.threat_intel.repository import (
+    GRAPH_MAX_DEPTH, GRAPH_MAX_EDGES, GRAPH_MAX_NODES, IndicatorRepository
+)
+from app.threat_intel.scheduler import feed_scheduler
+from app.singleflight import SingleFlight
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/threat-intel", tags=["Threat Intelligence"])
 
+# Coalesces concurrent analyses of the same indicator into one provider lookup
+_indicator_flight = SingleFlight()
+
+# Parallel provider lookups; providers without an API key are skipped
+_engine = FanOutEngine(default_adapters())
+
+# Stored analyses younger than this are served without asking providers again
+REANALYZE_AFTER = timedelta(seconds=int(os.getenv("THREAT_INTEL_REANALYZE_AFTER", "3600")))
+
+# Cache-Control of stored answers, for browsers and reverse proxies;
+# mock data (no database) is sent with NO_STORE
+RISK_SCORE_CACHE_CONTROL = os.getenv("THREAT_INTEL_RISK_SCORE_CACHE_CONTROL", "public, max-age=60")
+TRENDS_CACHE_CONTROL = os.getenv("THREAT_INTEL_TRENDS_CACHE_CONTROL", "public, max-age=300")
+NO_STORE = "no-store"
+
 
 @router.get(
     "/risk-score/{indicator_type}/{indicator}",
@@ -28,11 +62,17 @@ router = APIRouter(prefix="/threat-intel", tags=["Threat Intelligence"])
 )
 async def get_risk_score(
     indicator: str,
-    indicator_type: IndicatorType
+    indicator_type: IndicatorType,
+    request: Request
 ):
     """
     Get comprehensive threat intelligence for a specific indicator.
     
+    All configured providers are queried in parallel; providers that fail
+    or miss the deadline are listed in the ``X-Missing-Providers`` header.
+    A stored analysis is sent with an ETag and Last-Modified; a request
+    whose validators still match it gets 304 before anything is built.
+    
     Args:
         indicator: The indicator to analyze (IP, domain, URL, hash, etc.)
         indicator_type: Type of the indicator
@@ -41,13 +81,65 @@ async def get_risk_score(
         Comprehensive threat intelligence data including risk score
     """
     try:
-        # In a real implementation, this would query multiple threat intel providers
-        # For now, we'll use mock data
         logger.info(f"Analyzing {indicator_type} indicator: {indicator}")
         
-        result = MockDataProvider.get_mock_indicator(indicator, indicator_type)
+        version = None
+        try:
+            async with AsyncSessionLocal() as session:
+                version = await IndicatorRepository(session).indicator_version(indicator, indicator_type)
+        except Exception as e:
+            logger.warning(f"Database error in get_risk_score: {str(e)}. Skipping conditional check.")
+        # the stored row is the answer only while it needs no re-analysis
+        last_updated = version[0] if version else None
+        if last_updated and (datetime.now() - last_updated < REANALYZE_AFTER
+                             or not _engine.active(indicator_type)):
+            etag = make_etag("risk-score", indicator_type.value, indicator, *version)
+            if is_not_modified(request, etag, last_updated):
+                return not_modified(cache_headers(RISK_SCORE_CACHE_CONTROL, etag, last_updated))
+        else:
+            etag = None
         
-        return ThreatIndicator(**result)
+        async def analyze():
+            # Own session: the shared lookup may outlive the request that started it
+            stored = None
+            try:
+                async with AsyncSessionLocal() as session:
+                    stored = await IndicatorRepository(session).get_indicator(indicator, indicator_type)
+            except Exception as e:
+                logger.warning(f"Database error in get_risk_score: {str(e)}. Skipping stored data.")
+            if stored and stored["last_updated"] and datetime.now() - stored["last_updated"] < REANALYZE_AFTER:
+                return stored, {}
+
+            if not _engine.active(indicator_type):
+                # No provider API keys configured: serve stored data, else mock data
+                return stored or MockDataProvider.get_mock_indicator(indicator, indicator_type), {}
+            fanout = await _engine.gather(indicator, indicator_type)
+            result = build_indicator(indicator, indicator_type, fanout)
+            if fanout.missing:
+                # not stored: it would be served as a fresh analysis until REANALYZE_AFTER
+                # and could replace a complete one
+                return result, fanout.missing
+            try:
+                async with AsyncSessionLocal() as session:
+                    await IndicatorRepository(session).save_indicator(result)
+            except Exception as e:
+                logger.warning(f"Database error in get_risk_score: {str(e)}. Result not stored.")
+            return result, fanout.missing
+
+        result, missing = await _indicator_flight.do((indicator_type, indicator), analyze)
+        if etag and result.get("last_updated") == last_updated:
+            headers = cache_headers(RISK_SCORE_CACHE_CONTROL, etag, last_updated)
+        elif missing or not (version or _engine.active(indicator_type)):
+            # partial results and mock data are not worth caching
+            headers = cache_headers(NO_STORE)
+        else:
+            # a fresh analysis; its stored copy gets validators on the next request
+            headers = cache_headers(RISK_SCORE_CACHE_CONTROL)
+        if missing:
+            headers["X-Missing-Providers"] = ",".join(sorted(missing))
+        
+        # already validated: skip FastAPI's response_model round trip
+        return FastJSONResponse(ThreatIndicator(**result), headers=headers)
         
     except Exception as e:
         logger.error(f"Error analyzing indicator {indicator}: {str(e)}")
@@ -57,6 +149,54 @@ async def get_risk_score(
         )
 
 
+@router.get(
+    "/graph/{indicator_type}/{indicator}",
+    response_model=GraphResponse,
+    summary="Expand the relationship graph of an indicator",
+    description="Breadth-first pivot from an indicator over related indicators, within node and edge limits"
+)
+async def get_graph(
+    indicator: str,
+    indicator_type: IndicatorType,
+    depth: int = Query(2, ge=1, le=GRAPH_MAX_DEPTH, description="Maximum hops from the indicator"),
+    relationship_type: Optional[List[str]] = Query(None, description="Only follow these relationship types"),
+    min_confidence: int = Query(0, ge=0, le=100, description="Only follow relationships this confident"),
+    max_nodes: int = Query(GRAPH_MAX_NODES, ge=1, le=GRAPH_MAX_NODES),
+    max_edges: int = Query(GRAPH_MAX_EDGES, ge=1, le=GRAPH_MAX_EDGES),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Expand the relationship graph around a stored indicator.
+    
+    Args:
+        indicator: The indicator to start from
+        indicator_type: Type of the indicator
+        depth: Maximum number of hops
+        relationship_type: Relationship types to follow; all by default
+        min_confidence: Minimum relationship confidence
+        max_nodes: Stop adding nodes after this many
+        max_edges: Stop walking after this many traversed relationships
+        
+    Returns:
+        Nodes with their hop distance, the edges between them and whether
+        a limit truncated the expansion
+    """
+    try:
+        logger.info(f"Expanding graph of {indicator_type} indicator: {indicator} (depth {depth})")
+        result = await IndicatorRepository(db).expand(
+            indicator, indicator_type, depth, relationship_type, min_confidence, max_nodes, max_edges
+        )
+    except Exception as e:
+        logger.error(f"Error expanding graph of {indicator}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to expand indicator graph: {str(e)}"
+        )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Indicator not found")
+    return FastJSONResponse(GraphResponse(**result))
+
+
 @router.get(
     "/trends",
     response_model=TrendData,
@@ -64,12 +204,18 @@ async def get_risk_score(
     description="Retrieve threat intelligence trends and statistics for a specified time period"
 )
 async def get_trends(
+    request: Request,
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
-    indicator_type: Optional[IndicatorType] = Query(None, description="Filter by indicator type")
+    indicator_type: Optional[IndicatorType] = Query(None, description="Filter by indicator type"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get threat intelligence trends and analytics.
     
+    The report is sent with an ETag and Last-Modified derived from the
+    rollups behind it; a request whose validators still match gets 304
+    before the report is loaded.
+    
     Args:
         days: Number of days to include in the trend analysis
         indicator_type: Optional filter by indicator type
@@ -80,9 +226,21 @@ async def get_trends(
     try:
         logger.info(f"Fetching trends for {days} days, type: {indicator_type}")
         
-        result = MockDataProvider.get_mock_trend_data(days, indicator_type)
+        try:
+            repo = IndicatorRepository(db)
+            last_modified = await repo.trends_version(days)
+            etag = make_etag("trends", days, indicator_type and indicator_type.value, last_modified)
+            headers = cache_headers(TRENDS_CACHE_CONTROL, etag, last_modified)
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(headers)
+            result = await repo.trends(days, indicator_type)
+        except Exception as e:
+            # If database access fails, return mock data
+            logger.warning(f"Database error in get_trends: {str(e)}. Using mock data.")
+            result = MockDataProvider.get_mock_trend_data(days, indicator_type)
+            headers = cache_headers(NO_STORE)
         
-        return TrendData(**result)
+        return FastJSONResponse(TrendData(**result), headers=headers)
         
     except Exception as e:
         logger.error(f"Error fetching trends: {str(e)}")
@@ -92,13 +250,48 @@ async def get_trends(
         )
 
 
+def _mock_search(request: SearchRequest):
+    """Filter and page mock indicators; used when the database is unavailable."""
+    # Get mock search results
+    indicators_data = MockDataProvider.get_mock_search_results(request.limit)
+    
+    # Apply filters if specified
+    filtered_results = []
+    for indicator_data in indicators_data:
+        # Filter by indicator type
+        if request.indicator_type and indicator_data["indicator_type"] != request.indicator_type:
+            continue
+            
+        # Filter by risk score range
+        risk_score = indicator_data["risk_score"]
+        if request.min_risk_score is not None and risk_score < request.min_risk_score:
+            continue
+        if request.max_risk_score is not None and risk_score > request.max_risk_score:
+            continue
+            
+        # Filter by query string (simple contains check)
+        if request.query and request.query.lower() not in indicator_data["indicator"].lower():
+            continue
+            
+        # Mock indicators carry no tags
+        if request.tags_all or request.tags_any:
+            continue
+            
+        filtered_results.append(indicator_data)
+    
+    # Apply pagination
+    start_idx = request.offset
+    end_idx = start_idx + request.limit
+    return filtered_results[start_idx:end_idx], len(filtered_results)
+
+
 @router.post(
     "/search",
     response_model=SearchResponse,
     summary="Search threat indicators",
     description="Search for threat indicators with various filters"
 )
-async def search_indicators(request: SearchRequest):
+async def search_indicators(request: SearchRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Search for threat indicators based on various criteria.
     
@@ -111,39 +304,19 @@ async def search_indicators(request: SearchRequest):
     try:
         logger.info(f"Searching indicators with query: {request.query}")
         
-        # Get mock search results
-        indicators_data = MockDataProvider.get_mock_search_results(request.limit)
-        
-        # Apply filters if specified
-        filtered_results = []
-        for indicator_data in indicators_data:
-            # Filter by indicator type
-            if request.indicator_type and indicator_data["indicator_type"] != request.indicator_type:
-                continue
-                
-            # Filter by risk score range
-            risk_score = indicator_data["risk_score"]
-            if request.min_risk_score is not None and risk_score < request.min_risk_score:
-                continue
-            if request.max_risk_score is not None and risk_score > request.max_risk_score:
-                continue
-                
-            # Filter by query string (simple contains check)
-            if request.query and request.query.lower() not in indicator_data["indicator"].lower():
-                continue
-                
-            filtered_results.append(ThreatIndicator(**indicator_data))
-        
-        # Apply pagination
-        start_idx = request.offset
-        end_idx = start_idx + request.limit
-        paginated_results = filtered_results[start_idx:end_idx]
-        
-        return SearchResponse(
-            indicators=paginated_results,
-            total_count=len(filtered_results),
-            has_more=end_idx < len(filtered_results)
-        )
+        try:
+            page = await IndicatorRepository(db).search(request)
+        except Exception as e:
+            # If database access fails, return mock data
+            logger.warning(f"Database error in search_indicators: {str(e)}. Using mock data.")
+            indicators, total_count = _mock_search(request)
+            page = {
+                "indicators": indicators,
+                "total_count": total_count,
+                "has_more": request.offset + len(indicators) < total_count,
+            }
+        
+        return FastJSONResponse(SearchResponse(**page))
         
     except Exception as e:
         logger.error(f"Error searching indicators: {str(e)}")
@@ -153,6 +326,118 @@ async def search_indicators(request: SearchRequest):
         )
 
 
+async def _stored_batches(request: ExportRequest):
+    # Own session: the stream outlives the request handler
+    async with AsyncSessionLocal() as session:
+        async for batch in IndicatorRepository(session).export(request, request.max_rows):
+            yield batch
+
+
+async def _prepend(first, rest=None):
+    if first:
+        yield first
+    if rest is not None:
+        async for batch in rest:
+            yield batch
+
+
+@router.post(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export threat indicators",
+    description="Stream every indicator matching the search filters as NDJSON or CSV; "
+                "gzip-compressed when the client accepts it",
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}}
+)
+async def export_indicators(request: ExportRequest, http_request: Request):
+    """
+    Export threat indicators without paging.
+    
+    Rows are read through a server-side cursor and written as they
+    arrive, so memory use does not grow with the result size.
+    
+    Args:
+        request: Search filters plus output format and optional row cap
+        
+    Returns:
+        Streaming NDJSON or CSV response
+    """
+    try:
+        logger.info(f"Exporting indicators as {request.format} with query: {request.query}")
+        
+        # Fetch the first batch up front so database errors surface before streaming starts
+        batches = _stored_batches(request)
+        try:
+            batches = _prepend(await batches.__anext__(), batches)
+        except StopAsyncIteration:
+            batches = _prepend(None)
+        except Exception as e:
+            # If database access fails, export mock data
+            logger.warning(f"Database error in export_indicators: {str(e)}. Using mock data.")
+            filters = request.model_dump(exclude={"format", "max_rows"})
+            indicators, _ = _mock_search(SearchRequest(**filters, limit=100))
+            batches = _prepend(indicators[:request.max_rows])
+        
+        body = ENCODERS[request.format](batches)
+        headers = {
+            "Content-Disposition": f'attachment; filename="indicators.{request.format}"',
+            "Vary": "Accept-Encoding",
+        }
+        if "gzip" in http_request.headers.get("accept-encoding", ""):
+            body = gzip_chunks(body)
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(body, media_type=MEDIA_TYPES[request.format], headers=headers)
+        
+    except Exception as e:
+        logger.error(f"Error exporting indicators: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to export indicators: {str(e)}"
+        )
+
+
+@router.get(
+    "/feeds",
+    response_model=List[FeedStatus],
+    summary="List threat feeds",
+    description="Refresh schedule and last-run figures of every configured threat feed"
+)
+async def list_feeds(db: AsyncSession = Depends(get_async_db)):
+    """
+    List threat feeds with their refresh status.
+
+    Returns:
+        One FeedStatus per row of ``threat_feeds``
+    """
+    try:
+        feeds = (await db.execute(select(ThreatFeed).order_by(ThreatFeed.id))).scalars().all()
+        result = []
+        for feed in feeds:
+            stats = feed.stats or {}
+            result.append(FeedStatus(
+                id=feed.id,
+                name=feed.name,
+                active=bool(feed.active),
+                update_frequency=feed.update_frequency or 24,
+                last_updated=feed.last_updated,
+                next_due=feed_scheduler.next_due(feed) if feed.active else None,
+                running=feed_scheduler.running(feed.id),
+                last_run=stats.get("last_run"),
+                duration_seconds=stats.get("duration_seconds"),
+                loaded=stats.get("loaded"),
+                skipped=stats.get("skipped"),
+                last_error=feed_scheduler.last_error.get(feed.id),
+            ))
+        return result
+
+    except Exception as e:
+        logger.error(f"Error listing feeds: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to list feeds: {str(e)}"
+        )
+
+
 @router.get(
     "/providers/stats",
     response_model=dict,
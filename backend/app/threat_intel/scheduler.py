@@ -0,0 +1,192 @@
+"""
+Background refresh of threat feeds.
+
+``FeedScheduler`` runs inside the API process (started from the FastAPI
+lifespan). Every ``FEED_SCHEDULER_INTERVAL`` seconds it reads the active
+rows of ``threat_feeds`` and ingests those whose ``update_frequency``
+(hours) has elapsed since ``last_updated``, plus a random per-feed jitter
+so feeds sharing a frequency do not all refresh at once.
+
+* At most ``FEED_SCHEDULER_CONCURRENCY`` refreshes run at a time.
+* A failed refresh is retried after ``FEED_SCHEDULER_RETRY`` seconds,
+  doubling with each consecutive failure up to the feed's own period.
+* Unchanged feeds are skipped (ETag/Last-Modified, then content hash).
+* On PostgreSQL each refresh holds ``pg_try_advisory_lock`` for its feed,
+  so with several workers only one of them refreshes a given feed.
+"""
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import select, text
+
+from app.async_database import AsyncSessionLocal, get_async_engine
+from app.threat_intel.db_models import ThreatFeed
+from app.threat_intel.feeds import ingest_feed
+
+logger = logging.getLogger(__name__)
+
+FEED_SCHEDULER_ENABLED = os.getenv("FEED_SCHEDULER_ENABLED", "True").lower() == "true"
+FEED_SCHEDULER_INTERVAL = float(os.getenv("FEED_SCHEDULER_INTERVAL", "60"))      # seconds between scans
+FEED_SCHEDULER_CONCURRENCY = int(os.getenv("FEED_SCHEDULER_CONCURRENCY", "2"))
+# Refreshes are delayed by up to this fraction of the feed's period
+FEED_SCHEDULER_JITTER = float(os.getenv("FEED_SCHEDULER_JITTER", "0.1"))
+# Seconds before the first retry of a failed refresh
+FEED_SCHEDULER_RETRY = float(os.getenv("FEED_SCHEDULER_RETRY", "60"))
+
+# First key of the two-int advisory lock; the second is the feed id
+FEED_LOCK_NAMESPACE = 0x7EED
+
+
+def is_due(feed: ThreatFeed, now: datetime, jitter: timedelta = timedelta(0),
+           retry_at: Optional[datetime] = None) -> bool:
+    if retry_at is not None and now < retry_at:
+        return False
+    if feed.last_updated is None:
+        return True
+    period = timedelta(hours=feed.update_frequency or 24)
+    return now >= feed.last_updated + period + jitter
+
+
+class FeedScheduler:
+    """
+    Periodically refresh due feeds.
+
+    Args:
+        interval: Seconds between scans of ``threat_feeds``
+        concurrency: Max refreshes running at once in this process
+        jitter: Max delay as a fraction of each feed's period
+        retry: Seconds before the first retry of a failed refresh
+    """
+
+    def __init__(self, interval: float = FEED_SCHEDULER_INTERVAL,
+                 concurrency: int = FEED_SCHEDULER_CONCURRENCY,
+                 jitter: float = FEED_SCHEDULER_JITTER,
+                 retry: float = FEED_SCHEDULER_RETRY):
+        self.interval = interval
+        self.jitter = jitter
+        self.retry = retry
+        self._slots = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[int] = set()
+        self._refreshes: Set[asyncio.Task] = set()
+        self._offsets: Dict[int, timedelta] = {}
+        self.last_error: Dict[int, str] = {}
+        # feed id -> (consecutive failures, time of the last one)
+        self._failures: Dict[int, Tuple[int, datetime]] = {}
+
+    def _offset(self, feed: ThreatFeed) -> timedelta:
+        # drawn once per refresh cycle so a feed's due time does not move between scans
+        if feed.id not in self._offsets:
+            period = timedelta(hours=feed.update_frequency or 24)
+            self._offsets[feed.id] = period * random.uniform(0, self.jitter)
+        return self._offsets[feed.id]
+
+    def retry_at(self, feed: ThreatFeed) -> Optional[datetime]:
+        """Earliest retry after failed refreshes, or None if the last one succeeded."""
+        if feed.id not in self._failures:
+            return None
+        failures, failed_at = self._failures[feed.id]
+        period = timedelta(hours=feed.update_frequency or 24)
+        # the exponent is capped only to keep timedelta in range; the period caps the delay
+        return failed_at + min(timedelta(seconds=self.retry * 2 ** min(failures - 1, 20)), period)
+
+    def next_due(self, feed: ThreatFeed) -> Optional[datetime]:
+        retry_at = self.retry_at(feed)
+        if feed.last_updated is None:
+            return retry_at
+        due = feed.last_updated + timedelta(hours=feed.update_frequency or 24) + self._offset(feed)
+        return max(due, retry_at) if retry_at else due
+
+    def running(self, feed_id: int) -> bool:
+        return feed_id in self._running
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._task, *self._refreshes] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                logger.warning(f"Feed scheduler scan failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def run_due(self) -> int:
+        """Start refreshes for every due feed; returns how many were started."""
+        now = datetime.now()
+        async with AsyncSessionLocal() as session:
+            feeds = (await session.execute(
+                select(ThreatFeed).where(ThreatFeed.active.is_(True))
+            )).scalars().all()
+        started = 0
+        for feed in feeds:
+            if feed.id in self._running or not is_due(feed, now, self._offset(feed), self.retry_at(feed)):
+                continue
+            self._running.add(feed.id)
+            task = asyncio.create_task(self._refresh(feed.id))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+            started += 1
+        return started
+
+    async def _refresh(self, feed_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            async with self._slots:
+                return await self._refresh_locked(feed_id)
+        except Exception as e:
+            failures = self._failures.get(feed_id, (0, None))[0] + 1
+            logger.error(f"Feed {feed_id} refresh failed ({failures} in a row): {str(e)}")
+            self.last_error[feed_id] = str(e)
+            self._failures[feed_id] = (failures, datetime.now())
+            return None
+        finally:
+            self._running.discard(feed_id)
+            self._offsets.pop(feed_id, None)
+
+    async def _refresh_locked(self, feed_id: int) -> Optional[Dict[str, Any]]:
+        engine = get_async_engine()
+        if engine.dialect.name != "postgresql":
+            return await self._refresh_if_due(feed_id)
+        # session-level advisory lock on a dedicated connection, held for the whole refresh
+        async with engine.connect() as conn:
+            locked = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:ns, :feed)"),
+                {"ns": FEED_LOCK_NAMESPACE, "feed": feed_id},
+            )).scalar()
+            await conn.commit()
+            if not locked:
+                logger.info(f"Feed {feed_id} is being refreshed by another worker")
+                return None
+            try:
+                return await self._refresh_if_due(feed_id)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:ns, :feed)"),
+                                   {"ns": FEED_LOCK_NAMESPACE, "feed": feed_id})
+                await conn.commit()
+
+    async def _refresh_if_due(self, feed_id: int) -> Optional[Dict[str, Any]]:
+        # another worker may have finished this feed while we waited for a slot or the lock
+        async with AsyncSessionLocal() as session:
+            feed = await session.get(ThreatFeed, feed_id)
+            if feed is None or not feed.active or \
+                    not is_due(feed, datetime.now(), retry_at=self.retry_at(feed)):
+                return None
+        result = await ingest_feed(feed_id, skip_unchanged=True)
+        self.last_error.pop(feed_id, None)
+        self._failures.pop(feed_id, None)
+        return result
+
+
+feed_scheduler = FeedScheduler()
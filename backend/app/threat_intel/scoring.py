@@ -0,0 +1,197 @@
+"""
+Risk scoring for threat indicators.
+
+Scores are computed from a fixed feature vector per indicator:
+
+* confidence-weighted provider score and detection ratio
+* malware sample count, historical, community and related reports, each
+  saturating (``1 - exp(-x / scale)``) so one noisy signal cannot dominate
+* age since the indicator was last seen, halving the score every
+  ``half_life_days``
+
+``extract_features`` turns ``ThreatIndicator``-shaped dicts into a float64
+matrix and ``score_features`` scores the whole matrix with NumPy array
+operations. ``score_indicator`` runs the same kernel on a one-row batch, so
+a live analysis and a bulk re-score always agree.
+
+Re-score every stored indicator after changing the weights with::
+
+    python -m app.threat_intel.scoring
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:  # NumPy loads with the first score, not with the app
+    import numpy as np
+
+# Feature matrix columns
+FEATURES = (
+    "provider_score", "detection", "confidence", "providers",
+    "malware", "historical", "community", "related", "age_days",
+)
+PROVIDER_SCORE, DETECTION, CONFIDENCE, PROVIDERS, MALWARE, HISTORICAL, COMMUNITY, RELATED, AGE_DAYS = \
+    range(len(FEATURES))
+
+
+@dataclass(frozen=True)
+class ScoringWeights:
+    """
+    Relative weights of each signal and the scales they saturate at.
+
+    Weights need not sum to one; evidence is normalised by their total.
+    """
+    provider: float = 0.45
+    detection: float = 0.25
+    malware: float = 0.15
+    community: float = 0.05
+    historical: float = 0.05
+    related: float = 0.05
+    malware_scale: float = 5.0
+    community_scale: float = 20.0
+    historical_scale: float = 10.0
+    related_scale: float = 5.0
+    half_life_days: float = 180.0
+
+    @property
+    def total(self) -> float:
+        return self.provider + self.detection + self.malware + self.community + self.historical + self.related
+
+    @classmethod
+    def from_env(cls) -> "ScoringWeights":
+        """
+        Defaults overridden by ``THREAT_INTEL_SCORE_WEIGHTS``, a comma
+        separated ``name=value`` list (e.g. ``provider=0.5,half_life_days=90``).
+        """
+        raw = os.getenv("THREAT_INTEL_SCORE_WEIGHTS", "")
+        names = {f.name for f in fields(cls)}
+        overrides = {}
+        for item in filter(None, (part.strip() for part in raw.split(","))):
+            name, _, value = item.partition("=")
+            if name.strip() not in names:
+                raise ValueError(f"Unknown scoring weight: {name.strip()}")
+            overrides[name.strip()] = float(value)
+        weights = replace(cls(), **overrides)
+        if weights.total <= 0 or weights.half_life_days <= 0:
+            raise ValueError("Scoring weights must be positive")
+        return weights
+
+
+DEFAULT_WEIGHTS = ScoringWeights.from_env()
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _feature_row(indicator: Dict[str, Any], now: datetime) -> Tuple[float, ...]:
+    providers = indicator.get("providers") or {}
+    factors = indicator.get("risk_factors") or {}
+    provider_scores = factors.get("provider_scores") or {}
+
+    weight = weighted_score = weighted_detection = 0.0
+    for name, report in providers.items():
+        confidence = report.get("confidence") or 0
+        detected = 1.0 if report.get("detected") else 0.0
+        weight += confidence
+        weighted_score += confidence * provider_scores.get(name, 100.0 * detected)
+        weighted_detection += confidence * detected
+    count = len(providers)
+    if weight:
+        provider_score, detection = weighted_score / weight, weighted_detection / weight
+    elif provider_scores:
+        # scores without reports (e.g. imported risk factors): plain mean
+        provider_score, detection = sum(provider_scores.values()) / len(provider_scores), 0.0
+    else:
+        provider_score = detection = 0.0
+
+    seen = _timestamp(indicator.get("last_seen") or indicator.get("last_updated") or indicator.get("first_seen"))
+    return (
+        provider_score,
+        detection,
+        weight / count if count else 0.0,
+        float(count),
+        float(sum((indicator.get("malware") or {}).values())),
+        float(factors.get("historical_reports") or 0),
+        float(factors.get("community_reports") or 0),
+        float(factors.get("related_threats") or 0),
+        (now - seen).total_seconds() / 86400 if seen else 0.0,
+    )
+
+
+def extract_features(indicators: Sequence[Dict[str, Any]], now: Optional[datetime] = None) -> np.ndarray:
+    """``(len(indicators), len(FEATURES))`` float64 matrix, one row per indicator."""
+    import numpy as np
+
+    now = now or datetime.now()
+    matrix = np.array([_feature_row(indicator, now) for indicator in indicators], dtype=np.float64)
+    return matrix.reshape(len(indicators), len(FEATURES))
+
+
+def _saturate(values: np.ndarray, scale: float) -> np.ndarray:
+    import numpy as np
+
+    return -np.expm1(-np.maximum(values, 0.0) / scale)
+
+
+def score_features(features: np.ndarray,
+                   weights: ScoringWeights = DEFAULT_WEIGHTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a feature matrix.
+
+    Returns:
+        ``(risk_score, confidence)`` int64 arrays in 0..100
+    """
+    import numpy as np
+
+    f = features
+    evidence = (
+        weights.provider * np.clip(f[:, PROVIDER_SCORE], 0.0, 100.0) / 100.0
+        + weights.detection * f[:, DETECTION]
+        + weights.malware * _saturate(f[:, MALWARE], weights.malware_scale)
+        + weights.community * _saturate(f[:, COMMUNITY], weights.community_scale)
+        + weights.historical * _saturate(f[:, HISTORICAL], weights.historical_scale)
+        + weights.related * _saturate(f[:, RELATED], weights.related_scale)
+    ) / weights.total
+    decay = np.exp2(-np.maximum(f[:, AGE_DAYS], 0.0) / weights.half_life_days)
+    risk = np.clip(np.rint(100.0 * evidence * decay), 0, 100).astype(np.int64)
+
+    # one provider is worth half its confidence, each further one halves the doubt
+    agreement = 1.0 - np.exp2(-f[:, PROVIDERS])
+    confidence = np.clip(np.rint(f[:, CONFIDENCE] * agreement), 0, 100).astype(np.int64)
+    return risk, confidence
+
+
+def score_batch(indicators: Sequence[Dict[str, Any]], weights: ScoringWeights = DEFAULT_WEIGHTS,
+                now: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Score many ``ThreatIndicator``-shaped dicts at once."""
+    return score_features(extract_features(indicators, now), weights)
+
+
+def score_indicator(indicator: Dict[str, Any], weights: ScoringWeights = DEFAULT_WEIGHTS,
+                    now: Optional[datetime] = None) -> Tuple[int, int]:
+    """``(risk_score, confidence)`` of one indicator; identical to its ``score_batch`` row."""
+    risk, confidence = score_batch([indicator], weights, now)
+    return int(risk[0]), int(confidence[0])
+
+
+async def _rescore_all() -> int:
+    from app.async_database import AsyncSessionLocal
+    from app.threat_intel.repository import IndicatorRepository
+
+    async with AsyncSessionLocal() as session:
+        return await IndicatorRepository(session).rescore(DEFAULT_WEIGHTS)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Re-scored {asyncio.run(_rescore_all())} indicators")
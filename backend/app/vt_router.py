@@ -1,10 +1,125 @@
-import os, httpx
-from fastapi import APIRouter, HTTPException
-from app.models import DomainReport, DOMAIN_RX
+import asyncio, json, math, os, time
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.cache import CacheableMiss, RedisCacheBackend, ResponseCache
+from app.http_client import get_http_client
+from app.metrics import upstream_call
+from app.models import (
+    DomainBatchReport, DomainBatchRequest, DomainReport, DomainResult, DOMAIN_RX
+)
+from app.rate_limit import KeyPool, RateLimitExceeded
+from app.singleflight import SingleFlight
+
+if TYPE_CHECKING:  # httpx loads with the shared client, not with the router
+    import httpx
 
 VT_KEY = os.getenv("VT_API_KEY")
+VT_BASE_URL = os.getenv("VT_BASE_URL", "https://www.virustotal.com/vtapi/v2")
 router = APIRouter(tags=["Research"])
 
+# ----- client-side quota: public VT v2 allows 4 requests/minute per key ---
+VT_API_KEYS = [k.strip() for k in os.getenv("VT_API_KEYS", VT_KEY or "").split(",") if k.strip()]
+VT_QUEUE_DEADLINE = float(os.getenv("VT_QUEUE_DEADLINE", "20"))  # max seconds queued for a token
+vt_keys = KeyPool(
+    VT_API_KEYS,
+    rate_per_minute=float(os.getenv("VT_RATE_PER_MINUTE", "4")),
+    burst=int(os.getenv("VT_RATE_BURST", "1")),
+)
+
+# ----- response cache: saves VT quota for popular domains ----------------
+VT_CACHE_URL = os.getenv("VT_CACHE_URL")  # e.g. redis://cache:6379/0 to share across workers
+vt_cache = ResponseCache(
+    ttl=float(os.getenv("VT_CACHE_TTL", "3600")),
+    negative_ttl=float(os.getenv("VT_CACHE_NEGATIVE_TTL", "300")),
+    stale_ttl=float(os.getenv("VT_CACHE_STALE_TTL", "600")),
+    max_entries=int(os.getenv("VT_CACHE_MAX_ENTRIES", "10000")),
+    backend=RedisCacheBackend(VT_CACHE_URL, prefix="vt:domain:") if VT_CACHE_URL else None,
+)
+# concurrent misses for the same domain share one upstream call
+vt_flight = SingleFlight()
+
+# upper bound on parallel upstream lookups for one batch request
+VT_BATCH_CONCURRENCY = int(os.getenv("VT_BATCH_CONCURRENCY", "10"))
+
+
+def normalize_domain(domain: str) -> str:
+    """Cache key for a domain: case-insensitive, no trailing root dot."""
+    return domain.strip().rstrip(".").lower()
+
+
+async def vt_get(path: str, params: dict) -> "httpx.Response":
+    """GET a VT v2 endpoint within the per-key quota, retrying quota rejections."""
+    url = f"{VT_BASE_URL}{path}"
+    deadline = time.monotonic() + VT_QUEUE_DEADLINE
+
+    while True:
+        try:
+            key = await vt_keys.acquire(max(0.0, deadline - time.monotonic()))
+        except RateLimitExceeded as e:
+            raise HTTPException(
+                status_code=429, detail="VT quota exhausted, retry later",
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        # shared, pooled client (see app.http_client) – no per-request handshake
+        with upstream_call("virustotal") as call:
+            r = await get_http_client().get(url, params={"apikey": key, **params})
+            call.status = r.status_code
+        # a 204/429 pauses that key; retry on the next key that frees up
+        if not vt_keys.observe(key, r):
+            return r
+
+
+async def fetch_domain_report(domain: str) -> dict:
+    """Call VT v2 /domain/report; 404 becomes a cacheable miss.
+
+    Timeouts become 504 and other transport or decoding failures 502, so a
+    batch reports them per domain instead of failing as a whole.
+    """
+    import httpx
+
+    try:
+        r = await vt_get("/domain/report", {"domain": domain})
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="VT upstream timeout")
+    except httpx.TransportError:
+        raise HTTPException(status_code=502, detail="VT upstream unreachable")
+    if r.status_code == 404:
+        raise CacheableMiss("domain not found upstream")
+    if r.status_code != 200:
+        raise HTTPException(status_code=502, detail="VT upstream error")
+    try:
+        return r.json()
+    except ValueError:
+        raise HTTPException(status_code=502, detail="VT upstream returned invalid JSON")
+
+
+async def lookup_domain(domain: str) -> dict:
+    """VT report for an already-validated domain, served from cache when possible."""
+    key = normalize_domain(domain)
+    return await vt_cache.get_or_load(
+        key, lambda: vt_flight.do(key, lambda: fetch_domain_report(key))
+    )
+
+
+@router.get(
+    "/research_domain/cache/stats",
+    summary="VirusTotal cache statistics",
+    description="Hit/miss/eviction counters of the /research_domain response cache"
+)
+async def research_domain_cache_stats():
+    return vt_cache.stats
+
+
+@router.get(
+    "/research_domain/quota/stats",
+    summary="VirusTotal quota status",
+    description="Token-bucket state per configured VT API key (keys masked)"
+)
+async def research_domain_quota_stats():
+    return vt_keys.stats()
+
+
 @router.get(
     "/research_domain/{domain}",
     response_model=DomainReport,
@@ -15,11 +130,60 @@ async def research_domain(domain: str):
     if not DOMAIN_RX.fullmatch(domain):
         raise HTTPException(status_code=400, detail="invalid domain syntax")
 
-    url = "https://www.virustotal.com/vtapi/v2/domain/report"
-    params = {"apikey": VT_KEY, "domain": domain}
+    try:
+        vt_response = await lookup_domain(domain)
+    except CacheableMiss as miss:
+        raise HTTPException(status_code=404, detail=str(miss))
+    return {"domain": domain, "vt_response": vt_response}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, params=params, follow_redirects=True)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="VT upstream error")
-    return {"domain": domain, "vt_response": r.json()}
+
+async def _research_one(domain: str) -> DomainResult:
+    """One batch entry: same validation and lookup as GET, errors captured per row."""
+    if not DOMAIN_RX.fullmatch(domain):
+        return DomainResult(domain=domain, status=400, error="invalid domain syntax")
+    try:
+        vt_response = await lookup_domain(domain)
+    except CacheableMiss as miss:
+        return DomainResult(domain=domain, status=404, error=str(miss))
+    except HTTPException as e:
+        return DomainResult(domain=domain, status=e.status_code, error=e.detail)
+    return DomainResult(domain=domain, status=200, vt_response=vt_response)
+
+
+@router.post(
+    "/research_domain/batch",
+    response_model=DomainBatchReport,
+    summary="VirusTotal batch domain report",
+    description="Researches many FQDNs with bounded concurrency. Send "
+                "`Accept: application/x-ndjson` to stream one result per line "
+                "as each lookup completes."
+)
+async def research_domain_batch(batch: DomainBatchRequest, request: Request):
+    # de-duplicate on the cache key, keeping the caller's first spelling
+    unique = {}
+    for domain in batch.domains:
+        unique.setdefault(normalize_domain(domain), domain)
+    domains = list(unique.values())
+
+    limit = min(batch.concurrency or VT_BATCH_CONCURRENCY, VT_BATCH_CONCURRENCY)
+    sem = asyncio.Semaphore(limit)
+
+    async def bounded(domain: str) -> DomainResult:
+        async with sem:
+            return await _research_one(domain)
+
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        async def stream():
+            tasks = [asyncio.ensure_future(bounded(d)) for d in domains]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    yield json.dumps(result.model_dump(exclude_none=True)) + "\n"
+            finally:
+                # client went away mid-stream: stop spending quota
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return {"results": await asyncio.gather(*(bounded(d) for d in domains))}
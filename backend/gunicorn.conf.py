@@ -0,0 +1,64 @@
+"""
+gunicorn settings for the production server (see app/server.py):
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+import asyncio
+import os
+import random
+import sys
+
+from uvicorn_worker import UvicornWorker
+
+# gunicorn reads this file before changing into ``chdir``
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from app.server import (  # noqa: E402
+    SERVER_BACKLOG, SERVER_GRACEFUL_TIMEOUT, SERVER_HOST, SERVER_KEEPALIVE, SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER, SERVER_PORT, WEB_CONCURRENCY, uvicorn_options
+)
+
+
+class Worker(UvicornWorker):
+    # backlog, keep-alive and max requests come from the gunicorn settings below
+    CONFIG_KWARGS = {key: uvicorn_options()[key] for key in ("loop", "http", "timeout_graceful_shutdown")}
+
+
+chdir = HERE
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+workers = WEB_CONCURRENCY
+worker_class = Worker
+# import the app once in the master; workers fork with it already loaded
+preload_app = True
+backlog = SERVER_BACKLOG
+keepalive = SERVER_KEEPALIVE
+# uvicorn stops waiting for in-flight requests after SERVER_GRACEFUL_TIMEOUT and
+# runs the lifespan shutdown; gunicorn kills the worker only if that hangs too
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT + 5
+max_requests = SERVER_MAX_REQUESTS
+max_requests_jitter = SERVER_MAX_REQUESTS_JITTER
+# heartbeat files on tmpfs; on overlayfs (Docker) their writes can stall workers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def when_ready(server):
+    """Create the schema once, before the workers' lifespans race to do it."""
+    from app.async_database import get_async_engine, init_models
+
+    async def init():
+        try:
+            await init_models()
+        finally:
+            # workers must not inherit the master's pooled connections
+            await get_async_engine().dispose()
+
+    try:
+        asyncio.run(init())
+    except Exception as e:
+        server.log.warning(f"Database unavailable at startup: {str(e)}")
+
+
+def post_fork(server, worker):
+    # forked workers would otherwise all draw the same jitter and profiling samples
+    random.seed()
@@ -1,4 +1,45 @@
+"""
+Start the API.
+
+    python run.py              production: gunicorn with preloaded uvicorn workers
+                               (gunicorn.conf.py, app/server.py)
+    python run.py --reload     development: one uvicorn process restarting on code changes
+
+Where gunicorn cannot run (Windows) production mode falls back to uvicorn's
+own process manager: same workers and settings, but every worker imports
+the app itself.
+"""
+import argparse
+import os
+import sys
+
 import uvicorn
 
+from app.server import SERVER_HOST, SERVER_PORT, WEB_CONCURRENCY, uvicorn_options
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(args) -> None:
+    if args.reload:
+        uvicorn.run("app.main:app", host=SERVER_HOST, port=SERVER_PORT, reload=True)
+        return
+
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    try:
+        import gunicorn  # noqa: F401
+        import uvicorn_worker  # noqa: F401
+    except ImportError:
+        uvicorn.run("app.main:app", host=SERVER_HOST, port=SERVER_PORT, workers=args.workers,
+                    **uvicorn_options())
+        return
+    os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "-c", os.path.join(HERE, "gunicorn.conf.py"),
+                              "app.main:app"])
+
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8181, reload=True)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reload", action="store_true", help="development server with auto-reload")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help=f"worker processes (WEB_CONCURRENCY, default {WEB_CONCURRENCY})")
+    main(parser.parse_args())
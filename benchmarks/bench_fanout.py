@@ -0,0 +1,66 @@
+"""
+Benchmark: sequential provider lookups vs. the deadline-bounded fan-out.
+
+Starts the fake provider servers with one deliberately slow provider and
+measures end-to-end latency of ``FanOutEngine.gather`` against querying the
+same adapters one after another.
+
+    python -m benchmarks.bench_fanout --requests 50 --deadline 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks._util import serve, summarize
+from benchmarks.stubs import provider_stub_app
+
+LATENCY_MS = {"virustotal": 60, "abuseipdb": 90, "otx": 140, "urlscan": 1500}
+
+
+async def main(base: str, args):
+    import app.vt_router as vt_router
+    from app.rate_limit import KeyPool
+    from app.threat_intel.fanout import FanOutEngine
+    from app.threat_intel.models import IndicatorType
+    from app.threat_intel.providers import (
+        AbuseIPDBAdapter, OTXAdapter, URLScanAdapter, VirusTotalAdapter
+    )
+
+    vt_router.VT_API_KEYS = ["bench"]
+    vt_router.VT_BASE_URL = f"{base}/vtapi/v2"
+    vt_router.vt_keys = KeyPool(["bench"], rate_per_minute=1e9, burst=10_000)
+    adapters = [
+        VirusTotalAdapter(),
+        AbuseIPDBAdapter("bench", f"{base}/api/v2"),
+        OTXAdapter("bench", f"{base}/api/v1"),
+        URLScanAdapter("bench", f"{base}/api/v1"),
+    ]
+    engine = FanOutEngine(adapters, provider_timeout=5, deadline=args.deadline)
+
+    async def sequential(ip):
+        for adapter in adapters:
+            await adapter.query(ip, IndicatorType.IP)
+
+    async def fan_out(ip):
+        await engine.gather(ip, IndicatorType.IP)
+
+    results = {"provider_latency_ms": LATENCY_MS}
+    for label, lookup in [("before_sequential", sequential), ("after_fanout_deadline", fan_out)]:
+        samples = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            await lookup(f"198.51.100.{i % 250}")
+            samples.append((time.perf_counter() - start) * 1000)
+        results[label] = summarize(samples)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--deadline", type=float, default=0.5, help="seconds")
+    args = parser.parse_args()
+
+    with serve(provider_stub_app(LATENCY_MS)) as base:
+        print(json.dumps(asyncio.run(main(base, args)), indent=2))
@@ -0,0 +1,125 @@
+"""
+Benchmark: threat-feed ingestion throughput.
+
+Writes a synthetic feed of ``--indicators`` entries (IPs, domains, URLs and
+hashes, with some duplicates, defanged and invalid lines) to local CSV,
+plain-list and line-delimited STIX files, then ingests them with
+``app.threat_intel.feeds.ingest_feed``. As the "before" baseline, a sample
+is loaded one indicator per statement and transaction, as per-indicator
+``save_indicator`` calls would.
+
+Uses a temporary SQLite file unless ``--database-url`` is given (PostgreSQL
+exercises the COPY path).
+
+    python -m benchmarks.bench_feed_ingest --indicators 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+# select the database before app modules create their engines
+_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+_parser.add_argument("--indicators", type=int, default=1_000_000)
+_parser.add_argument("--batch", type=int, default=10_000)
+_parser.add_argument("--baseline-sample", type=int, default=2_000)
+_parser.add_argument("--database-url", default=None)
+ARGS = _parser.parse_args() if __name__ == "__main__" else None
+_TMP = tempfile.mkdtemp(prefix="feed-bench-")
+os.environ["DATABASE_URL"] = (ARGS and ARGS.database_url) or f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+from benchmarks import _util  # noqa: E402,F401  (puts backend/ on sys.path)
+
+
+def _value(rng: random.Random, i: int) -> str:
+    kind = i % 4
+    if kind == 0:
+        return f"{10 + i % 200}.{(i >> 8) % 256}.{(i >> 16) % 256}.{i % 256}"
+    if kind == 1:
+        return f"host{i}.bad-{i % 977}.example"
+    if kind == 2:
+        return f"hxxp://cdn{i}[.]example[.]net/p/{i % 9973}"  # defanged URL
+    return "%064x" % rng.getrandbits(256)
+
+
+def _stix_object(value: str) -> dict:
+    """IPs and hashes as indicator patterns, the rest as bare observables."""
+    if "://" in value:
+        return {"type": "url", "value": value}
+    if value.count(".") == 3 and value.replace(".", "").isdigit():
+        return {"type": "indicator", "confidence": 70, "pattern": f"[ipv4-addr:value = '{value}']"}
+    if "." not in value and "-" not in value:
+        return {"type": "indicator", "confidence": 70, "pattern": f"[file:hashes.'SHA-256' = '{value}']"}
+    return {"type": "domain-name", "value": value}
+
+
+def write_feeds(n: int):
+    """Split n entries across list, CSV and STIX files; ~2% duplicates, ~1% invalid."""
+    rng = random.Random(7)
+    per_file = n // 3
+    paths = {fmt: os.path.join(_TMP, f"feed.{fmt}") for fmt in ("list", "csv", "stix")}
+    offsets = {"list": 0, "csv": per_file, "stix": 2 * per_file}
+    with open(paths["list"], "w") as lst, open(paths["csv"], "w") as csv_file, \
+            open(paths["stix"], "w") as stix:
+        csv_file.write("indicator,risk_score\n")
+        for fmt, handle in (("list", lst), ("csv", csv_file), ("stix", stix)):
+            count = per_file if fmt != "stix" else n - 2 * per_file
+            for j in range(count):
+                i = offsets[fmt] + j
+                if j % 50 == 49:
+                    i -= 17  # duplicate of a recent entry
+                value = "not-an-indicator" if j % 100 == 99 else _value(rng, i)
+                if fmt == "list":
+                    handle.write(value + "\n")
+                elif fmt == "csv":
+                    handle.write(f"{value},{i % 100}\n")
+                else:
+                    handle.write(json.dumps(_stix_object(value)) + "\n")
+    return paths
+
+
+async def main(args):
+    from app.async_database import AsyncSessionLocal, init_models
+    from app.threat_intel.db_models import ThreatFeed
+    from app.threat_intel.feeds import ingest_feed
+    from app.threat_intel.repository import IndicatorRepository
+
+    await init_models()
+    start = time.perf_counter()
+    paths = write_feeds(args.indicators)
+    results = {"indicators": args.indicators, "generate_seconds": round(time.perf_counter() - start, 1),
+               "database": os.environ["DATABASE_URL"].split(":", 1)[0]}
+
+    # before: one statement + commit per indicator
+    rng = random.Random(11)
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        repo = IndicatorRepository(session)
+        for i in range(args.baseline_sample):
+            await repo.upsert_indicators([{"indicator": f"baseline-{i}.example", "indicator_type": "domain",
+                                           "risk_score": rng.randint(0, 100)}], refresh_rollups=False)
+            await session.commit()
+    elapsed = time.perf_counter() - start
+    results["before_row_at_a_time"] = {"sample": args.baseline_sample,
+                                       "indicators_per_second": round(args.baseline_sample / elapsed)}
+
+    async with AsyncSessionLocal() as session:
+        feeds = [ThreatFeed(name=f"bench-{fmt}", url=path, feed_type=fmt) for fmt, path in paths.items()]
+        session.add_all(feeds)
+        await session.commit()
+        feed_ids = {feed.feed_type: feed.id for feed in feeds}
+
+    start = time.perf_counter()
+    for fmt, feed_id in feed_ids.items():
+        results[f"after_{fmt}"] = await ingest_feed(feed_id, batch_size=args.batch)
+    elapsed = time.perf_counter() - start
+    parsed = sum(results[f"after_{fmt}"]["parsed"] for fmt in feed_ids)
+    results["after_total"] = {"seconds": round(elapsed, 1), "indicators_per_second": round(parsed / elapsed)}
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main(ARGS)), indent=2, default=str))
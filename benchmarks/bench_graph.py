@@ -0,0 +1,140 @@
+"""
+Benchmark: relationship graph expansion latency.
+
+Seeds a synthetic graph of ``--nodes`` indicators and ``--edges``
+relationships (skewed towards low ids, so some nodes become hubs) and times
+``IndicatorRepository.expand`` from random roots at several depths. As the
+"before" baseline, the same bounded BFS is run with one query per expanded
+node, as a naive pivot would.
+
+Uses a temporary SQLite file unless ``--database-url`` is given.
+
+    python -m benchmarks.bench_graph --nodes 200000 --edges 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+# select the database before app modules create their engines
+_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+_parser.add_argument("--nodes", type=int, default=200_000)
+_parser.add_argument("--edges", type=int, default=1_000_000)
+_parser.add_argument("--roots", type=int, default=200)
+_parser.add_argument("--baseline-roots", type=int, default=20)
+_parser.add_argument("--database-url", default=None)
+ARGS = _parser.parse_args() if __name__ == "__main__" else None
+_TMP = tempfile.mkdtemp(prefix="graph-bench-")
+os.environ["DATABASE_URL"] = (ARGS and ARGS.database_url) or f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+from benchmarks import _util  # noqa: E402  (puts backend/ on sys.path)
+
+TYPES = ["resolves_to", "downloads", "communicates_with", "drops"]
+
+
+def _indicator(i: int) -> str:
+    return f"node{i}.graph.example"
+
+
+async def seed(nodes: int, edges: int) -> None:
+    from sqlalchemy import insert
+
+    from app.async_database import AsyncSessionLocal, init_models
+    from app.threat_intel.db_models import IndicatorRelationship, ThreatIntel
+
+    await init_models()
+    rng = random.Random(5)
+    async with AsyncSessionLocal() as session:
+        for start in range(1, nodes + 1, 50_000):
+            await session.execute(insert(ThreatIntel.__table__), [
+                {"id": i, "indicator": _indicator(i), "indicator_type": "domain", "risk_score": i % 100}
+                for i in range(start, min(nodes + 1, start + 50_000))
+            ])
+        pairs = set()
+        while len(pairs) < edges:
+            source = rng.randint(1, nodes)
+            target = 1 + int(nodes * rng.random() ** 3)  # preferential: hubs at low ids
+            if source != target:
+                pairs.add((source, target))
+        pairs = list(pairs)
+        for start in range(0, len(pairs), 50_000):
+            await session.execute(insert(IndicatorRelationship.__table__), [
+                {"source_id": s, "target_id": t, "relationship_type": TYPES[(s + t) % 4],
+                 "confidence": (s * 31 + t) % 101}
+                for s, t in pairs[start:start + 50_000]
+            ])
+        await session.commit()
+
+
+async def per_node_bfs(session, root: int, depth: int, max_nodes: int, max_edges: int) -> int:
+    """The baseline: one query per expanded node, both directions."""
+    from sqlalchemy import or_, select
+
+    from app.threat_intel.db_models import IndicatorRelationship as rel
+
+    depths, frontier, edges = {root: 0}, [root], set()
+    for level in range(1, depth + 1):
+        next_frontier = []
+        for node in frontier:
+            rows = await session.execute(
+                select(rel.source_id, rel.target_id)
+                .where(or_(rel.source_id == node, rel.target_id == node))
+            )
+            for source, target in rows:
+                if len(edges) >= max_edges:
+                    return len(depths)
+                edges.add((source, target))
+                other = target if source == node else source
+                if other not in depths and len(depths) < max_nodes:
+                    depths[other] = level
+                    next_frontier.append(other)
+        frontier = next_frontier
+    return len(depths)
+
+
+async def main(args):
+    from app.async_database import AsyncSessionLocal
+    from app.threat_intel.models import IndicatorType
+    from app.threat_intel.repository import GRAPH_MAX_EDGES, GRAPH_MAX_NODES, IndicatorRepository
+
+    start = time.perf_counter()
+    await seed(args.nodes, args.edges)
+    results = {"nodes": args.nodes, "edges": args.edges,
+               "seed_seconds": round(time.perf_counter() - start, 1),
+               "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+               "max_nodes": GRAPH_MAX_NODES, "max_edges": GRAPH_MAX_EDGES}
+    rng = random.Random(9)
+    roots = [rng.randint(1, args.nodes) for _ in range(args.roots)]
+
+    async with AsyncSessionLocal() as session:
+        repo = IndicatorRepository(session)
+        for depth in (1, 2, 3):
+            for label, kwargs in (("", {}), ("_filtered", {"relationship_types": ["resolves_to", "downloads"],
+                                                          "min_confidence": 50})):
+                samples, sizes, truncated = [], [], 0
+                for root in roots:
+                    started = time.perf_counter()
+                    graph = await repo.expand(_indicator(root), IndicatorType.DOMAIN, depth, **kwargs)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    sizes.append(len(graph["nodes"]))
+                    truncated += graph["truncated"]
+                results[f"cte_depth{depth}{label}"] = {
+                    **_util.summarize(samples), "mean_nodes": round(sum(sizes) / len(sizes)),
+                    "truncated": truncated,
+                }
+
+        samples, sizes = [], []
+        for root in roots[:args.baseline_roots]:
+            started = time.perf_counter()
+            sizes.append(await per_node_bfs(session, root, 2, GRAPH_MAX_NODES, GRAPH_MAX_EDGES))
+            samples.append((time.perf_counter() - started) * 1000)
+        results["before_query_per_node_depth2"] = {**_util.summarize(samples),
+                                                   "mean_nodes": round(sum(sizes) / len(sizes))}
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main(ARGS)), indent=2))
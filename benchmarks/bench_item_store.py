@@ -0,0 +1,120 @@
+"""
+Benchmark: item store throughput under concurrent writers and readers.
+
+Runs a create/get/replace mix from a thread pool (as FastAPI's threadpool
+would) against the old unlocked dict + global counter, a single global
+lock, the lock-striped ``ShardedMemoryItemStore`` and ``SQLItemStore`` on
+a SQLite file (pass ``--database-url`` for PostgreSQL).
+
+    python -m benchmarks.bench_item_store --threads 16 --ops 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import _util  # noqa: F401  (puts backend/ on sys.path)
+
+ITEM = {"first_name": "Ada", "last_name": "Lovelace", "lucky_number": 42, "comment": None}
+
+
+class LegacyStore:
+    """The previous crud_router storage: module dict and unguarded counter."""
+
+    def __init__(self):
+        from app.models import ItemOut
+        self.item_out = ItemOut
+        self.db = {}
+        self.sequence = 1
+
+    def create(self, data):
+        out = self.item_out(id=self.sequence, **data)
+        self.db[self.sequence] = out
+        self.sequence += 1
+        return out
+
+    def get(self, item_id):
+        return self.db.get(item_id)
+
+    def replace(self, item_id, data):
+        if item_id not in self.db:
+            return None
+        out = self.item_out(id=item_id, **data)
+        self.db[item_id] = out
+        return out
+
+
+class SingleLockStore(LegacyStore):
+    """Correct but unsharded: one lock around every operation."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+    def create(self, data):
+        with self.lock:
+            return super().create(data)
+
+    def replace(self, item_id, data):
+        with self.lock:
+            return super().replace(item_id, data)
+
+
+def run(store, threads: int, ops: int):
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads)
+
+    def worker(_):
+        barrier.wait()
+        ids = []
+        for i in range(per_thread):
+            if i % 4 == 0 or not ids:  # 25% writes of new items
+                ids.append(store.create(ITEM).id)
+            elif i % 4 == 1:
+                store.replace(ids[-1], ITEM)
+            else:
+                store.get(ids[i % len(ids)])
+        return ids
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        created = [i for ids in pool.map(worker, range(threads)) for i in ids]
+    elapsed = time.perf_counter() - start
+    return {
+        "ops_per_s": round(per_thread * threads / elapsed),
+        "created": len(created),
+        "duplicate_ids": len(created) - len(set(created)),
+    }
+
+
+def main(args):
+    from sqlalchemy import create_engine
+    from app.item_store import ShardedMemoryItemStore, SQLItemStore
+
+    results = {"threads": args.threads, "ops": args.ops}
+    results["before_unlocked_dict"] = run(LegacyStore(), args.threads, args.ops)
+    results["single_lock"] = run(SingleLockStore(), args.threads, args.ops)
+    results["after_sharded_memory"] = run(ShardedMemoryItemStore(args.shards), args.threads, args.ops)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'items.db')}"
+        engine = create_engine(url, pool_size=args.threads, **(
+            {"connect_args": {"check_same_thread": False, "timeout": 30}}
+            if url.startswith("sqlite") else {}
+        ))
+        # database round trips are far slower; keep the run short
+        results["after_database"] = run(SQLItemStore(engine), args.threads, args.ops // 10)
+        engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--database-url", default=None)
+    print(json.dumps(main(parser.parse_args()), indent=2))
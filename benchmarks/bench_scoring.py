@@ -0,0 +1,154 @@
+"""
+Benchmark: risk scoring throughput.
+
+In memory, scores ``--rows`` synthetic indicators three ways: the NumPy
+kernel on a prepared feature matrix, ``score_batch`` from indicator dicts
+(feature extraction included) and ``score_indicator`` one at a time.
+
+Against a database, seeds ``--db-rows`` analyzed indicators with provider
+reports and times ``IndicatorRepository.rescore`` for the full table. As
+the "before" baseline, a sample is re-scored row at a time (load the
+indicator, score it, update and commit), as a per-request re-score would.
+
+Uses a temporary SQLite file unless ``--database-url`` is given.
+
+    python -m benchmarks.bench_scoring --rows 1000000 --db-rows 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# select the database before app modules create their engines
+_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+_parser.add_argument("--rows", type=int, default=1_000_000)
+_parser.add_argument("--single-sample", type=int, default=20_000)
+_parser.add_argument("--db-rows", type=int, default=100_000)
+_parser.add_argument("--baseline-sample", type=int, default=2_000)
+_parser.add_argument("--database-url", default=None)
+ARGS = _parser.parse_args() if __name__ == "__main__" else None
+_TMP = tempfile.mkdtemp(prefix="scoring-bench-")
+os.environ["DATABASE_URL"] = (ARGS and ARGS.database_url) or f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+from benchmarks import _util  # noqa: E402,F401  (puts backend/ on sys.path)
+
+PROVIDERS = ["virustotal", "abuseipdb", "otx", "urlscan"]
+
+
+def synthetic_indicator(rng: random.Random, i: int, now: datetime) -> dict:
+    providers = {name: {"detected": rng.random() < 0.4, "confidence": rng.randint(20, 100)}
+                 for name in rng.sample(PROVIDERS, k=rng.randint(1, 4))}
+    return {
+        "indicator": f"10.{(i >> 16) % 256}.{(i >> 8) % 256}.{i % 256}",
+        "indicator_type": "ip",
+        "providers": providers,
+        "malware": {"emotet": rng.randint(1, 30)} if rng.random() < 0.2 else {},
+        "risk_factors": {
+            "provider_scores": {name: rng.randint(0, 100) for name in providers},
+            "historical_reports": rng.randint(0, 20),
+            "community_reports": rng.randint(0, 50),
+            "related_threats": 0,
+        },
+        "last_seen": now - timedelta(days=rng.uniform(0, 365)),
+    }
+
+
+def rate(rows: int, seconds: float) -> dict:
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_second": round(rows / seconds)}
+
+
+def in_memory(args, now):
+    from app.threat_intel.scoring import extract_features, score_batch, score_features, score_indicator
+
+    rng = random.Random(7)
+    indicators = [synthetic_indicator(rng, i, now) for i in range(args.rows)]
+    results = {}
+
+    start = time.perf_counter()
+    features = extract_features(indicators, now)
+    extract = time.perf_counter() - start
+    start = time.perf_counter()
+    score_features(features)
+    results["kernel"] = rate(args.rows, time.perf_counter() - start)
+    results["extract_features"] = rate(args.rows, extract)
+
+    start = time.perf_counter()
+    score_batch(indicators, now=now)
+    results["score_batch"] = rate(args.rows, time.perf_counter() - start)
+
+    sample = indicators[:args.single_sample]
+    start = time.perf_counter()
+    for indicator in sample:
+        score_indicator(indicator, now=now)
+    results["score_indicator"] = rate(len(sample), time.perf_counter() - start)
+    return results
+
+
+async def seed(n: int, now: datetime):
+    from app.async_database import AsyncSessionLocal, init_models
+    from app.threat_intel.repository import IndicatorRepository
+
+    await init_models()
+    rng = random.Random(11)
+    async with AsyncSessionLocal() as session:
+        repo = IndicatorRepository(session)
+        for start in range(0, n, 10_000):
+            batch = [synthetic_indicator(rng, i, now) for i in range(start, min(n, start + 10_000))]
+            ids = await repo.upsert_indicators([
+                {**data, "risk_score": 0, "last_seen": data["last_seen"],
+                 "indicator_metadata": {"risk_factors": data["risk_factors"]}}
+                for data in batch
+            ], refresh_rollups=False)
+            await repo.add_provider_reports([
+                {"indicator_id": ids[(data["indicator"], "ip")], "provider": name, "report_time": now,
+                 "detected": report["detected"], "confidence": report["confidence"], "raw_data": {}}
+                for data in batch for name, report in data["providers"].items()
+            ])
+            await session.commit()
+
+
+async def database(args, now):
+    from sqlalchemy import update
+
+    from app.async_database import AsyncSessionLocal
+    from app.threat_intel.db_models import ThreatIntel
+    from app.threat_intel.repository import IndicatorRepository
+    from app.threat_intel.scoring import ScoringWeights, score_indicator
+
+    start = time.perf_counter()
+    await seed(args.db_rows, now)
+    results = {"seed_seconds": round(time.perf_counter() - start, 1),
+               "database": os.environ["DATABASE_URL"].split(":", 1)[0]}
+
+    # before: one indicator per read, score, write and commit
+    rng = random.Random(13)
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        repo = IndicatorRepository(session)
+        for i in rng.sample(range(args.db_rows), args.baseline_sample):
+            data = await repo.get_indicator(f"10.{(i >> 16) % 256}.{(i >> 8) % 256}.{i % 256}", "ip")
+            risk, confidence = score_indicator(data, now=now)
+            await session.execute(update(ThreatIntel).where(ThreatIntel.indicator == data["indicator"])
+                                  .values(risk_score=risk))
+            await session.commit()
+    results["before_row_at_a_time"] = rate(args.baseline_sample, time.perf_counter() - start)
+
+    # after: full-table re-score with changed weights
+    async with AsyncSessionLocal() as session:
+        start = time.perf_counter()
+        changed = await IndicatorRepository(session).rescore(ScoringWeights(half_life_days=90), now=now)
+        results["after_rescore"] = {**rate(args.db_rows, time.perf_counter() - start), "changed": changed}
+    return results
+
+
+def main(args):
+    now = datetime.now()
+    return {"in_memory": in_memory(args, now), "database": asyncio.run(database(args, now))}
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(ARGS), indent=2))
@@ -0,0 +1,127 @@
+"""
+Benchmark: response serialization for large threat-intel payloads.
+
+Payloads: a ``SearchResponse`` with 100 indicators and a 365-day
+``TrendData``, both from ``MockDataProvider``.
+
+* serializer: time to turn an already-built model into JSON bytes with
+  ``jsonable_encoder`` + ``json.dumps``, ``orjson`` over ``model_dump()``,
+  and pydantic-core's ``to_json`` (what ``FastJSONResponse`` uses)
+* endpoint: in-process requests (httpx ASGITransport) to a one-route app
+  whose handler builds the model from dicts, as the threat-intel handlers
+  do, and returns it through FastAPI's ``response_model`` path, through an
+  untyped route (``jsonable_encoder``), or as ``FastJSONResponse(model)``
+
+    python -m benchmarks.bench_serialization --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks import _util  # noqa: F401  (puts backend/ on sys.path)
+
+
+def payloads():
+    from app.threat_intel.mock_data import MockDataProvider
+
+    search = {
+        "indicators": [MockDataProvider.get_mock_indicator(f"198.51.100.{i}", "ip") for i in range(100)],
+        "total_count": 100,
+        "has_more": False,
+    }
+    trends = MockDataProvider.get_mock_trend_data(365)
+    return {"search_100": search, "trends_365": trends}
+
+
+def time_ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1000, 4)
+
+
+def serializers(model, repeat: int):
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+
+    return {
+        "jsonable_encoder+json.dumps": time_ms(lambda: json.dumps(jsonable_encoder(model)).encode(), repeat // 10),
+        "orjson(model_dump)": time_ms(lambda: orjson.dumps(model.model_dump()), repeat),
+        "pydantic to_json": time_ms(lambda: model.__pydantic_serializer__.to_json(model), repeat),
+        "build model from dicts": time_ms(lambda: type(model)(**model.model_dump()), repeat),
+    }
+
+
+VARIANTS = ("before_response_model", "before_untyped", "after")
+
+
+def build_app(variant: str, model_cls, data):
+    from fastapi import FastAPI
+
+    from app.responses import FastJSONResponse
+
+    if variant == "before_response_model":
+        # FastAPI's own path: re-validate the returned model, dump via pydantic-core
+        app = FastAPI()
+
+        @app.get("/payload", response_model=model_cls)
+        async def payload():
+            return model_cls(**data)
+    elif variant == "before_untyped":
+        # no response_model: jsonable_encoder + json.dumps
+        app = FastAPI()
+
+        @app.get("/payload")
+        async def payload():
+            return model_cls(**data)
+    else:
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/payload", response_model=model_cls)
+        async def payload():
+            return FastJSONResponse(model_cls(**data))
+
+    return app
+
+
+async def endpoints(model_cls, data, requests: int):
+    """Time every variant, interleaved so that clock drift hits all alike."""
+    clients = {
+        variant: httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app(variant, model_cls, data)),
+                                   base_url="http://bench")
+        for variant in VARIANTS
+    }
+    samples = {variant: [] for variant in VARIANTS}
+    bodies = {variant: (await client.get("/payload")).content for variant, client in clients.items()}
+    for _ in range(requests):
+        for variant, client in clients.items():
+            start = time.perf_counter()
+            await client.get("/payload")
+            samples[variant].append((time.perf_counter() - start) * 1000)
+    for client in clients.values():
+        await client.aclose()
+    return {variant: {**_util.summarize(samples[variant]), "bytes": len(bodies[variant])}
+            for variant in VARIANTS}
+
+
+def main(args):
+    from app.threat_intel.models import SearchResponse, TrendData
+
+    results = {}
+    for (name, data), model_cls in zip(payloads().items(), (SearchResponse, TrendData)):
+        model = model_cls(**data)
+        results[name] = {
+            "serializer_ms": serializers(model, args.repeat),
+            "endpoint": asyncio.run(endpoints(model_cls, data, args.requests)),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    print(json.dumps(main(parser.parse_args()), indent=2))
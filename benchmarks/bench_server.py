@@ -0,0 +1,165 @@
+"""
+Benchmark: requests/sec of the development server vs. the production server.
+
+Starts the app as a real server process in each launch mode, against a
+seeded SQLite file, and drives it with keep-alive HTTP/1.1 clients running
+in separate processes, so neither side shares a GIL:
+
+* ``reload``  – the old default, ``uvicorn --reload`` (one worker plus the
+  file watcher)
+* ``single``  – ``run.py --workers 1``: gunicorn, one preloaded uvicorn
+  worker on uvloop/httptools
+* ``workers`` – ``run.py``: gunicorn, one worker per CPU
+
+    python -m benchmarks.bench_server --duration 10 --clients 4 --connections 32
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+from benchmarks import _util
+from benchmarks.suite import seed
+
+from app.server import default_workers  # noqa: E402  (path set up by _util)
+
+BACKEND = os.path.join(_util.ROOT, "backend")
+_CONTENT_LENGTH = re.compile(rb"(?i)\r\ncontent-length: *(\d+)")
+
+MODES = {
+    "reload": lambda port, workers: [sys.executable, "-m", "uvicorn", "app.main:app",
+                                     "--port", str(port), "--reload", "--log-level", "warning"],
+    "single": lambda port, workers: [sys.executable, "run.py", "--workers", "1"],
+    "workers": lambda port, workers: [sys.executable, "run.py", "--workers", str(workers)],
+}
+
+SCENARIOS = [
+    ("health", "/"),
+    ("items_list", "/items?limit=100"),
+    ("threat_intel_trends", "/threat-intel/trends?days=30"),
+]
+
+
+# ----------------------------------------------------------------------
+#  Load generator (one process per client)
+# ----------------------------------------------------------------------
+async def _connection(port: int, request: bytes, deadline: float,
+                      samples: List[float], statuses: Dict[int, int]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            await reader.readexactly(int(_CONTENT_LENGTH.search(head).group(1)))
+            samples.append((time.perf_counter() - start) * 1000)
+            status = int(head[9:12])
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def _client(job: Tuple[int, str, int, float]) -> Tuple[List[float], Dict[int, int]]:
+    port, path, connections, duration = job
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode()
+    samples: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def run():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_connection(port, request, deadline, samples, statuses)
+                               for _ in range(connections)))
+
+    asyncio.run(run())
+    return samples, statuses
+
+
+def drive(pool, port: int, path: str, args) -> Dict[str, float]:
+    per_client = max(1, args.connections // args.clients)
+    pool.map(_client, [(port, path, per_client, 1.0)] * args.clients)  # warm-up
+    results = pool.map(_client, [(port, path, per_client, args.duration)] * args.clients)
+    samples = [sample for client_samples, _ in results for sample in client_samples]
+    statuses: Dict[int, int] = {}
+    for _, client_statuses in results:
+        for status, n in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + n
+    return {**_util.summarize(samples), "rps": round(len(samples) / args.duration, 1),
+            "statuses": {str(code): n for code, n in sorted(statuses.items())}}
+
+
+# ----------------------------------------------------------------------
+#  Servers
+# ----------------------------------------------------------------------
+def start(mode: str, env: Dict[str, str], workers: int, log) -> Tuple[subprocess.Popen, int]:
+    port = _util.free_port()
+    process = subprocess.Popen(MODES[mode](port, workers), cwd=BACKEND, stdout=log, stderr=log,
+                               env={**env, "SERVER_HOST": "127.0.0.1", "SERVER_PORT": str(port)},
+                               start_new_session=True)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {process.returncode}; see {log.name}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            time.sleep(2)  # the first worker answered; let the others finish booting
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    stop(process)
+    raise RuntimeError(f"{mode} server did not answer within 60 s; see {log.name}")
+
+
+def stop(process: subprocess.Popen) -> None:
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=45)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def main(args) -> Dict[str, Dict[str, Dict[str, float]]]:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'server.db')}",
+        # the in-memory store is per worker; every mode reads the same seeded table
+        "ITEM_STORE": "database",
+        "FEED_SCHEDULER_ENABLED": "False",
+        "METRICS_ENABLED": "True",
+    }
+    os.environ.update(env)
+    asyncio.run(seed(args.indicators, args.items))
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool, \
+            tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as log:
+        for mode in args.modes:
+            process, port = start(mode, env, args.workers, log)
+            try:
+                results[mode] = {name: drive(pool, port, path, args) for name, path in SCENARIOS}
+            finally:
+                stop(process)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="workers in the 'workers' mode (default: CPUs)")
+    parser.add_argument("--clients", type=int, default=max(1, default_workers() // 2),
+                        help="load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="keep-alive connections in total")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--indicators", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,65 @@
+"""
+Benchmark: per-request AsyncClient vs. the shared pooled client.
+
+Runs a local VirusTotal stub and issues the same domain-report lookups
+twice – once the old way (a fresh ``httpx.AsyncClient`` per call) and once
+through ``app.http_client``'s shared client – then prints p50/p99.
+
+    python -m benchmarks.bench_vt_client --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks._util import serve, summarize
+from benchmarks.stubs import vt_stub_app
+
+
+async def _run(lookup, n: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i: int):
+        async with sem:
+            start = time.perf_counter()
+            r = await lookup(f"example{i % 50}.com")
+            samples.append((time.perf_counter() - start) * 1000)
+            assert r.status_code == 200
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return samples
+
+
+async def main(n: int, concurrency: int, base_url: str):
+    from app.http_client import build_client
+
+    url = f"{base_url}/vtapi/v2/domain/report"
+
+    async def per_request(domain):
+        async with httpx.AsyncClient(timeout=30) as client:
+            return await client.get(url, params={"domain": domain}, follow_redirects=True)
+
+    shared = build_client()
+
+    async def pooled(domain):
+        return await shared.get(url, params={"domain": domain})
+
+    results = {
+        "before_per_request_client": summarize(await _run(per_request, n, concurrency)),
+        "after_shared_client": summarize(await _run(pooled, n, concurrency)),
+    }
+    await shared.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    with serve(vt_stub_app()) as base:
+        print(json.dumps(asyncio.run(main(args.requests, args.concurrency, base)), indent=2))
@@ -0,0 +1,92 @@
+"""
+Benchmark: VirusTotal lookups against a quota-enforcing stub.
+
+Compares firing requests as fast as possible (the old behaviour) with going
+through ``vt_router``'s per-key token buckets. Reports accepted requests
+per second and how many were rejected with 204 by the stub.
+
+    python -m benchmarks.bench_vt_quota --quota 60 --keys 2 --seconds 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from benchmarks._util import serve
+from benchmarks.stubs import vt_stub_app
+
+
+async def _hammer(fetch, seconds: float, concurrency: int):
+    counter = itertools.count()
+    ok = 0
+    start = time.monotonic()
+    stop = start + seconds
+
+    async def worker():
+        nonlocal ok
+        while time.monotonic() < stop:
+            if await fetch(f"d{next(counter)}.example.com"):
+                ok += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    # queued requests may finish after ``stop``; rate over the real span
+    return round(ok / (time.monotonic() - start), 2)
+
+
+async def main(base_url: str, stub, args):
+    import app.vt_router as vt_router
+    from app.http_client import build_client
+    from app.rate_limit import KeyPool
+
+    keys = [f"key{i}" for i in range(args.keys)]
+    client = build_client()
+    url = f"{base_url}/vtapi/v2/domain/report"
+    results = {}
+
+    rotation = itertools.cycle(keys)
+
+    async def unlimited(domain):
+        r = await client.get(url, params={"apikey": next(rotation), "domain": domain})
+        return r.status_code == 200
+
+    results["before_unlimited"] = {
+        "accepted_per_s": await _hammer(unlimited, args.seconds, args.concurrency),
+        "rejected_204": stub.state.rejected,
+    }
+
+    # fresh stub windows for the second run
+    stub.state.calls.clear()
+    stub.state.rejected = 0
+    vt_router.VT_BASE_URL = f"{base_url}/vtapi/v2"
+    vt_router.VT_QUEUE_DEADLINE = args.seconds
+    vt_router.vt_keys = KeyPool(keys, rate_per_minute=args.quota, burst=1)
+    vt_router.get_http_client = lambda: client
+
+    async def limited(domain):
+        try:
+            await vt_router.fetch_domain_report(domain)
+            return True
+        except Exception:
+            return False
+
+    results["after_token_bucket"] = {
+        "accepted_per_s": await _hammer(limited, args.seconds, args.concurrency),
+        "rejected_204": stub.state.rejected,
+    }
+    results["quota_ceiling_per_s"] = round(args.quota * args.keys / 60, 2)
+    await client.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quota", type=int, default=60, help="stub quota per key per minute")
+    parser.add_argument("--keys", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    stub = vt_stub_app(latency_ms=20, quota_per_minute=args.quota)
+    with serve(stub) as base:
+        print(json.dumps(asyncio.run(main(base, stub, args)), indent=2))
@@ -0,0 +1,122 @@
+"""
+Local stub servers standing in for third-party threat-intel APIs.
+
+They let benchmarks (and tests) exercise the real HTTP code paths without
+network access or API quota.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Response
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+
+
+def vt_stub_app(latency_ms: float = STUB_LATENCY_MS, quota_per_minute: int = 0) -> FastAPI:
+    """
+    VirusTotal v2 look-alike serving ``/vtapi/v2/domain/report``.
+
+    Args:
+        latency_ms: Artificial server-side delay per request
+        quota_per_minute: If set, answer 204 (like VT) once a key has made
+            this many requests in the trailing 60 seconds
+    """
+    app = FastAPI()
+    app.state.calls = defaultdict(deque)
+    app.state.rejected = 0
+
+    @app.get("/vtapi/v2/domain/report")
+    async def domain_report(domain: str, apikey: str = ""):
+        if quota_per_minute:
+            now = time.monotonic()
+            window = app.state.calls[apikey]
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if len(window) >= quota_per_minute:
+                app.state.rejected += 1
+                return Response(status_code=204)
+            window.append(now)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return {
+            "response_code": 1,
+            "verbose_msg": "Domain found in dataset",
+            "domain": domain,
+            "categories": ["information technology"],
+            "detected_urls": [],
+            "resolutions": [{"ip_address": "93.184.216.34", "last_resolved": "2024-01-01 00:00:00"}],
+        }
+
+    return app
+
+
+def _seed(indicator: str) -> int:
+    """Stable pseudo-random number per indicator so fakes are deterministic."""
+    return int(hashlib.sha1(indicator.encode()).hexdigest()[:8], 16)
+
+
+def provider_stub_app(latency_ms: Optional[Dict[str, float]] = None) -> FastAPI:
+    """
+    Fake VirusTotal, AbuseIPDB, OTX and urlscan APIs on one app.
+
+    Paths mirror the real APIs, so adapters only need their base URL
+    pointed here: ``/vtapi/v2``, ``/api/v2`` (AbuseIPDB), ``/api/v1``
+    (OTX and urlscan).
+
+    Args:
+        latency_ms: Per-provider artificial delay, e.g. ``{"otx": 2000}``
+    """
+    latency_ms = latency_ms or {}
+    app = FastAPI()
+
+    async def delay(provider: str):
+        if latency_ms.get(provider):
+            await asyncio.sleep(latency_ms[provider] / 1000)
+
+    @app.get("/vtapi/v2/{kind}/report")
+    async def virustotal(kind: str, ip: str = "", domain: str = "", resource: str = ""):
+        await delay("virustotal")
+        indicator = ip or domain or resource
+        seed = _seed(indicator)
+        if kind in ("url", "file"):
+            return {"response_code": 1, "positives": seed % 20, "total": 70}
+        return {
+            "response_code": 1,
+            "country": "US" if kind == "ip-address" else None,
+            "categories": ["malware"] if seed % 3 == 0 else ["information technology"],
+            "detected_urls": [{"url": f"http://{indicator}/{i}", "positives": 3} for i in range(seed % 5)],
+        }
+
+    @app.get("/api/v2/check")
+    async def abuseipdb(ipAddress: str):
+        await delay("abuseipdb")
+        seed = _seed(ipAddress)
+        return {"data": {
+            "ipAddress": ipAddress,
+            "abuseConfidenceScore": seed % 101,
+            "countryCode": "DE",
+            "usageType": "Data Center/Web Hosting/Transit",
+            "totalReports": seed % 40,
+        }}
+
+    @app.get("/api/v1/indicators/{section}/{indicator:path}/general")
+    async def otx(section: str, indicator: str):
+        await delay("otx")
+        count = _seed(indicator) % 8
+        return {"pulse_info": {"count": count, "pulses": [
+            {"name": f"pulse {i}", "tags": ["botnet", "phishing"][: i % 3]} for i in range(count)
+        ]}}
+
+    @app.get("/api/v1/search/")
+    async def urlscan(q: str, size: int = 100):
+        await delay("urlscan")
+        seed = _seed(q)
+        return {"results": [
+            {"verdicts": {"overall": {"malicious": i < seed % 4}}} for i in range(seed % 10)
+        ], "total": seed % 10}
+
+    return app
@@ -0,0 +1,256 @@
+"""
+Benchmark suite: micro-benchmarks and HTTP load tests, compared to a baseline.
+
+Runs fully offline. Micro-benchmarks time the hot pieces of request
+handling in process:
+
+* ``ItemIn`` validation (valid and rejected payloads)
+* ``DOMAIN_RX`` matching
+* ``ThreatIndicator`` construction
+* ``SearchResponse`` (100 indicators) validation and serialization
+
+Load tests start the whole app under uvicorn against a seeded SQLite file
+and the stub VirusTotal/provider server from ``benchmarks/stubs.py``, then
+drive ``/items``, ``/research_domain``, ``/threat-intel/search``,
+``/threat-intel/trends`` and ``/threat-intel/risk-score`` with concurrent
+clients. The load generator runs in the same process as the server, so
+absolute numbers include client overhead; compare runs on the same machine.
+
+Results are written as JSON. ``--compare`` checks them against a stored
+baseline and exits with status 1 if any metric got worse by more than
+``--tolerance`` (micro) or ``--macro-tolerance`` (load tests), i.e.
+latencies up or throughput down:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks import _util
+from benchmarks.stubs import provider_stub_app
+
+# (metric, True when higher is better) compared against the baseline
+COMPARED = {"us_per_op": False, "p50_ms": False, "rps": True}
+
+
+# ----------------------------------------------------------------------
+#  Micro-benchmarks
+# ----------------------------------------------------------------------
+def time_op(fn: Callable[[], Any], repeat: int = 5) -> Dict[str, float]:
+    """Best per-call time over ``repeat`` timeit runs, each at least 0.2 s."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"us_per_op": round(best * 1e6, 3), "loops": number * repeat}
+
+
+def micro() -> Dict[str, Dict[str, float]]:
+    from pydantic import ValidationError
+
+    from app.models import DOMAIN_RX, ItemIn
+    from app.responses import FastJSONResponse
+    from app.threat_intel.mock_data import MockDataProvider
+    from app.threat_intel.models import SearchResponse, ThreatIndicator
+
+    item = {"first_name": "Ada", "last_name": "Lovelace", "lucky_number": 7, "comment": "analyst"}
+    bad_item = {"first_name": "Ada1", "last_name": "", "lucky_number": -1}
+
+    def reject():
+        try:
+            ItemIn(**bad_item)
+        except ValidationError:
+            pass
+
+    domains = ([f"host{i}.example{i % 7}.com" for i in range(50)]
+               + ["-bad.example.com", "no_underscores.example.com", "a.b", "x" * 300 + ".com"]
+               + [".".join(["label"] * 40) + ".org"] * 6)
+
+    def match_domains():
+        for domain in domains:
+            DOMAIN_RX.fullmatch(domain)
+
+    indicator = MockDataProvider.get_mock_indicator("198.51.100.7", "ip")
+    page = {
+        "indicators": [MockDataProvider.get_mock_indicator(f"198.51.100.{i}", "ip") for i in range(100)],
+        "total_count": 100,
+        "has_more": False,
+    }
+    search = SearchResponse(**page)
+
+    results = {
+        "item_in_validate": time_op(lambda: ItemIn(**item)),
+        "item_in_reject": time_op(reject),
+        "domain_rx_match_60": time_op(match_domains),
+        "threat_indicator_construct": time_op(lambda: ThreatIndicator(**indicator)),
+        "search_response_validate_100": time_op(lambda: SearchResponse(**page)),
+        "search_response_serialize_100": time_op(lambda: FastJSONResponse(search).body),
+    }
+    return results
+
+
+# ----------------------------------------------------------------------
+#  Load tests
+# ----------------------------------------------------------------------
+async def seed(indicators: int, items: int) -> None:
+    from app.async_database import AsyncSessionLocal, init_models
+    from app.crud_router import store
+    from app.threat_intel.repository import IndicatorRepository
+
+    await init_models()
+    async with AsyncSessionLocal() as session:
+        repo = IndicatorRepository(session)
+        await repo.upsert_indicators([
+            {"indicator": f"bench{i}.example.com", "indicator_type": "domain", "risk_score": i % 100,
+             "indicator_metadata": {"geolocation": {"country": country, "country_code": country}}}
+            for i, country in ((i, ["US", "DE", "NL", "BR"][i % 4]) for i in range(indicators))
+        ])
+        await session.commit()
+    store.create_many([{"first_name": "Ada", "last_name": "Lovelace", "lucky_number": i % 100 + 1,
+                        "comment": None} for i in range(items)])
+
+
+async def load(base_url: str, name: str, request: Callable[[Any, int], Any],
+               requests: int, concurrency: int) -> Dict[str, float]:
+    import httpx
+
+    samples: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await request(client, 0)  # warm-up
+
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                response = await request(client, i)
+                samples.append((time.perf_counter() - start) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {**_util.summarize(samples), "rps": round(len(samples) / elapsed, 1),
+            "statuses": {str(code): n for code, n in sorted(statuses.items())}}
+
+
+SCENARIOS: List[Tuple[str, Callable[[Any, int], Any]]] = [
+    ("items_list", lambda client, i: client.get("/items", params={"limit": 100})),
+    ("research_domain", lambda client, i: client.get(f"/research_domain/site{i % 500}.example.com")),
+    ("threat_intel_search", lambda client, i: client.post(
+        "/threat-intel/search", json={"query": f"bench{i % 10}", "limit": 50})),
+    ("threat_intel_trends", lambda client, i: client.get("/threat-intel/trends", params={"days": 30})),
+    # the first lookup of each address fans out to the provider stubs; repeats are served from the database
+    ("threat_intel_risk_score", lambda client, i: client.get(
+        f"/threat-intel/risk-score/ip/198.51.100.{i % 250}")),
+]
+
+
+def macro(args) -> Dict[str, Dict[str, float]]:
+    with _util.serve(provider_stub_app()) as stub_url:
+        # configure the app for the stubs before its modules read the environment
+        os.environ.update({
+            "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}",
+            "VT_API_KEYS": "bench", "VT_BASE_URL": f"{stub_url}/vtapi/v2",
+            "VT_RATE_PER_MINUTE": "100000000", "VT_RATE_BURST": "100000",
+            # every lookup goes upstream: measures the proxy path, not the cache
+            "VT_CACHE_TTL": "0", "VT_CACHE_STALE_TTL": "0", "VT_CACHE_NEGATIVE_TTL": "0",
+            "ABUSEIPDB_API_KEY": "bench", "ABUSEIPDB_BASE_URL": f"{stub_url}/api/v2",
+            "OTX_API_KEY": "bench", "OTX_BASE_URL": f"{stub_url}/api/v1",
+            "URLSCAN_API_KEY": "bench", "URLSCAN_BASE_URL": f"{stub_url}/api/v1",
+            "FEED_SCHEDULER_ENABLED": "False",
+        })
+        asyncio.run(seed(args.indicators, args.items))
+        from app.main import app
+
+        with _util.serve(app) as base_url:
+            return {
+                name: asyncio.run(load(base_url, name, request, args.requests, args.concurrency))
+                for name, request in SCENARIOS
+            }
+
+
+# ----------------------------------------------------------------------
+#  Baselines
+# ----------------------------------------------------------------------
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: Dict[str, float]) -> List[str]:
+    """
+    Regressions of ``results`` against ``baseline``, one message each.
+
+    A metric regresses when it is worse than the baseline by more than the
+    group's tolerance (``{"micro": 0.25, ...}``, 0.25 = 25 %); benchmarks
+    missing on either side are skipped.
+    """
+    failures = []
+    for group in ("micro", "macro"):
+        for name, expected in baseline.get(group, {}).items():
+            actual = results.get(group, {}).get(name)
+            if actual is None:
+                continue
+            for metric, higher_is_better in COMPARED.items():
+                if metric not in expected or metric not in actual or not expected[metric]:
+                    continue
+                change = (actual[metric] - expected[metric]) / expected[metric]
+                if (-change if higher_is_better else change) > tolerance[group]:
+                    failures.append(f"{group}.{name}.{metric}: {actual[metric]} vs baseline "
+                                    f"{expected[metric]} ({change:+.0%})")
+    return failures
+
+
+def main(args) -> int:
+    results: Dict[str, Any] = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    if not args.macro_only:
+        results["micro"] = micro()
+    if not args.micro_only:
+        results["macro"] = macro(args)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(results, json.load(f),
+                               {"micro": args.tolerance, "macro": args.macro_tolerance})
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            return 1
+        print(f"no regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="write results JSON here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, micro-benchmarks")
+    parser.add_argument("--macro-tolerance", type=float, default=0.5, help="allowed slowdown, load tests")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--indicators", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--database-url", default=None)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--micro-only", action="store_true")
+    group.add_argument("--macro-only", action="store_true")
+    sys.exit(main(parser.parse_args()))
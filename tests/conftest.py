@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Repo root on sys.path so tests can reuse the stub servers in benchmarks/
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+# Never touch the dev database: tests use a throwaway SQLite file unless
+# TEST_DATABASE_URL points somewhere else (e.g. the CI PostgreSQL service)
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(), "threat_intel_tests.db"),
+)
+# Tests that run the app's lifespan must not start the feed scheduler: its
+# first scan, cancelled at shutdown, can leave the SQLite file locked for
+# the next test. Scheduler tests build their own FeedScheduler.
+os.environ.setdefault("FEED_SCHEDULER_ENABLED", "False")
+
+
+@pytest.fixture
+def threat_db():
+    """Fresh threat-intel tables; yields the async session factory."""
+    from app.async_database import AsyncSessionLocal, Base, get_async_engine, init_models
+    from app.threat_intel.facets import facet_index
+
+    async def reset():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await init_models()
+
+    asyncio.run(reset())
+    facet_index.invalidate()
+    yield AsyncSessionLocal
+    # the background refresh would otherwise keep reading the next test's database
+    asyncio.run(facet_index.stop())
+    facet_index.invalidate()
@@ -0,0 +1,20 @@
+from benchmarks.suite import compare
+
+TOLERANCE = {"micro": 0.25, "macro": 0.5}
+
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    baseline = {
+        "micro": {"item_in_validate": {"us_per_op": 2.0}, "gone": {"us_per_op": 1.0}},
+        "macro": {"items_list": {"p50_ms": 40.0, "rps": 300.0}},
+    }
+    faster = {"micro": {"item_in_validate": {"us_per_op": 1.5}},
+              "macro": {"items_list": {"p50_ms": 50.0, "rps": 280.0}}}
+    assert compare(faster, baseline, TOLERANCE) == []
+
+    slower = {"micro": {"item_in_validate": {"us_per_op": 2.6}},
+              "macro": {"items_list": {"p50_ms": 41.0, "rps": 140.0}}}
+    assert compare(slower, baseline, TOLERANCE) == [
+        "micro.item_in_validate.us_per_op: 2.6 vs baseline 2.0 (+30%)",
+        "macro.items_list.rps: 140.0 vs baseline 300.0 (-53%)",
+    ]
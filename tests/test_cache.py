@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.cache import CacheableMiss, ResponseCache
+
+
+def test_lru_eviction_and_counters():
+    async def scenario():
+        cache = ResponseCache(ttl=60, negative_ttl=60, max_entries=2)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            return key.upper()
+
+        for key in ["a", "b", "a", "c", "a", "b"]:
+            assert await cache.get_or_load(key, lambda k=key: loader(k)) == key.upper()
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    # "b" was least recently used when "c" arrived, so it is loaded twice
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats["hits"] == 2
+    assert cache.stats["misses"] == 4
+    assert cache.stats["evictions"] == 2
+
+
+def test_negative_entries_are_cached():
+    async def scenario():
+        cache = ResponseCache(ttl=60, negative_ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            raise CacheableMiss("not found")
+
+        for _ in range(3):
+            with pytest.raises(CacheableMiss):
+                await cache.get_or_load("missing.com", loader)
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert calls == 1
+    assert cache.stats["negative_hits"] == 2
+
+
+def test_stale_entry_served_while_refreshing():
+    async def scenario():
+        cache = ResponseCache(ttl=0, negative_ttl=0, stale_ttl=60)
+        versions = iter(["v1", "v2"])
+
+        async def loader():
+            return next(versions)
+
+        first = await cache.get_or_load("k", loader)
+        stale = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)  # let the background refresh run
+        entry = await cache.backend.get("k")
+        return first, stale, entry.value, cache.stats
+
+    first, stale, refreshed, stats = asyncio.run(scenario())
+    assert (first, stale, refreshed) == ("v1", "v1", "v2")
+    assert stats["stale_hits"] == 1
+    assert stats["refreshes"] == 1
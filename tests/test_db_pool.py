@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+import app.db_pool as db_pool
+from app.async_database import AsyncSessionLocal
+from app.db_pool import TimedQueuePool, pool_options, pool_stats
+from app.main import app
+
+
+def test_pool_options_come_from_the_environment(monkeypatch):
+    monkeypatch.setattr(db_pool, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(db_pool, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(db_pool, "DB_PREPARED_STATEMENT_CACHE_SIZE", 0)
+
+    options = pool_options("postgresql+asyncpg://u:p@db/x", is_async=True)
+    assert (options["pool_size"], options["max_overflow"]) == (20, 0)
+    assert options["connect_args"] == {"prepared_statement_cache_size": 0, "statement_cache_size": 0}
+    assert "connect_args" not in pool_options("postgresql://u:p@db/x")
+
+
+def test_pool_metrics_track_checkouts_connects_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = pool_stats(engine)
+    assert (stats["checked_out"], stats["checkout_timeouts"]) == (1, 1)
+
+    held.close()
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    stats = pool_stats(engine)
+    assert stats["checkouts"] == 4
+    assert stats["connects"] == 1  # the one connection is reused
+    assert stats["checkout_wait"]["max_ms"] >= 0
+    engine.dispose()
+
+
+def test_pool_stats_endpoint():
+    async def query():
+        async with AsyncSessionLocal() as session:
+            await session.execute(text("SELECT 1"))
+
+    asyncio.run(query())
+    stats = TestClient(app).get("/health/db-pool").json()
+    assert set(stats) == {"sync", "async"}
+    assert stats["async"]["checkouts"] >= 1
+    assert stats["async"]["connect_latency"]["p99_ms"] >= 0
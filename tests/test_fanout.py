@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.http_client as http_client
+import app.threat_intel.router as ti_router
+import app.vt_router as vt_router
+from app.main import app
+from app.rate_limit import KeyPool
+from app.threat_intel.fanout import FanOutEngine
+from app.threat_intel.models import IndicatorType
+from app.threat_intel.providers import (
+    AbuseIPDBAdapter, OTXAdapter, URLScanAdapter, VirusTotalAdapter
+)
+from app.threat_intel.repository import IndicatorRepository
+from benchmarks.stubs import provider_stub_app
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Point every adapter at the in-process fake providers; OTX is slow."""
+    stub = httpx.AsyncClient(transport=httpx.ASGITransport(
+        app=provider_stub_app(latency_ms={"otx": 2000})
+    ))
+    monkeypatch.setattr(http_client, "_client", stub)
+    monkeypatch.setattr(vt_router, "VT_API_KEYS", ["test"])
+    monkeypatch.setattr(vt_router, "VT_BASE_URL", "http://fake/vtapi/v2")
+    monkeypatch.setattr(vt_router, "vt_keys", KeyPool(["test"], rate_per_minute=60_000, burst=100))
+    return [
+        VirusTotalAdapter(),
+        AbuseIPDBAdapter("test", "http://fake/api/v2"),
+        OTXAdapter("test", "http://fake/api/v1"),
+        URLScanAdapter("test", "http://fake/api/v1"),
+    ]
+
+
+def test_slow_provider_is_cut_at_the_deadline(providers):
+    engine = FanOutEngine(providers, provider_timeout=5, deadline=0.3)
+
+    start = time.perf_counter()
+    result = asyncio.run(engine.gather("203.0.113.7", IndicatorType.IP))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    assert set(result.reports) == {"virustotal", "abuseipdb", "urlscan"}
+    assert result.missing == {"otx": "deadline"}
+
+
+def test_provider_timeout_and_unsupported_types(providers):
+    engine = FanOutEngine(providers, provider_timeout=0.1, deadline=5)
+    result = asyncio.run(engine.gather("44d88612fea8a8f36de82e1278abb02f", IndicatorType.FILE_HASH))
+
+    # AbuseIPDB and urlscan do not handle hashes, OTX exceeds its own timeout
+    assert set(result.reports) == {"virustotal"}
+    assert result.missing == {"otx": "timeout"}
+
+
+def test_risk_score_endpoint_returns_partial_results(providers, monkeypatch, threat_db):
+    monkeypatch.setattr(ti_router, "_engine", FanOutEngine(providers, deadline=0.3))
+    client = TestClient(app)
+    resp = client.get("/threat-intel/risk-score/ip/198.51.100.1")
+
+    assert resp.status_code == 200
+    assert resp.headers["X-Missing-Providers"] == "otx"
+    body = resp.json()
+    assert set(body["providers"]) == {"virustotal", "abuseipdb", "urlscan"}
+    assert set(body["risk_factors"]["provider_scores"]) == set(body["providers"])
+
+    # a partial analysis is not stored, so the next request analyzes again
+    async def stored():
+        async with threat_db() as session:
+            return await IndicatorRepository(session).get_indicator("198.51.100.1", IndicatorType.IP)
+
+    assert asyncio.run(stored()) is None
+    again = client.get("/threat-intel/risk-score/ip/198.51.100.1")
+    assert again.headers["X-Missing-Providers"] == "otx"
+    assert "etag" not in again.headers
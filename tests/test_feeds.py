@@ -0,0 +1,338 @@
+import asyncio
+import io
+import json
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import http_client
+from app.main import app
+from app.threat_intel import feeds, scheduler
+from app.threat_intel.db_models import DailyRollup, ThreatFeed, ThreatIntel
+from app.threat_intel.feeds import FeedStats, batches, ingest_feed, normalize, parse_csv, parse_list, parse_stix
+from app.threat_intel.models import IndicatorType
+from app.threat_intel.repository import IndicatorRepository
+
+
+def _records(parser, text, config=None):
+    stats = FeedStats()
+    return list(parser(io.StringIO(text), config or {}, stats)), stats
+
+
+def test_normalize_refangs_and_canonicalizes():
+    assert normalize("hxxps://evil[.]example/x") == ("https://evil.example/x", "url")
+    assert normalize("Evil.Example.COM.") == ("evil.example.com", "domain")
+    assert normalize("2001:0db8::0001") == ("2001:db8::1", "ip")
+    assert normalize("D41D8CD98F00B204E9800998ECF8427E") == ("d41d8cd98f00b204e9800998ecf8427e", "file_hash")
+    assert normalize("not an indicator") is None
+    assert normalize("example.com", "ip") is None
+
+
+def test_parsers():
+    records, stats = _records(parse_list, "# comment\n1.2.3.4\n\nevil.example.com  # trailing\n???\n")
+    assert records == [("1.2.3.4", "ip", 50), ("evil.example.com", "domain", 50)]
+    assert stats.invalid == 1
+
+    records, _ = _records(parse_csv, "first_seen,value,score\n2024-01-01,1.2.3.4,90\nx,bad..host,1\n",
+                          {"column": "value", "score_column": "score"})
+    assert records == [("1.2.3.4", "ip", 90)]
+
+    indicator = {"type": "indicator", "confidence": 80,
+                 "pattern": "[domain-name:value = 'a.example'] OR [file:hashes.'SHA-256' = '" + "ab" * 32 + "']"}
+    observable = {"type": "ipv4-addr", "value": "5.6.7.8"}
+    line_mode, _ = _records(parse_stix, json.dumps(indicator) + "\n" + json.dumps(observable) + "\n")
+    bundle, _ = _records(parse_stix, json.dumps({"type": "bundle", "objects": [indicator, observable]}, indent=2))
+    assert line_mode == bundle == [("a.example", "domain", 80), ("ab" * 32, "file_hash", 80),
+                                   ("5.6.7.8", "ip", 50)]
+
+
+def test_batches_deduplicate():
+    stats = FeedStats()
+    records = [("a.example", "domain", 10), ("b.example", "domain", 10), ("a.example", "domain", 70)]
+    out = list(batches(iter(records), 10, stats))
+    assert out == [[{"indicator": "a.example", "indicator_type": "domain", "risk_score": 70},
+                    {"indicator": "b.example", "indicator_type": "domain", "risk_score": 10}]]
+    assert (stats.parsed, stats.duplicates) == (3, 1)
+
+
+class _PostgresSession:
+    """Records the SQL ``load_feed_indicators`` runs on its PostgreSQL (COPY) path."""
+
+    bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    async def connection(self):
+        async def copy_records_to_table(table, records, columns):
+            self.copied.append((table, list(records), columns))
+
+        async def get_raw_connection():
+            return SimpleNamespace(driver_connection=SimpleNamespace(copy_records_to_table=copy_records_to_table))
+
+        return SimpleNamespace(get_raw_connection=get_raw_connection)
+
+
+def test_ingest_feed_loads_in_batches_and_records_stats(threat_db, tmp_path):
+    path = tmp_path / "feed.txt"
+    path.write_text("10.20.0.1\n" + "\n".join(f"10.20.{i // 256}.{i % 256}" for i in range(250)) + "\nbogus\n")
+
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.save_indicator({"indicator": "10.20.0.1", "indicator_type": "ip", "risk_score": 95,
+                                       "confidence": 90, "providers": {}})
+            feed = ThreatFeed(name="test-feed", url=str(path), feed_type="list")
+            session.add(feed)
+            await session.commit()
+            feed_id = feed.id
+
+        first = await ingest_feed(feed_id, batch_size=100)
+        again = await ingest_feed(feed_id, batch_size=100)
+        async with threat_db() as session:
+            count = len((await session.execute(select(ThreatIntel.id))).all())
+            stored = await session.get(ThreatFeed, feed_id)
+            analyzed = await IndicatorRepository(session).get_indicator("10.20.0.1", IndicatorType.IP)
+            fed = await IndicatorRepository(session).get_indicator("10.20.0.2", IndicatorType.IP)
+            fed_analysis = (await session.execute(
+                select(ThreatIntel.last_analysis).where(ThreatIntel.indicator == "10.20.0.2")
+            )).scalar_one()
+            trends = await IndicatorRepository(session).trends(1)
+        return first, again, count, stored.stats, analyzed, fed, fed_analysis, trends
+
+    first, again, count, stats, analyzed, fed, fed_analysis, trends = asyncio.run(scenario())
+    assert (first["parsed"], first["invalid"], first["duplicates"]) == (251, 1, 1)
+    assert (first["loaded"], first["batches"]) == (250, 3)
+    assert first["indicators_per_second"] > 0
+    assert count == 250
+    assert stats == again
+    # an analyzed indicator keeps its score; feed-only rows stay unanalyzed
+    assert (analyzed["risk_score"], analyzed["analysis_count"]) == (95, 1)
+    assert (fed["risk_score"], fed["analysis_count"], fed["last_updated"]) == (50, 0, None)
+    assert fed_analysis is None
+    assert trends["total_indicators"] == 250
+
+    # the PostgreSQL path copies into a staging table and merges with SQL of its own
+    session = _PostgresSession()
+    rows = [{"indicator": "10.30.0.1", "indicator_type": "ip", "risk_score": 50}]
+    assert asyncio.run(IndicatorRepository(session).load_feed_indicators(rows, "test-feed")) == 1
+
+    assert session.copied == [("feed_stage", [("10.30.0.1", "ip", 50)],
+                               ["indicator", "indicator_type", "risk_score"])]
+    merge = next(sql for sql in session.statements if sql.startswith("INSERT INTO threat_intelligence"))
+    columns = merge[merge.index("(") + 1:merge.index(")")].split(", ")
+    values = merge[merge.index("SELECT ") + 7:merge.index(" FROM feed_stage")].split(", ")
+    # without an explicit NULL PostgreSQL fills in the column's now() default
+    assert values[columns.index("last_analysis")] == "NULL"
+    assert "last_analysis" not in merge[merge.index("ON CONFLICT"):]
+
+
+def test_failed_batch_write_waits_for_the_parser_before_closing_the_feed(threat_db, tmp_path, monkeypatch):
+    path = tmp_path / "feed.txt"
+    path.write_text("".join(f"10.21.0.{i}\n" for i in range(4)))
+    closed_on_read = []
+
+    def slow_parser(stream, config, stats):
+        for line in iter(stream.readline, ""):
+            time.sleep(0.1)
+            closed_on_read.append(stream.closed)
+            yield line.strip(), "ip", 50
+
+    async def failing_load(self, rows, source, now=None):
+        raise RuntimeError("database down")
+
+    monkeypatch.setitem(feeds.PARSERS, "list", slow_parser)
+    monkeypatch.setattr(IndicatorRepository, "load_feed_indicators", failing_load)
+
+    async def scenario():
+        async with threat_db() as session:
+            feed = ThreatFeed(name="failing-feed", url=str(path), feed_type="list")
+            session.add(feed)
+            await session.commit()
+        with pytest.raises(RuntimeError):
+            await ingest_feed(feed.id, batch_size=1)
+        reads = len(closed_on_read)
+        await asyncio.sleep(0.3)
+        return reads
+
+    reads = asyncio.run(scenario())
+    # the prefetched batch was finished before the file closed, and nothing read after
+    assert closed_on_read == [False, False]
+    assert reads == 2
+
+
+def test_feed_rollups_cover_every_day_a_run_writes(threat_db, tmp_path, monkeypatch):
+    path = tmp_path / "feed.txt"
+    path.write_text("".join(f"10.22.0.{i}\n" for i in range(3)))
+    # the first batch is written just before midnight, the second just after
+    ticks = iter([datetime(2024, 3, 1, 23, 59, 59), datetime(2024, 3, 2, 0, 0, 1)])
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(ticks, None) or datetime.today()
+
+    monkeypatch.setattr(feeds, "datetime", Clock)
+
+    async def scenario():
+        async with threat_db() as session:
+            feed = ThreatFeed(name="midnight-feed", url=str(path), feed_type="list")
+            session.add(feed)
+            await session.commit()
+        await ingest_feed(feed.id, batch_size=2)
+        async with threat_db() as session:
+            return {(r.day, r.indicator_count) for r in (await session.execute(select(DailyRollup))).scalars()}
+
+    assert asyncio.run(scenario()) == {(date(2024, 3, 1), 2), (date(2024, 3, 2), 1)}
+
+
+def test_unchanged_feeds_are_skipped(threat_db, tmp_path, monkeypatch):
+    path = tmp_path / "feed.txt"
+    path.write_text("1.2.3.4\nevil.example.com\n")
+    requests = []
+
+    def handler(request):
+        requests.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="5.6.7.8\n", headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def scenario():
+        async with threat_db() as session:
+            local = ThreatFeed(name="local", url=str(path), feed_type="list")
+            remote = ThreatFeed(name="remote", url="https://feeds.example/ips.txt", feed_type="list")
+            session.add_all([local, remote])
+            await session.commit()
+            ids = local.id, remote.id
+        runs = []
+        for feed_id in ids:
+            runs.append(await ingest_feed(feed_id, skip_unchanged=True))
+            runs.append(await ingest_feed(feed_id, skip_unchanged=True))
+        path.write_text("1.2.3.4\nevil.example.com\n9.9.9.9\n")
+        runs.append(await ingest_feed(ids[0], skip_unchanged=True))
+        return runs
+
+    local_first, local_again, remote_first, remote_again, local_changed = asyncio.run(scenario())
+    assert (local_first["skipped"], local_first["loaded"]) == (None, 2)
+    assert local_again["skipped"] == "unchanged"
+    assert local_again["last_run"] == local_first["last_run"]
+    assert (local_changed["skipped"], local_changed["loaded"]) == (None, 3)
+    assert (remote_first["loaded"], remote_first["etag"]) == (1, '"v1"')
+    assert remote_again["skipped"] == "not_modified"
+    assert requests[1]["if-none-match"] == '"v1"'
+
+
+def test_scheduler_refreshes_due_feeds_within_concurrency_cap(threat_db, monkeypatch):
+    active = 0
+    peak = 0
+    refreshed = []
+
+    async def fake_ingest(feed_id, skip_unchanged=False):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        async with threat_db() as session:
+            feed = await session.get(ThreatFeed, feed_id)
+            feed.last_updated = datetime.now()
+            feed.stats = {"loaded": 1, "last_run": datetime.now().isoformat(), "skipped": None}
+            await session.commit()
+        refreshed.append(feed_id)
+        active -= 1
+        return {}
+
+    monkeypatch.setattr(scheduler, "ingest_feed", fake_ingest)
+
+    async def scenario():
+        now = datetime.now()
+        async with threat_db() as session:
+            session.add_all([ThreatFeed(name=f"due-{i}", url="x", update_frequency=1) for i in range(4)])
+            session.add(ThreatFeed(name="never-run", url="x"))
+            session.add(ThreatFeed(name="fresh", url="x", update_frequency=24, last_updated=now))
+            session.add(ThreatFeed(name="inactive", url="x", active=False))
+            session.add(ThreatFeed(name="stale", url="x", update_frequency=1,
+                                   last_updated=now - timedelta(hours=2)))
+            await session.commit()
+        feed_scheduler = scheduler.FeedScheduler(concurrency=2, jitter=0.1)
+        started = await feed_scheduler.run_due()
+        # a second scan while refreshes are in flight starts nothing new
+        again = await feed_scheduler.run_due()
+        await asyncio.gather(*list(feed_scheduler._refreshes))
+        after = await feed_scheduler.run_due()
+        return started, again, after
+
+    started, again, after = asyncio.run(scenario())
+    assert (started, again, after) == (6, 0, 0)
+    assert len(refreshed) == 6
+    assert peak == 2
+
+
+def test_scheduler_backs_off_failing_feeds(threat_db, monkeypatch):
+    attempts = []
+
+    async def failing_ingest(feed_id, skip_unchanged=False):
+        attempts.append(feed_id)
+        if len(attempts) < 5:
+            raise RuntimeError("feed unreachable")
+        return {}
+
+    monkeypatch.setattr(scheduler, "ingest_feed", failing_ingest)
+
+    async def scenario():
+        async with threat_db() as session:
+            feed = ThreatFeed(name="flaky", url="x", update_frequency=1)
+            session.add(feed)
+            await session.commit()
+        feed_scheduler = scheduler.FeedScheduler(retry=600)
+        delays, scans = [], []
+
+        async def scan():
+            scans.append(await feed_scheduler.run_due())
+            await asyncio.gather(*list(feed_scheduler._refreshes))
+
+        for _ in range(4):
+            await scan()
+            await scan()  # right after a failure: backing off
+            failures, failed_at = feed_scheduler._failures[feed.id]
+            delays.append(feed_scheduler.retry_at(feed) - failed_at)
+            # the backoff has elapsed
+            feed_scheduler._failures[feed.id] = (failures, failed_at - delays[-1])
+        await scan()
+        return scans, delays, feed_scheduler
+
+    scans, delays, feed_scheduler = asyncio.run(scenario())
+    assert scans == [1, 0] * 4 + [1]
+    # doubling from 10 minutes, capped at the feed's one-hour period
+    assert delays == [timedelta(minutes=m) for m in (10, 20, 40, 60)]
+    assert feed_scheduler._failures == {} and feed_scheduler.last_error == {}
+    assert len(attempts) == 5
+
+
+def test_list_feeds(threat_db):
+    async def seed():
+        async with threat_db() as session:
+            session.add(ThreatFeed(name="abuse-ch", url="x", update_frequency=6,
+                                   last_updated=datetime(2024, 1, 1, 12),
+                                   stats={"loaded": 10, "duration_seconds": 1.5,
+                                          "last_run": "2024-01-01T12:00:00", "skipped": "unchanged"}))
+            await session.commit()
+
+    asyncio.run(seed())
+    resp = TestClient(app).get("/threat-intel/feeds")
+    assert resp.status_code == 200
+    [feed] = resp.json()
+    assert (feed["name"], feed["loaded"], feed["duration_seconds"], feed["skipped"]) == ("abuse-ch", 10, 1.5, "unchanged")
+    assert feed["last_run"] == "2024-01-01T12:00:00"
+    assert "2024-01-01T18:00:00" <= feed["next_due"] <= "2024-01-01T18:36:00"
+    assert feed["running"] is False
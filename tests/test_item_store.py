@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+import app.crud_router as crud_router
+from app.item_store import ShardedMemoryItemStore, SQLItemStore
+from app.main import app
+
+ITEM = {"first_name": "Ada", "last_name": "Lovelace", "lucky_number": 42, "comment": None}
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield ShardedMemoryItemStore(shards=4)
+        return
+    engine = create_engine(f"sqlite:///{tmp_path / 'items.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    yield SQLItemStore(engine)
+    engine.dispose()
+
+
+def test_concurrent_writers_get_unique_ids(store):
+    threads, per_thread = 16, 50
+    barrier = threading.Barrier(threads)
+
+    def writer(n):
+        barrier.wait()  # start every thread at once to maximise contention
+        ids = []
+        for i in range(per_thread):
+            item = store.create({**ITEM, "lucky_number": n * per_thread + i + 1})
+            # concurrent replace/delete on the writer's own items
+            if i % 5 == 0:
+                assert store.replace(item.id, {**ITEM, "comment": f"t{n}"}).comment == f"t{n}"
+            if i % 10 == 0:
+                assert store.delete(item.id)
+            else:
+                ids.append(item.id)
+        return ids
+
+    with ThreadPoolExecutor(threads) as pool:
+        kept = [i for ids in pool.map(writer, range(threads)) for i in ids]
+
+    assert len(kept) == len(set(kept)) == threads * per_thread * 9 // 10
+    assert store.count() == len(kept)
+    assert all(store.get(i) is not None for i in kept)
+
+
+def test_missing_items(store):
+    assert store.get(12345) is None
+    assert store.replace(12345, ITEM) is None
+    assert store.delete(12345) is False
+
+
+def test_router_uses_the_store(monkeypatch):
+    monkeypatch.setattr(crud_router, "store", ShardedMemoryItemStore())
+    client = TestClient(app)
+
+    created = client.post("/items", json=ITEM).json()
+    assert created["comment"] == "auto-concat:AdaLovelace"
+    assert client.get(f"/items/{created['id']}").json() == created
+    assert client.put("/items/999", json=ITEM).status_code == 404
+    assert client.delete(f"/items/{created['id']}").status_code == 204
+    assert client.get(f"/items/{created['id']}").status_code == 404
+
+
+def test_list_pages_with_a_cursor(store):
+    ids = store.create_many([{**ITEM, "lucky_number": n} for n in range(1, 26)])
+    store.delete_many(ids[3:6])
+
+    seen, after = [], 0
+    while True:
+        page = store.list(after=after, limit=7)
+        if not page:
+            break
+        seen += [item.id for item in page]
+        after = page[-1].id
+    assert seen == ids[:3] + ids[6:]
+
+
+def test_memory_list_skips_deleted_ranges_without_probing_them():
+    store = ShardedMemoryItemStore(shards=4)
+    ids = store.create_many([ITEM] * 5000)
+    store.delete_many(ids[:4990])
+    store.get = None  # list must not probe ids one by one
+
+    assert [item.id for item in store.list(limit=3)] == ids[4990:4993]
+    assert [item.id for item in store.list(after=ids[4993], limit=100)] == ids[4994:]
+    assert store.count() == 10
+
+
+def test_bulk_endpoints(monkeypatch):
+    monkeypatch.setattr(crud_router, "store", ShardedMemoryItemStore())
+    client = TestClient(app)
+
+    rows = [{**ITEM, "lucky_number": n} for n in range(1, 6)]
+    rows[2] = {**ITEM, "first_name": "R2D2"}
+    report = client.post("/items/bulk", json=rows).json()
+    assert (report["succeeded"], report["failed"]) == (4, 1)
+    assert [r["status"] for r in report["results"]] == [201, 201, 422, 201, 201]
+    assert "first_name" in report["results"][2]["error"]
+
+    atomic = client.post("/items/bulk", params={"atomic": "true"}, json=rows).json()
+    assert {r["status"] for r in atomic["results"]} == {422, 424}
+    assert crud_router.store.count() == 4
+
+    ndjson = "\n".join(json.dumps({**ITEM, "last_name": "Byron"}) for _ in range(3))
+    report = client.post("/items/bulk", content=ndjson,
+                         headers={"content-type": "application/x-ndjson"}).json()
+    assert report["succeeded"] == 3
+    created = client.get(f"/items/{report['results'][0]['id']}").json()
+    assert created["comment"] == "auto-concat:AdaByron"
+
+    report = client.put("/items/bulk", json=[{**ITEM, "id": 1, "first_name": "Grace"},
+                                             {**ITEM, "id": 999}]).json()
+    assert [r["status"] for r in report["results"]] == [200, 404]
+    assert client.get("/items/1").json()["comment"] == "auto-concat:GraceLovelace"
+
+    report = client.post("/items/bulk/delete", json={"ids": [1, 1, 999]}).json()
+    assert [r["status"] for r in report["results"]] == [204, 404, 404]
+
+    page = client.get("/items", params={"limit": 4}).json()
+    assert [i["id"] for i in page["items"]] == [2, 3, 4, 5]
+    rest = client.get("/items", params={"cursor": page["next_cursor"]}).json()
+    assert rest["next_cursor"] is None and len(rest["items"]) == 2
+
+    assert client.post("/items/bulk", content="{}").status_code == 400
+
+
+def test_bulk_endpoints_parse_and_validate_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(crud_router, "store", ShardedMemoryItemStore())
+    loops = []
+    validate = crud_router._validate
+
+    def recording_validate(adapter, rows):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:  # a threadpool worker
+            loops.append(None)
+        return validate(adapter, rows)
+
+    monkeypatch.setattr(crud_router, "_validate", recording_validate)
+    client = TestClient(app)
+    assert client.post("/items/bulk", json=[ITEM] * 3).json()["succeeded"] == 3
+    assert client.post("/items/bulk", content="[").status_code == 400
+    assert loops == [None]
+
+
+def test_bulk_replace_and_delete(store):
+    ids = store.create_many([ITEM, ITEM])
+    assert store.replace_many([{**ITEM, "id": ids[1], "lucky_number": 7},
+                               {**ITEM, "id": 999}]) == [True, False]
+    assert store.get(ids[1]).lucky_number == 7
+    assert store.delete_many([ids[0], ids[0], 999]) == [True, False, False]
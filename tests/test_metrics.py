@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import (
+    DB_QUERY_SECONDS, REQUESTS_IN_FLIGHT, REQUESTS_TOTAL, UPSTREAM_SECONDS, Histogram, upstream_call
+)
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP demo_seconds Demo.", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{route="/a"} 3.65' in lines
+    assert 'demo_seconds_count{route="/a"} 4' in lines
+
+
+def test_requests_are_labelled_by_route_template(threat_db):
+    route = "/threat-intel/risk-score/{indicator_type}/{indicator}"
+    before = REQUESTS_TOTAL.value("GET", route, "200")
+    queries = DB_QUERY_SECONDS.count("async", "SELECT")
+
+    for address in ("192.0.2.61", "192.0.2.62"):
+        assert client.get(f"/threat-intel/risk-score/ip/{address}").status_code == 200
+    assert client.get("/no/such/path").status_code == 404
+
+    assert REQUESTS_TOTAL.value("GET", route, "200") == before + 2
+    assert REQUESTS_TOTAL.value("GET", "unmatched", "404") >= 1
+    assert REQUESTS_IN_FLIGHT.value("GET") == 0
+    assert DB_QUERY_SECONDS.count("async", "SELECT") > queries
+
+    body = client.get("/metrics")
+    assert body.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}"}}' in body.text
+    assert "# TYPE http_requests_in_flight gauge" in body.text
+
+
+def test_upstream_calls_record_status_errors_and_cancellation():
+    async def call(status=None, fail=False, hang=False):
+        with upstream_call("demo") as timer:
+            if hang:
+                await asyncio.sleep(10)
+            if fail:
+                raise RuntimeError("boom")
+            timer.status = status
+
+    async def scenario():
+        await call(200)
+        with pytest.raises(RuntimeError):
+            await call(fail=True)
+        task = asyncio.ensure_future(call(hang=True))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert UPSTREAM_SECONDS.count("demo", "200") == 1
+    assert UPSTREAM_SECONDS.count("demo", "error") == 1
+    assert UPSTREAM_SECONDS.count("demo", "cancelled") == 1
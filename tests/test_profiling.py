@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.profiling as profiling
+from app.main import app
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _demo_app():
+    demo = FastAPI()
+    demo.add_middleware(profiling.ProfilingMiddleware)
+
+    @demo.get("/slow")
+    async def slow():
+        _busy(0.05)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    return demo
+
+
+def _enable(monkeypatch, allowed=True):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "is_allowed", lambda host: allowed)
+
+
+def test_disabled_middleware_passes_requests_through():
+    client = TestClient(_demo_app())
+    resp = client.get("/slow", headers={"X-Profile": "1"})
+    assert resp.status_code == 200
+    assert "x-profile-id" not in resp.headers
+
+
+def test_header_profiles_running_and_awaiting_time(monkeypatch):
+    _enable(monkeypatch)
+    client = TestClient(_demo_app())
+
+    assert "x-profile-id" not in client.get("/slow").headers
+    resp = client.get("/slow", headers={"X-Profile": "1"})
+    profile = profiling.profiles.get(resp.headers["x-profile-id"])
+
+    assert profile.status == 200
+    assert profile.duration_ms >= 100
+    collapsed = profile.collapsed()
+    busy = [line for line in collapsed.splitlines() if "_busy" in line]
+    awaiting = [line for line in collapsed.splitlines() if line.split(";")[-1].startswith("[await]")]
+    assert busy and busy[0].split(";")[-1].startswith("_busy (test_profiling.py:")
+    assert any("slow (test_profiling.py:" in line for line in awaiting)
+
+    speedscope = profile.speedscope()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    assert len(speedscope["profiles"][0]["samples"]) == len(speedscope["profiles"][0]["weights"])
+    assert speedscope["profiles"][0]["endValue"] > 50
+
+
+def test_header_is_ignored_from_clients_off_the_allowlist(monkeypatch):
+    _enable(monkeypatch, allowed=False)
+    resp = TestClient(_demo_app()).get("/slow", headers={"X-Profile": "1"})
+    assert "x-profile-id" not in resp.headers
+
+
+def test_admin_endpoint_serves_profiles_to_allowed_clients(monkeypatch):
+    _enable(monkeypatch)
+    client = TestClient(app)
+    resp = client.get("/threat-intel/trends", params={"days": 365}, headers={"X-Profile": "1"})
+    profile_id = resp.headers["x-profile-id"]
+
+    listed = client.get("/admin/profiles").json()
+    assert listed[0]["id"] == profile_id
+    assert listed[0]["path"] == "/threat-intel/trends?days=365"
+    assert client.get(f"/admin/profiles/{profile_id}").json()["profiles"][0]["type"] == "sampled"
+    collapsed = client.get(f"/admin/profiles/{profile_id}", params={"format": "collapsed"})
+    assert collapsed.headers["content-type"].startswith("text/plain")
+    assert client.get("/admin/profiles/none").status_code == 404
+
+    monkeypatch.setattr(profiling, "is_allowed", lambda host: False)
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_allowlist_matches_networks():
+    assert profiling.is_allowed("127.0.0.1")
+    assert profiling.is_allowed("::1")
+    assert not profiling.is_allowed("203.0.113.9")
+    assert not profiling.is_allowed("testclient")
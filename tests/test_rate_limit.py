@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.rate_limit import KeyPool, RateLimitExceeded, TokenBucket
+
+
+def test_bucket_rejects_beyond_wait_deadline():
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=60, burst=1)  # one token per second
+        await bucket.acquire(max_wait=0)
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire(max_wait=0.1)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_returns_its_token():
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=60, burst=1)
+        await bucket.acquire(max_wait=0)
+        waiter = asyncio.ensure_future(bucket.acquire(max_wait=5))
+        await asyncio.sleep(0)
+        assert bucket.wait_time() > 1.5  # the waiter holds the next token
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return bucket.wait_time()
+
+    assert asyncio.run(scenario()) <= 1
+
+
+def test_quota_response_pauses_key_and_rotates():
+    pool = KeyPool(["key-a", "key-b"], rate_per_minute=600, burst=1)
+
+    async def scenario():
+        first = await pool.acquire(max_wait=1)
+        rejected = httpx.Response(204, headers={"Retry-After": "30"})
+        assert pool.observe(first, rejected) is True
+        # the paused key is skipped in favour of the other one
+        return first, await pool.acquire(max_wait=1)
+
+    first, second = asyncio.run(scenario())
+    assert first != second
+    assert pool.buckets[first].wait_time() > 25
+
+
+def test_ok_response_is_not_retried():
+    pool = KeyPool([None], rate_per_minute=60, burst=1)
+    assert pool.observe(None, httpx.Response(200)) is False
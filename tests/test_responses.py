@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.responses import FastJSONResponse, http_date, is_not_modified, make_etag
+from app.threat_intel.mock_data import MockDataProvider
+from app.threat_intel.models import ThreatIndicator, TrendData
+
+client = TestClient(app)
+
+
+def test_model_renders_like_pydantic():
+    model = ThreatIndicator(**MockDataProvider.get_mock_indicator("203.0.113.50", "ip"))
+    body = FastJSONResponse(model).body
+    assert body == model.model_dump_json().encode()
+
+
+def test_plain_content_renders_with_orjson():
+    trends = TrendData(**MockDataProvider.get_mock_trend_data(7))
+    body = FastJSONResponse({"when": datetime(2024, 1, 2, 3, 4, 5), 1: [trends]}).body
+    decoded = json.loads(body)
+    assert decoded["when"] == "2024-01-02T03:04:05"
+    assert decoded["1"][0] == json.loads(trends.model_dump_json())
+
+
+def test_default_response_class_serves_plain_routes():
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {"status": "ok"}
+
+
+def test_trends_endpoint_returns_the_model_json():
+    resp = client.get("/threat-intel/trends", params={"days": 365})
+    assert resp.status_code == 200
+    assert TrendData(**resp.json()).time_period_days == 365
+
+
+class _Request:
+    def __init__(self, **headers):
+        self.headers = {name.replace("_", "-"): value for name, value in headers.items()}
+
+
+def test_conditional_validators():
+    etag = make_etag("trends", 7, datetime(2024, 5, 1, 12, 0, 0, 500))
+    assert etag == make_etag("trends", 7, datetime(2024, 5, 1, 12, 0, 0, 500))
+    assert etag != make_etag("trends", 30, datetime(2024, 5, 1, 12, 0, 0, 500))
+
+    modified = datetime(2024, 5, 1, 12, 0, 0, 500, tzinfo=timezone.utc)
+    assert is_not_modified(_Request(if_none_match=f'"other", W/{etag}'), etag)
+    assert is_not_modified(_Request(if_none_match="*"), etag)
+    assert not is_not_modified(_Request(if_none_match='"other"'), etag)
+    assert not is_not_modified(_Request(), etag, modified)
+
+    since = http_date(modified)
+    assert since == "Wed, 01 May 2024 12:00:00 GMT"
+    assert is_not_modified(_Request(if_modified_since=since), etag, modified)
+    assert not is_not_modified(_Request(if_modified_since=since), etag, modified + timedelta(seconds=1))
+    assert not is_not_modified(_Request(if_modified_since="yesterday"), etag, modified)
+    # If-None-Match wins when both are sent
+    assert not is_not_modified(_Request(if_none_match='"other"', if_modified_since=since), etag, modified)
@@ -0,0 +1,96 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.threat_intel.models import IndicatorType
+from app.threat_intel.repository import IndicatorRepository
+from app.threat_intel.scoring import ScoringWeights, score_batch, score_indicator
+
+NOW = datetime(2024, 6, 1, 12)
+
+
+def _indicator(rng, **overrides):
+    providers = {
+        name: {"detected": rng.random() < 0.5, "confidence": rng.randint(0, 100),
+               "report_time": NOW}
+        for name in rng.sample(["virustotal", "abuseipdb", "otx", "urlscan"], k=rng.randint(0, 4))
+    }
+    data = {
+        "indicator": "203.0.113.9",
+        "indicator_type": "ip",
+        "providers": providers,
+        "malware": {"emotet": rng.randint(0, 20)} if rng.random() < 0.3 else {},
+        "risk_factors": {
+            "provider_scores": {name: rng.randint(0, 100) for name in providers},
+            "historical_reports": rng.randint(0, 30),
+            "community_reports": rng.randint(0, 80),
+            "related_threats": rng.randint(0, 10),
+        },
+        "last_seen": NOW - timedelta(days=rng.uniform(0, 720)),
+    }
+    data.update(overrides)
+    return data
+
+
+def test_single_indicator_path_matches_batch():
+    rng = random.Random(3)
+    indicators = [_indicator(rng) for _ in range(2000)] + [{"indicator": "x", "providers": {}}]
+    risk, confidence = score_batch(indicators, now=NOW)
+    assert [score_indicator(i, now=NOW) for i in indicators] == list(zip(risk.tolist(), confidence.tolist()))
+    assert 0 <= risk.min() and risk.max() <= 100
+    assert score_indicator({"indicator": "x"}, now=NOW) == (0, 0)
+
+
+def test_scores_follow_evidence_and_age():
+    detected = {"virustotal": {"detected": True, "confidence": 90},
+                "otx": {"detected": True, "confidence": 80}}
+    clean = {name: {**report, "detected": False} for name, report in detected.items()}
+    base = {"providers": detected, "risk_factors": {"provider_scores": {"virustotal": 90, "otx": 80}},
+            "last_seen": NOW}
+
+    risk, confidence = score_indicator(base, now=NOW)
+    assert risk > score_indicator({**base, "providers": clean}, now=NOW)[0]
+    assert risk < score_indicator({**base, "malware": {"trickbot": 12}}, now=NOW)[0]
+    # one half-life halves the risk; confidence reflects provider agreement, not age
+    old_risk, old_confidence = score_indicator({**base, "last_seen": NOW - timedelta(days=180)}, now=NOW)
+    assert abs(old_risk - risk / 2) <= 1 and old_confidence == confidence
+    assert confidence > score_indicator({**base, "providers": {"otx": detected["otx"]}}, now=NOW)[1]
+
+
+def test_weights_from_env(monkeypatch):
+    monkeypatch.setenv("THREAT_INTEL_SCORE_WEIGHTS", "provider=0.9, half_life_days=30")
+    weights = ScoringWeights.from_env()
+    assert (weights.provider, weights.half_life_days, weights.malware) == (0.9, 30.0, 0.15)
+    monkeypatch.setenv("THREAT_INTEL_SCORE_WEIGHTS", "providr=1")
+    with pytest.raises(ValueError):
+        ScoringWeights.from_env()
+
+
+def test_rescore_updates_analyzed_indicators(threat_db):
+    rng = random.Random(5)
+    analyzed = [_indicator(rng, indicator=f"100.64.0.{i}", risk_score=1, confidence=1) for i in range(40)]
+    weights = ScoringWeights(provider=1, detection=0, malware=0, community=0, historical=0, related=0)
+
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            for data in analyzed:
+                await repo.save_indicator(data)
+            await repo.load_feed_indicators(
+                [{"indicator": "feed.example", "indicator_type": "domain", "risk_score": 77}], "feed")
+            await session.commit()
+            changed = await repo.rescore(weights, batch_size=16, now=NOW)
+            again = await repo.rescore(weights, batch_size=16, now=NOW)
+            stored = [await repo.get_indicator(d["indicator"], IndicatorType.IP) for d in analyzed]
+            feed = await repo.get_indicator("feed.example", IndicatorType.DOMAIN)
+        return changed, again, stored, feed
+
+    changed, again, stored, feed = asyncio.run(scenario())
+    expected = [score_indicator({**d, "last_seen": s["last_seen"], "risk_factors": s["risk_factors"]},
+                                weights, NOW) for d, s in zip(analyzed, stored)]
+    assert [(s["risk_score"], s["confidence"]) for s in stored] == expected
+    assert changed == sum(1 for risk, confidence in expected if (risk, confidence) != (1, 1))
+    assert again == 0
+    assert feed["risk_score"] == 77
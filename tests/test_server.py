@@ -0,0 +1,62 @@
+import argparse
+import importlib.util
+import os
+import runpy
+import sys
+
+import pytest
+import uvicorn
+
+import app.server as server
+import run
+
+GUNICORN_CONF = os.path.join(os.path.dirname(__file__), "..", "backend", "gunicorn.conf.py")
+
+
+def test_uvicorn_options_come_from_the_environment(monkeypatch):
+    monkeypatch.setattr(server, "SERVER_BACKLOG", 512)
+    monkeypatch.setattr(server, "SERVER_KEEPALIVE", 15)
+    monkeypatch.setattr(server, "SERVER_MAX_REQUESTS", 0)
+
+    options = server.uvicorn_options()
+    assert (options["loop"], options["http"]) == (server.SERVER_LOOP, server.SERVER_HTTP)
+    assert (options["backlog"], options["timeout_keep_alive"]) == (512, 15)
+    assert options["timeout_graceful_shutdown"] == server.SERVER_GRACEFUL_TIMEOUT
+    assert options["limit_max_requests"] is None
+    assert server.WEB_CONCURRENCY >= 1 and server.default_workers() >= 1
+
+
+def test_gunicorn_preloads_uvicorn_workers_and_outlasts_their_drain():
+    pytest.importorskip("gunicorn")
+    pytest.importorskip("uvicorn_worker")
+    conf = runpy.run_path(GUNICORN_CONF)
+
+    assert conf["preload_app"] is True
+    assert conf["workers"] == server.WEB_CONCURRENCY
+    assert conf["worker_class"].CONFIG_KWARGS == {
+        "loop": server.SERVER_LOOP, "http": server.SERVER_HTTP,
+        "timeout_graceful_shutdown": server.SERVER_GRACEFUL_TIMEOUT,
+    }
+    assert conf["graceful_timeout"] > server.SERVER_GRACEFUL_TIMEOUT
+    assert (conf["backlog"], conf["keepalive"]) == (server.SERVER_BACKLOG, server.SERVER_KEEPALIVE)
+
+
+def test_without_gunicorn_or_uvloop_run_py_falls_back_to_uvicorn_workers(monkeypatch):
+    # a default Windows install: no gunicorn, uvloop or httptools
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec",
+                        lambda name, *args: None if name in ("uvloop", "httptools") else find_spec(name, *args))
+    monkeypatch.setattr(server, "SERVER_LOOP", server._if_installed("uvloop"))
+    monkeypatch.setattr(server, "SERVER_HTTP", server._if_installed("httptools"))
+    monkeypatch.setitem(sys.modules, "gunicorn", None)
+    monkeypatch.setenv("WEB_CONCURRENCY", "0")
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+
+    run.main(argparse.Namespace(reload=False, workers=3))
+
+    assert len(calls) == 1
+    app, kwargs = calls[0]
+    assert app == "app.main:app" and kwargs["workers"] == 3
+    assert (kwargs["loop"], kwargs["http"]) == ("auto", "auto")
+    uvicorn.Config(app, **kwargs)  # accepted as-is
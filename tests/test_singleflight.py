@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.vt_router as vt_router
+from app.main import app
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_research_domain_makes_one_upstream_call(monkeypatch):
+    upstream_calls = 0
+
+    async def vt_stub(request: httpx.Request) -> httpx.Response:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.05)  # keep the call in flight while others arrive
+        return httpx.Response(200, json={"response_code": 1})
+
+    async def scenario(n: int):
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(vt_stub))
+        monkeypatch.setattr(vt_router, "get_http_client", lambda: upstream)
+        await vt_router.vt_cache.invalidate("coalesce.example.com")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.get("/research_domain/coalesce.example.com") for _ in range(n))
+            )
+        await upstream.aclose()
+        return responses
+
+    responses = asyncio.run(scenario(25))
+    assert [r.status_code for r in responses] == [200] * 25
+    assert upstream_calls == 1
+
+
+def test_waiters_share_the_error():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            *(flight.do("k", failing) for _ in range(10)), return_exceptions=True
+        )
+        return calls, results, flight.in_flight()
+
+    calls, results, in_flight = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert in_flight == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+# Loaded on first use (engine, shared HTTP client, scoring, facets), never by importing the app
+DEFERRED = ("numpy", "httpx", "asyncpg", "aiosqlite", "psycopg2")
+
+# Opt-in wall-clock budgets in seconds, e.g. STARTUP_IMPORT_BUDGET=3 STARTUP_FIRST_REQUEST_BUDGET=6;
+# unset by default because timings flake on loaded CI runners. The import takes
+# 0.55-0.9 s on the development VM
+IMPORT_BUDGET = os.getenv("STARTUP_IMPORT_BUDGET")
+FIRST_REQUEST_BUDGET = os.getenv("STARTUP_FIRST_REQUEST_BUDGET")
+
+PROBE = """
+import json, sys, time
+
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter() - start
+loaded = sorted(name for name in {deferred!r} if name in sys.modules)
+import app.async_database, app.database
+engines = [app.database._engine, app.async_database._async_engine]
+
+from fastapi.testclient import TestClient  # harness, not counted (it loads httpx itself)
+
+start = time.perf_counter()
+with TestClient(app.main.app) as client:  # runs the lifespan
+    status = client.get("/").status_code
+first_request = imported + time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "first_request_s": first_request, "status": status,
+                  "loaded": loaded, "engines_created": [e is not None for e in engines]}}))
+"""
+
+
+def _probe():
+    env = {**os.environ, "FEED_SCHEDULER_ENABLED": "False"}
+    out = subprocess.run([sys.executable, "-c", PROBE.format(deferred=DEFERRED)], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, timeout=120, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_defers_engines_and_heavy_imports():
+    result = _probe()
+    assert result["loaded"] == []
+    assert result["engines_created"] == [False, False]
+    assert result["status"] == 200
+
+
+@pytest.mark.skipif(not (IMPORT_BUDGET or FIRST_REQUEST_BUDGET), reason="startup budgets not set")
+def test_startup_stays_within_budget():
+    result = _probe()
+    if IMPORT_BUDGET:
+        assert result["import_s"] < float(IMPORT_BUDGET)
+    if FIRST_REQUEST_BUDGET:
+        assert result["first_request_s"] < float(FIRST_REQUEST_BUDGET)
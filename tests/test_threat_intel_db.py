@@ -0,0 +1,478 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select
+
+from app.async_database import get_async_engine
+from app.main import app
+from app.threat_intel.db_models import AnalyticsReport, DailyRollup, IndicatorRelationship
+from app.threat_intel.models import IndicatorType, SearchFilters, SearchRequest, TrendData
+import app.threat_intel.facets as facets
+import app.threat_intel.repository as repository
+from app.threat_intel.repository import IndicatorRepository
+
+
+def _analysis(indicator, indicator_type="ip", risk_score=50, country="US"):
+    return {
+        "indicator": indicator,
+        "indicator_type": indicator_type,
+        "risk_score": risk_score,
+        "confidence": 80,
+        "geolocation": {"country": country, "country_code": country},
+        "malware": {"trojan": 1},
+        "threat_types": ["trojan"],
+        "risk_factors": {"provider_scores": {"otx": risk_score}, "historical_reports": 0,
+                         "community_reports": 2, "related_threats": 0},
+        "providers": {
+            "otx": {"detected": True, "confidence": 80, "report_time": datetime.now()},
+            "abuseipdb": {"detected": False, "confidence": 20, "report_time": datetime.now()},
+        },
+    }
+
+
+def test_upsert_is_idempotent_and_counts_analyses(threat_db):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            first = await repo.save_indicator(_analysis("203.0.113.1", risk_score=10))
+            second = await repo.save_indicator(_analysis("203.0.113.1", risk_score=70))
+            stored = await repo.get_indicator("203.0.113.1", IndicatorType.IP)
+        return first, second, stored
+
+    first, second, stored = asyncio.run(scenario())
+    assert first == second
+    assert stored["risk_score"] == 70
+    assert stored["analysis_count"] == 2
+    assert set(stored["providers"]) == {"otx", "abuseipdb"}
+    assert stored["geolocation"]["country_code"] == "US"
+
+
+def test_search_loads_a_page_without_n_plus_one(threat_db):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            ids = await repo.upsert_indicators(
+                [{"indicator": f"10.0.0.{i}", "indicator_type": "ip", "risk_score": i} for i in range(30)]
+            )
+            await session.execute(insert(IndicatorRelationship), [
+                {"source_id": ids[("10.0.0.29", "ip")], "target_id": ids[(f"10.0.0.{i}", "ip")],
+                 "relationship_type": "resolves_to"} for i in range(3)
+            ])
+            await session.commit()
+
+            event.listen(get_async_engine().sync_engine, "before_cursor_execute", count)
+            try:
+                return await repo.search(SearchRequest(query="10.0.0", min_risk_score=5, limit=20,
+                                                       facets=False))
+            finally:
+                event.remove(get_async_engine().sync_engine, "before_cursor_execute", count)
+
+    page = asyncio.run(scenario())
+    assert page["total_count"] == 25
+    assert len(page["indicators"]) == 20
+    assert page["indicators"][0]["indicator"] == "10.0.0.29"
+    # count + page + provider reports + relationship counts, regardless of page size
+    # (facet counts, tested separately, add the text-query ids and index syncs)
+    assert len(statements) == 4
+
+
+def test_keyset_pages_match_offset_pages(threat_db):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            # many ties on risk_score so the id tie-breaker matters
+            await repo.upsert_indicators(
+                [{"indicator": f"host{i}.example.com", "indicator_type": "domain",
+                  "risk_score": i % 7} for i in range(45)]
+            )
+            await session.commit()
+
+            by_offset, offset = [], 0
+            while True:
+                page = await repo.search(SearchRequest(limit=10, offset=offset))
+                by_offset += [i["indicator"] for i in page["indicators"]]
+                offset += 10
+                if not page["has_more"]:
+                    break
+
+            by_cursor, cursor = [], None
+            while True:
+                page = await repo.search(SearchRequest(limit=10, cursor=cursor))
+                by_cursor += [i["indicator"] for i in page["indicators"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            return by_offset, by_cursor
+
+    by_offset, by_cursor = asyncio.run(scenario())
+    assert len(by_cursor) == 45
+    assert by_cursor == by_offset
+
+
+def test_prefix_match_escaping_and_estimated_count(threat_db, monkeypatch):
+    monkeypatch.setattr(repository, "SEARCH_COUNT_CAP", 5)
+
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.upsert_indicators(
+                [{"indicator": f"10.1.{i}.1", "indicator_type": "ip"} for i in range(12)]
+                + [{"indicator": "a_b.example.com", "indicator_type": "domain"},
+                   {"indicator": "axb.example.com", "indicator_type": "domain"}]
+            )
+            await session.commit()
+            prefix = await repo.search(SearchRequest(query="10.1.", match="prefix", count_mode="estimated"))
+            literal = await repo.search(SearchRequest(query="a_b"))
+            return prefix, literal
+
+    prefix, literal = asyncio.run(scenario())
+    assert (prefix["total_count"], prefix["count_is_estimate"]) == (5, True)
+    assert [i["indicator"] for i in literal["indicators"]] == ["a_b.example.com"]
+
+
+def test_invalid_cursor_is_rejected():
+    resp = TestClient(app).post("/threat-intel/search", json={"cursor": "not-a-cursor"})
+    assert resp.status_code == 422
+
+
+def test_endpoints_read_from_the_database(threat_db):
+    async def seed():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.save_indicator(_analysis("198.51.100.9", risk_score=90, country="DE"))
+            await repo.save_indicator(_analysis("evil.example.com", "domain", risk_score=40))
+
+    asyncio.run(seed())
+    client = TestClient(app)
+
+    search = client.post("/threat-intel/search", json={"query": "EVIL"}).json()
+    assert search["total_count"] == 1
+    assert search["indicators"][0]["indicator"] == "evil.example.com"
+
+    trends = client.get("/threat-intel/trends", params={"days": 7}).json()
+    assert trends["total_indicators"] == 2
+    assert trends["threat_type_distribution"] == {"ip": 1, "domain": 1}
+    assert {g["country_code"] for g in trends["geographic_distribution"]} == {"DE", "US"}
+
+    risk = client.get("/threat-intel/risk-score/ip/198.51.100.9").json()
+    assert risk["risk_score"] == 90
+
+
+def test_rollups_follow_reanalysis_and_reports_are_reused(threat_db):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.save_indicator(_analysis("192.0.2.1", risk_score=20, country="FR"))
+            await repo.save_indicator(_analysis("192.0.2.2", risk_score=40, country="FR"))
+            # re-analysis moves one indicator to another country and score
+            await repo.save_indicator(_analysis("192.0.2.2", risk_score=80, country="NL"))
+            rollups = {(r.country_code, r.indicator_count, r.risk_score_sum)
+                       for r in (await session.execute(select(DailyRollup))).scalars()}
+
+            first = await repo.trends(7)
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            try:
+                again = await repo.trends(7)
+            finally:
+                event.remove(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            stored = (await session.execute(select(AnalyticsReport))).scalars().all()
+
+            await repo.save_indicator(_analysis("192.0.2.3", risk_score=60, country="FR"))
+            after_ingest = await repo.trends(7)
+            return rollups, first, again, statements, stored, after_ingest
+
+    rollups, first, again, statements, stored, after_ingest = asyncio.run(scenario())
+    assert rollups == {("FR", 1, 20), ("NL", 1, 80)}
+    assert first["risk_score_trends"][0]["avg_risk_score"] == 50
+    # rollup version + stored report, no aggregation
+    assert len(statements) == 2
+    assert TrendData(**again) == TrendData(**first)
+    assert [(r.report_type, r.time_period) for r in stored] == [("trends:all", 7)]
+    assert after_ingest["total_indicators"] == 3
+
+
+def test_saves_add_deltas_to_rollups_instead_of_rebuilding_the_day(threat_db):
+    async def rollups(session):
+        return {(r.day, r.indicator_type, r.country_code): (r.indicator_count, r.risk_score_sum)
+                for r in (await session.execute(select(DailyRollup))).scalars()}
+
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.upsert_indicators([{"indicator": f"10.7.0.{i}", "indicator_type": "ip",
+                                           "risk_score": 10 * i} for i in range(5)])
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            try:
+                await repo.save_indicator(_analysis("10.7.0.1", risk_score=70, country="JP"))
+                await repo.save_indicator(_analysis("10.7.0.9", risk_score=30, country="JP"))
+            finally:
+                event.remove(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            await repo.rescore()
+            incremental = await rollups(session)
+
+            await repo.refresh_rollups(day for day, _, _ in incremental)
+            return statements, incremental, await rollups(session)
+
+    statements, incremental, rebuilt = asyncio.run(scenario())
+    assert incremental == rebuilt
+    assert sum(count for count, _ in incremental.values()) == 6
+    upserts = [s for s in statements if s.startswith("INSERT INTO threat_daily_rollups")]
+    assert len(upserts) == 2
+    assert all("indicator_count + excluded.indicator_count" in s for s in upserts)
+    # no day is re-aggregated; only emptied rollup rows are deleted
+    assert not any("GROUP BY" in s for s in statements)
+    assert all("indicator_count <=" in s for s in statements if s.startswith("DELETE FROM threat_daily_rollups"))
+
+
+def test_reads_load_only_the_latest_report_per_provider(threat_db):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            for confidence in (10, 20, 30):
+                analysis = _analysis("192.0.2.77")
+                analysis["providers"]["otx"]["confidence"] = confidence
+                analysis["providers"]["otx"]["report_time"] = datetime(2024, 1, confidence)
+                await repo.save_indicator(analysis)
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            try:
+                stored = await repo.get_indicator("192.0.2.77", IndicatorType.IP)
+                page = await repo.search(SearchRequest(query="192.0.2.77", facets=False))
+                exported = [row async for batch in repo.export(SearchFilters()) for row in batch]
+            finally:
+                event.remove(get_async_engine().sync_engine, "before_cursor_execute", listener)
+            return stored, page, exported, [s for s in statements if "FROM provider_reports" in s]
+
+    stored, page, exported, report_queries = asyncio.run(scenario())
+    for indicator in (stored, page["indicators"][0], exported[0]):
+        assert set(indicator["providers"]) == {"otx", "abuseipdb"}
+        assert indicator["providers"]["otx"]["confidence"] == 30
+    assert len(report_queries) == 3
+    assert all("row_number() OVER" in s for s in report_queries)
+
+
+def test_export_streams_all_matches_in_batches(threat_db, monkeypatch):
+    monkeypatch.setattr(repository, "EXPORT_BATCH", 7)
+
+    async def seed():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.save_indicator(_analysis("198.51.100.1", risk_score=90, country="DE"))
+            await repo.upsert_indicators(
+                [{"indicator": f"10.9.0.{i}", "indicator_type": "ip", "risk_score": 60} for i in range(30)]
+                + [{"indicator": "quiet.example.com", "indicator_type": "domain", "risk_score": 5}]
+            )
+            await session.commit()
+            return [len(batch) async for batch in repo.export(SearchFilters(min_risk_score=50),
+                                                              batch_size=7)]
+
+    assert asyncio.run(seed()) == [7, 7, 7, 7, 3]
+    client = TestClient(app)
+
+    resp = client.post("/threat-intel/export", json={"min_risk_score": 50},
+                       headers={"accept-encoding": "identity"})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(rows) == 31
+    assert rows[0]["providers"]["otx"]["detected"] is True
+
+    resp = client.post("/threat-intel/export", json={"format": "csv", "query": "198.51"},
+                       headers={"accept-encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    lines = list(csv.reader(io.StringIO(resp.text)))  # httpx decodes gzip
+    assert lines[0][:3] == ["indicator", "indicator_type", "risk_score"]
+    assert lines[1][0] == "198.51.100.1" and lines[1][8] == "DE"
+    assert len(lines) == 2
+
+    resp = client.post("/threat-intel/export", json={"max_rows": 3})
+    assert len(resp.text.splitlines()) == 3
+
+
+def test_graph_expansion_is_bounded_and_filtered(threat_db):
+    # 203.0.113.50 -resolves-> c2.example -downloads-> hash1 -drops-> hash2
+    #              -resolves(20)-> parked.example ; c2.example -resolves-> 8 more IPs
+    async def seed():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            ids = await repo.upsert_indicators(
+                [{"indicator": "203.0.113.50", "indicator_type": "ip"},
+                 {"indicator": "c2.example", "indicator_type": "domain"},
+                 {"indicator": "parked.example", "indicator_type": "domain"},
+                 {"indicator": "a" * 64, "indicator_type": "file_hash"},
+                 {"indicator": "b" * 64, "indicator_type": "file_hash"}]
+                + [{"indicator": f"198.18.0.{i}", "indicator_type": "ip"} for i in range(8)]
+            )
+            key = {k[0]: v for k, v in ids.items()}
+            await repo.add_relationships(
+                [{"source_id": key["203.0.113.50"], "target_id": key["c2.example"],
+                  "relationship_type": "resolves_to", "confidence": 90},
+                 {"source_id": key["203.0.113.50"], "target_id": key["parked.example"],
+                  "relationship_type": "resolves_to", "confidence": 20},
+                 {"source_id": key["c2.example"], "target_id": key["a" * 64],
+                  "relationship_type": "downloads", "confidence": 80},
+                 {"source_id": key["a" * 64], "target_id": key["b" * 64],
+                  "relationship_type": "drops", "confidence": 80}]
+                + [{"source_id": key[f"198.18.0.{i}"], "target_id": key["c2.example"],
+                    "relationship_type": "resolves_to", "confidence": 70} for i in range(8)]
+            )
+            await session.commit()
+            return key, [
+                await repo.expand("c2.example", IndicatorType.DOMAIN, depth=1),
+                await repo.expand("203.0.113.50", IndicatorType.IP, depth=3, min_confidence=50),
+                await repo.expand("203.0.113.50", IndicatorType.IP, depth=3,
+                                  relationship_types=["resolves_to"]),
+                await repo.expand("203.0.113.50", IndicatorType.IP, depth=3, max_nodes=4),
+                await repo.expand("203.0.113.50", IndicatorType.IP, depth=3, max_edges=3),
+            ]
+
+    key, (hop, confident, resolves, few_nodes, few_edges) = asyncio.run(seed())
+
+    def names(graph):
+        return {n["indicator"]: n["depth"] for n in graph["nodes"]}
+
+    # both directions are followed
+    assert names(hop) == {"c2.example": 0, "203.0.113.50": 1, "a" * 64: 1,
+                          **{f"198.18.0.{i}": 1 for i in range(8)}}
+    assert not hop["truncated"]
+    assert names(confident) == {"203.0.113.50": 0, "c2.example": 1, "a" * 64: 2, "b" * 64: 3,
+                                **{f"198.18.0.{i}": 2 for i in range(8)}}
+    assert len(confident["edges"]) == 11
+    assert {"source": key["a" * 64], "target": key["b" * 64], "relationship_type": "drops",
+            "confidence": 80} in confident["edges"]
+    assert set(names(resolves)) == {"203.0.113.50", "c2.example", "parked.example",
+                                    *(f"198.18.0.{i}" for i in range(8))}
+    assert len(few_nodes["nodes"]) == 4 and few_nodes["truncated"]
+    ids = {n["id"] for n in few_nodes["nodes"]}
+    assert all(e["source"] in ids and e["target"] in ids for e in few_nodes["edges"])
+    assert len(few_edges["edges"]) == 3 and few_edges["truncated"]
+
+    client = TestClient(app)
+    resp = client.get("/threat-intel/graph/ip/203.0.113.50",
+                      params={"depth": 1, "relationship_type": ["resolves_to"], "min_confidence": 50})
+    assert resp.status_code == 200
+    assert [n["indicator"] for n in resp.json()["nodes"]] == ["203.0.113.50", "c2.example"]
+    assert client.get("/threat-intel/graph/ip/192.0.2.250").status_code == 404
+    assert client.get("/threat-intel/graph/ip/203.0.113.50", params={"depth": 9}).status_code == 422
+
+
+def test_tag_filters_and_facet_counts(threat_db, monkeypatch):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            ids = await repo.upsert_indicators(
+                [{"indicator": f"10.7.0.{i}", "indicator_type": "ip", "risk_score": i * 10} for i in range(10)]
+                + [{"indicator": f"bad{i}.example", "indicator_type": "domain", "risk_score": 80} for i in range(3)]
+            )
+            key = {k[0]: v for k, v in ids.items()}
+            await repo.add_tags({key["10.7.0.1"]: ["botnet", "tor"], key["10.7.0.8"]: ["botnet"],
+                                 key["10.7.0.9"]: ["tor"], key["bad0.example"]: ["botnet", "phishing"]})
+            await session.commit()
+
+            async def search(**filters):
+                return await repo.search(SearchRequest(**filters))
+
+            pages = {
+                "all": await search(),
+                "both": await search(tags_all=["botnet", "tor"]),
+                "either": await search(tags_any=["tor", "phishing"], min_risk_score=50),
+                "query": await search(query="10.7.0", tags_any=["botnet"]),
+                "untagged_type": await search(indicator_type="domain"),
+                "no_facets": await search(facets=False),
+            }
+            # writes after the index was built arrive with the next background delta sync,
+            # not with the next search
+            await repo.add_tags({key["bad1.example"]: ["tor"]})
+            await session.commit()
+            pages["stale"] = await search(tags_all=["tor"])
+            monkeypatch.setattr(facets, "FACET_REFRESH", 0)
+            await facets.facet_index.sync()
+            pages["delta"] = await search(tags_all=["tor"])
+            running = facets.facet_index._task is not None and not facets.facet_index._task.done()
+        return pages, running
+
+    pages, running = asyncio.run(scenario())
+    assert running
+    assert pages["all"]["facets"] == {
+        "tags": {"botnet": 3, "tor": 2, "phishing": 1},
+        "indicator_type": {"ip": 10, "domain": 3},
+        "risk_bucket": {"low": 3, "medium": 2, "high": 3, "critical": 5},
+        "is_estimate": False,
+    }
+    assert [i["indicator"] for i in pages["both"]["indicators"]] == ["10.7.0.1"]
+    assert pages["both"]["facets"]["tags"] == {"botnet": 1, "tor": 1}
+    assert {i["indicator"] for i in pages["either"]["indicators"]} == {"10.7.0.9", "bad0.example"}
+    assert pages["either"]["facets"]["indicator_type"] == {"ip": 1, "domain": 1}
+    assert pages["query"]["total_count"] == 2
+    assert pages["query"]["facets"]["risk_bucket"] == {"low": 1, "critical": 1}
+    assert pages["untagged_type"]["facets"]["tags"] == {"botnet": 1, "phishing": 1}
+    assert pages["no_facets"]["facets"] is None
+    assert {i["indicator"] for i in pages["delta"]["indicators"]} == {"10.7.0.1", "10.7.0.9", "bad1.example"}
+    assert pages["stale"]["facets"]["tags"]["tor"] == 2
+    assert pages["delta"]["facets"]["tags"]["tor"] == 3
+
+    with TestClient(app) as client:
+        resp = client.post("/threat-intel/search", json={"tags_any": ["phishing"]})
+    assert resp.status_code == 200
+    assert resp.json()["facets"]["tags"] == {"botnet": 1, "phishing": 1}
+
+
+def test_facets_count_out_of_range_scores_in_the_edge_buckets(threat_db):
+    async def scenario():
+        async with threat_db() as session:
+            repo = IndicatorRepository(session)
+            await repo.upsert_indicators([{"indicator": "10.8.0.1", "indicator_type": "ip", "risk_score": -5},
+                                          {"indicator": "10.8.0.2", "indicator_type": "ip", "risk_score": 40}])
+            await session.commit()
+            return await repo.search(SearchRequest())
+
+    page = asyncio.run(scenario())
+    assert page["total_count"] == 2
+    assert page["facets"]["risk_bucket"] == {"low": 1, "medium": 1}
+
+
+def test_conditional_get_answers_304_until_the_data_changes(threat_db):
+    async def save(risk_score):
+        async with threat_db() as session:
+            await IndicatorRepository(session).save_indicator(_analysis("203.0.113.77", risk_score=risk_score))
+
+    asyncio.run(save(30))
+    client = TestClient(app)
+
+    for path, params in (("/threat-intel/risk-score/ip/203.0.113.77", {}),
+                         ("/threat-intel/trends", {"days": 7})):
+        first = client.get(path, params=params)
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"].startswith("public, max-age=")
+        etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+
+        again = client.get(path, params=params, headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["ETag"] == etag
+        since = client.get(path, params=params, headers={"If-Modified-Since": last_modified})
+        assert since.status_code == 304
+
+    risk_etag = client.get("/threat-intel/risk-score/ip/203.0.113.77").headers["ETag"]
+    trends_etag = client.get("/threat-intel/trends", params={"days": 7}).headers["ETag"]
+    asyncio.run(save(80))
+
+    risk = client.get("/threat-intel/risk-score/ip/203.0.113.77", headers={"If-None-Match": risk_etag})
+    assert risk.status_code == 200
+    assert risk.json()["risk_score"] == 80
+    assert risk.headers["ETag"] != risk_etag
+    trends = client.get("/threat-intel/trends", params={"days": 7}, headers={"If-None-Match": trends_etag})
+    assert trends.status_code == 200
@@ -0,0 +1,81 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.vt_router as vt_router
+from app.main import app
+from app.cache import MemoryCacheBackend
+from app.rate_limit import KeyPool
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def vt_upstream(monkeypatch):
+    """Route VT calls to an in-process stub; 'missing.*' domains are 404.
+
+    'slow.*' time out, 'down.*' refuse the connection and 'garbled.*' answer
+    with a non-JSON body.
+    """
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        domain = request.url.params["domain"]
+        seen.append(domain)
+        if domain.startswith("missing."):
+            return httpx.Response(404)
+        if domain.startswith("slow."):
+            raise httpx.ReadTimeout("timed out", request=request)
+        if domain.startswith("down."):
+            raise httpx.ConnectError("connection refused", request=request)
+        if domain.startswith("garbled."):
+            return httpx.Response(200, text="<html>maintenance</html>")
+        return httpx.Response(200, json={"response_code": 1, "domain": domain})
+
+    upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(vt_router, "get_http_client", lambda: upstream)
+    monkeypatch.setattr(vt_router, "vt_keys", KeyPool([None], rate_per_minute=60_000, burst=100))
+    monkeypatch.setattr(vt_router.vt_cache, "backend", MemoryCacheBackend(100))
+    return seen
+
+
+def test_batch_validates_deduplicates_and_reports_per_domain(vt_upstream):
+    resp = client.post("/research_domain/batch", json={
+        "domains": ["a.example.com", "A.example.com", "bad_domain", "missing.example.com"]
+    })
+    assert resp.status_code == 200
+    results = {r["domain"]: r for r in resp.json()["results"]}
+    assert set(results) == {"a.example.com", "bad_domain", "missing.example.com"}
+    assert results["a.example.com"]["status"] == 200
+    assert results["bad_domain"]["status"] == 400
+    assert results["missing.example.com"]["status"] == 404
+    assert sorted(vt_upstream) == ["a.example.com", "missing.example.com"]
+
+
+def test_batch_streams_ndjson(vt_upstream):
+    domains = [f"d{i}.example.com" for i in range(20)]
+    resp = client.post(
+        "/research_domain/batch",
+        json={"domains": domains, "concurrency": 4},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(r["domain"] for r in lines) == sorted(domains)
+    assert all(r["status"] == 200 for r in lines)
+
+
+def test_batch_reports_transport_errors_per_domain(vt_upstream):
+    domains = ["ok.example.com", "slow.example.com", "down.example.com", "garbled.example.com"]
+    resp = client.post("/research_domain/batch", json={"domains": domains})
+    assert resp.status_code == 200
+    status = {r["domain"]: r["status"] for r in resp.json()["results"]}
+    assert status == {"ok.example.com": 200, "slow.example.com": 504,
+                      "down.example.com": 502, "garbled.example.com": 502}
+
+    resp = client.post("/research_domain/batch", json={"domains": domains},
+                       headers={"Accept": "application/x-ndjson"})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert {r["domain"]: r["status"] for r in lines} == status